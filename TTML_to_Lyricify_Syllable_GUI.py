@@ -1,16 +1,71 @@
 #-*- coding: UTF-8-*-
+from time import perf_counter
+# 记录模块开始加载的时间，用于统计冷启动耗时
+STARTUP_BEGIN = perf_counter()
+
 import os
 import sys
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-import xml
-from re import compile, Pattern, Match
+import importlib
+import json
 import string
-from typing import Iterator, AnyStr
-from xml.dom.minicompat import NodeList
-from xml.dom.minidom import Document, Element
 import threading
-from queue import Queue
+from contextlib import contextmanager
+from datetime import datetime
+from queue import Empty, Queue
+
+class StartupReport:
+    """冷启动耗时统计：各依赖库的导入耗时以及从模块加载到窗口首次绘制的时间
+
+    首次绘制之后的导入（tkinterdnd2、darkdetect 以及其他按需导入的库）单独记录在 deferred 中，不计入启动路径
+    """
+    def __init__(self, begin: float):
+        self.begin: float = begin
+        self.imports: dict[str, float] = {}
+        self.deferred: dict[str, float] = {}
+        self.first_paint: float | None = None
+
+    @contextmanager
+    def measure(self, name: str):
+        """统计一段导入代码的耗时"""
+        imports = self.imports if self.first_paint is None else self.deferred
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            imports[name] = imports.get(name, 0.0) + perf_counter() - start
+
+    def mark_first_paint(self):
+        if self.first_paint is None:
+            self.first_paint = perf_counter() - self.begin
+
+    def summary(self) -> str:
+        parts = [f"{name} {seconds * 1000:.1f}ms" for name, seconds in self.imports.items()]
+        paint = '-' if self.first_paint is None else f"{self.first_paint * 1000:.1f}ms"
+        summary = f"首次绘制: {paint}；导入耗时: " + '，'.join(parts)
+        if self.deferred:
+            summary += "；首次绘制后导入: " + '，'.join(f"{name} {seconds * 1000:.1f}ms"
+                                                     for name, seconds in self.deferred.items())
+        return summary
+
+    def save(self, path: str, version: str | None = None):
+        """以 JSON 行的形式追加到文件，便于跟踪不同版本/构建的冷启动耗时"""
+        record = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'version': version,
+            'frozen': bool(getattr(sys, 'frozen', False)),
+            'first_paint_ms': None if self.first_paint is None else round(self.first_paint * 1000, 1),
+            'imports_ms': {name: round(seconds * 1000, 1) for name, seconds in self.imports.items()},
+            'deferred_ms': {name: round(seconds * 1000, 1) for name, seconds in self.deferred.items()},
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+startup_report = StartupReport(STARTUP_BEGIN)
+
+with startup_report.measure('tkinter'):
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, ttk
 
 # 导入 pip (仅在开发环境使用)
 try:
@@ -18,88 +73,41 @@ try:
 except ImportError:
     pip_main = None
 
-# 导入必要的库
+# 启动时只导入界面和转换所必需的库；requests、pyperclip 在首次使用时，tkinterdnd2、darkdetect 在窗口首次绘制后
+# 才通过 load_module 导入
 # 首先尝试直接导入，如果打包后运行则应该已经包含这些库
 # 其次尝试使用pip安装（仅开发环境）
-# 导入darkdetect用于检测系统主题
-try:
-    import darkdetect
-except ImportError:
-    if pip_main:
-        print("正在安装darkdetect...")
-        pip_main(['install', 'darkdetect'])
-        import darkdetect
-    else:
-        # 打包环境中出错则显示友好错误
-        messagebox.showerror("错误", "缺少darkdetect库，程序无法正常运行。请重新下载完整版本或联系开发者。")
-        sys.exit(1)
-
-try:
-    import requests
-except ImportError:
-    if pip_main:
-        print("正在安装requests...")
-        pip_main(['install', 'requests'])
-        import requests
-    else:
-        # 打包环境中出错则显示友好错误
-        messagebox.showerror("错误", "缺少requests库，程序无法正常运行。请重新下载完整版本或联系开发者。")
-        sys.exit(1)
+def load_module(name: str):
+    """按需导入依赖库，开发环境中缺失时尝试使用pip安装，仍无法导入时抛出 ImportError"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with startup_report.measure(name):
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            if not pip_main:
+                raise
+            print(f"正在安装{name}...")
+            pip_main(['install', name])
+            return importlib.import_module(name)
 
-try:
-    from loguru import logger
-except ImportError:
+with startup_report.measure('loguru'):
     try:
-        import loguru
+        from loguru import logger
     except ImportError:
-        if pip_main:
-            print("正在安装loguru...")
-            pip_main(['install', 'loguru'])
+        try:
             import loguru
-            from loguru import logger
-        else:
-            # 打包环境中出错则显示友好错误
-            messagebox.showerror("错误", "缺少loguru库，程序无法正常运行。请重新下载完整版本或联系开发者。")
-            sys.exit(1)
-
-# 确保pyperclip已安装
-try:
-    import pyperclip
-except ImportError:
-    if pip_main:
-        print("正在安装pyperclip...")
-        pip_main(['install', 'pyperclip'])
-        import pyperclip
-    else:
-        # 打包环境中出错则显示友好错误
-        messagebox.showerror("错误", "缺少pyperclip库，程序无法正常运行。请重新下载完整版本或联系开发者。")
-        sys.exit(1)
-
-# 尝试导入tkinterdnd2用于拖放功能
-try:
-    import tkinterdnd2
-    from tkinterdnd2 import DND_FILES, TkinterDnD
-    HAS_DND = True
-except ImportError:
-    try:
-        if pip_main:
-            print("正在安装tkinterdnd2...")
-            pip_main(['install', 'tkinterdnd2'])
-            import tkinterdnd2
-            from tkinterdnd2 import DND_FILES, TkinterDnD
-            HAS_DND = True
-        else:
-            HAS_DND = False
-            print("无法使用tkinterdnd2，拖放功能将不可用")
-            # 定义一个全局变量，以便在类中使用
-            DND_FILES = "*"
-    except:
-        HAS_DND = False
-        print("无法安装tkinterdnd2，拖放功能将不可用")
-        # 定义一个全局变量，以便在类中使用
-        DND_FILES = "*"
-
-from datetime import datetime
+        except ImportError:
+            if pip_main:
+                print("正在安装loguru...")
+                pip_main(['install', 'loguru'])
+                import loguru
+                from loguru import logger
+            else:
+                # 打包环境中出错则显示友好错误
+                messagebox.showerror("错误", "缺少loguru库，程序无法正常运行。请重新下载完整版本或联系开发者。")
+                sys.exit(1)
 
 def get_app_path():
     """获取应用程序路径，处理打包后的情况"""
@@ -122,6 +130,8 @@ def get_resource_path(relative_path):
 
 # 日志文件夹路径
 log_dir = os.path.join(get_app_path(), 'log')
+# 转换缓存文件夹路径
+cache_dir = os.path.join(get_app_path(), 'cache')
 
 # 设置日志记录
 def setup_logger(enabled=False):
@@ -144,273 +154,139 @@ def setup_logger(enabled=False):
             return False
     return False
 
-# TTML转换相关类和函数
-class TTMLTime:
-    __pattern: Pattern = compile(r'\d+')
+# 转换核心位于 ttml_converter（不依赖 tkinter，可单独导入）
+with startup_report.measure('ttml_converter'):
+    from ttml_converter import ConversionCache, ConversionCancelled, IncrementalConverter, TTMLContext, \
+        collect_ttml_files, convert_file_in_worker, plan_outputs, read_ttml_file, ttml_to_lyricify_syllable_text, \
+        worker_init
 
-    def __init__(self, centi: str = ''):
-        if centi == '': 
-            logger.debug("初始化空的TTMLTime对象")
+# 超过此字符数的文本分片写入文本框，每片之间让出主线程
+CHUNK_SIZE = 64 * 1024
+# 预览模式下超过此字符数的文本只显示开头部分
+PREVIEW_THRESHOLD = 1024 * 1024
+PREVIEW_SIZE = 64 * 1024
+# 自动转换的防抖延迟（毫秒），停止输入超过此时间后才开始转换
+AUTO_CONVERT_DELAY = 400
+
+def chunk_end(text: str, start: int, size: int) -> int:
+    """返回从 start 开始、约 size 个字符的一片文本的结束位置
+
+    优先在 size 之后的第一个换行处结束；之后 size 个字符内没有换行（如压缩成一行的 TTML）时
+    在 size 处直接截断，每片最多 2 * size 个字符
+    """
+    if len(text) - start <= size:
+        return len(text)
+    end = text.find('\n', start + size, start + 2 * size)
+    return start + size if end == -1 else end + 1
+
+def make_preview(text: str) -> str:
+    """截取文本开头（尽量按整行截断），并附上预览提示"""
+    end = chunk_end(text, 0, PREVIEW_SIZE)
+    if end == len(text):
+        return text
+    if text[end - 1] == '\n':
+        shown = text.count('\n', 0, end)
+        total = text.count('\n') + (not text.endswith('\n'))
+        return text[:end] + f"\n…… 预览模式：仅显示前 {shown} 行（共 {total} 行），转换与复制使用完整内容"
+    # 超长的行（如压缩成一行的 TTML）在最后一个完整的标签之后截断
+    tag_end = text.rfind('>', 0, end)
+    if tag_end != -1:
+        end = tag_end + 1
+    return text[:end] + f"\n…… 预览模式：仅显示前 {end} 个字符（共 {len(text)} 个字符），转换与复制使用完整内容"
+
+class ChunkedTextWriter:
+    """分片向文本框写入大段文本
+
+    每次写入约 CHUNK_SIZE 个字符（尽量按整行切分，见 chunk_end），各片之间通过 after 调度，
+    写入过程中界面保持响应。同一文本框再次写入时会取消尚未完成的写入
+    """
+    def __init__(self, root, widget: tk.Text, on_progress=None):
+        self.__root = root
+        self.__widget: tk.Text = widget
+        self.__on_progress = on_progress
+        self.__job: str | None = None
+        self.__text: str = ''
+        self.__pos: int = 0
+        self.__on_done = None
+
+    @property
+    def busy(self) -> bool:
+        return self.__job is not None
+
+    def cancel(self):
+        if self.__job is not None:
+            self.__root.after_cancel(self.__job)
+            self.__job = None
+
+    def write(self, text: str, on_done=None):
+        """清空文本框并写入 text，全部写入后调用 on_done；第一片同步写入，短文本不会产生额外延迟"""
+        self.cancel()
+        self.__text = text
+        self.__pos = 0
+        self.__on_done = on_done
+        self.__insert(lambda: self.__widget.delete(1.0, tk.END))
+        self.__step()
+
+    def __insert(self, action):
+        # 只读的文本框需要临时解除禁用才能写入
+        state = self.__widget.cget('state')
+        if state == tk.DISABLED:
+            self.__widget.config(state=tk.NORMAL)
+        action()
+        if state == tk.DISABLED:
+            self.__widget.config(state=tk.DISABLED)
+
+    def __step(self):
+        self.__job = None
+        text = self.__text
+        end = chunk_end(text, self.__pos, CHUNK_SIZE)
+        chunk = text[self.__pos:end]
+        self.__insert(lambda: self.__widget.insert(tk.END, chunk))
+        self.__pos = end
+
+        if self.__on_progress and len(text) > CHUNK_SIZE:
+            self.__on_progress(end / len(text))
+        if end < len(text):
+            self.__job = self.__root.after(1, self.__step)
             return
-        # 使用 finditer 获取匹配的迭代器
-        matches: Iterator[Match[str]] = TTMLTime.__pattern.finditer(centi)
-        # 获取下一个匹配
-        iterator: Iterator[Match[str]] = iter(matches)  # 将匹配对象转换为迭代器
-
-        self.__minute:int = int(next(iterator).group())
-        self.__second:int = int(next(iterator).group())
-        self.__micros:int = int(next(iterator).group())
-
-    def __str__(self) -> str:
-        return f'{self.__minute:02}:{self.__second:02}.{self.__micros:03}'
-
-    def __int__(self) -> int:
-        return (self.__minute * 60 + self.__second) * 1000 + self.__micros
-
-    def __ge__(self, other) -> bool:
-        return (self.__minute, self.__second, self.__micros) >= (other.__minute, other.__second, other.__micros)
-
-    def __ne__(self, other) -> bool:
-        return (self.__minute, self.__second, self.__micros) != (other.__minute, other.__second, other.__micros)
-
-    def __sub__(self, other) -> int:
-        return abs(int(self) - int(other))
-
-class TTMLSyl:
-    def __init__(self, element: Element):
-        self.__element: Element = element
-        logger.trace(f"创建新的TTMLSyl对象，处理元素: {element.toxml()}")
-
-        self.__begin: TTMLTime = TTMLTime(element.getAttribute("begin"))
-        self.__end: TTMLTime = TTMLTime(element.getAttribute("end"))
-        self.text: str = element.childNodes[0].nodeValue
-        logger.info(f"音节内容: {self.text}, 开始时间: {self.__begin}, 结束时间: {self.__end}")
-
-    def __str__(self) -> str:
-        return f'{self.text}({int(self.__begin)},{self.__end - self.__begin})'
-
-    def get_begin(self) -> TTMLTime:
-        return self.__begin
-
-    def get_end(self) -> TTMLTime:
-        return self.__end
-
-class TTMLLine:
-    have_ts: bool = False
-    have_duet: bool = False
-    have_bg: bool = False
-    have_pair: int = 0
-
-    __before: Pattern[AnyStr] = compile(r'^\({2,}')
-    __after: Pattern[AnyStr] = compile(r'\){2,}$')
-
-    def __init__(self, element: Element, is_bg: bool = False):
-        self.__element: Element = element
-        logger.debug(f"创建新的TTMLLine对象，处理元素: {element.toxml()}")
-        self.__orig_line: list[TTMLSyl|str] = []
-        self.__ts_line: str|None = None
-        self.__bg_line: TTMLLine|None = None
-        self.__is_bg: bool = is_bg
-
-        TTMLLine.have_bg |= is_bg
-        logger.trace(f"是否为和声行: {is_bg}, 当前和声状态: {TTMLLine.have_bg}")
-
-        # 获取传入元素的 agent 属性
-        agent: string = element.getAttribute("ttm:agent")
-        self.__is_duet:bool = bool(agent and agent != 'v1')
-        logger.trace(f"对唱属性: agent={agent}, is_duet={self.__is_duet}")
-
-        # 获取 <p> 元素的所有子节点，包括文本节点
-        child_elements:list[Element] = element.childNodes  # iter() 会返回所有子元素和文本节点
-
-        # 遍历所有子元素
-        for child in child_elements:
-            if child.nodeType == 3 and child.nodeValue:  # 如果是文本节点（例如空格或换行）
-                if len(self.__orig_line) > 0 and len(child.nodeValue) < 2:
-                    self.__orig_line[-1].text += child.nodeValue
-                    logger.debug(f"将文本节点追加到上一个元素: {self.__orig_line[-1].text}")
-                else:
-                    self.__orig_line.append(child.nodeValue)
-                    logger.debug(f"添加新的文本节点: {child.nodeValue}")
-            else:
-                # 获取 <span> 中的属性
-                role:str = child.getAttribute("ttm:role")
-                logger.trace(f"处理span元素，role属性: {role}")
-
-                # 没有role代表是一个syl
-                if role == "":
-                    if child.childNodes[0].nodeValue:
-                        logger.debug(f"添加音节元素: {child.childNodes[0].nodeValue}")
-                        self.__orig_line.append(TTMLSyl(child))
-
-                elif role == "x-bg":
-                    # 和声行
-                    logger.info("检测到和声行，开始处理")
-                    self.__bg_line = TTMLLine(child, True)
-                    self.__bg_line.__is_duet = self.__is_duet
-                    logger.debug(f"和声行处理完成，继承对唱属性: {self.__is_duet}")
-                elif role == "x-translation":
-                    # 翻译行
-                    logger.info("检测到翻译行，开始处理")
-                    TTMLLine.have_ts = True
-                    self.__ts_line = f'{child.childNodes[0].data}'
-                    logger.debug(f"翻译行内容: {self.__ts_line}")
-
-        if len(self.__orig_line) != 1 or type(self.__orig_line[0]) != str:
-            self.__begin = self.__orig_line[0].get_begin()
-            self.__end = self.__orig_line[0].get_end()
-        else:
-            self.__begin: TTMLTime = TTMLTime(element.getAttribute("begin"))
-            self.__end: TTMLTime = TTMLTime(element.getAttribute("end"))
-
-        if is_bg:
-            logger.debug("处理和声行的括号")
-            if TTMLLine.__before.search(self.__orig_line[0] if type(self.__orig_line[0]) == str else self.__orig_line[0].text):
-                logger.debug("检测到开头的多重括号，进行处理")
-                if type(self.__orig_line[0]) == str:
-                    self.__orig_line[0] = TTMLLine.__before.sub('(', self.__orig_line[0])
-                else:
-                    self.__orig_line[0].text = TTMLLine.__before.sub('(', self.__orig_line[0].text)
-                TTMLLine.have_pair += 1
-                logger.debug(f"处理后的开头文本: {self.__orig_line[0] if type(self.__orig_line[0]) == str else self.__orig_line[0].text}")
-            if TTMLLine.__after.search(self.__orig_line[-1] if type(self.__orig_line[-1]) == str else self.__orig_line[-1].text):
-                logger.debug("检测到结尾的多重括号，进行处理")
-                if type(self.__orig_line[-1]) == str:
-                    self.__orig_line[-1] = TTMLLine.__after.sub(')', self.__orig_line[-1])
-                else:
-                    self.__orig_line[-1].text = TTMLLine.__after.sub(')', self.__orig_line[-1].text)
-                TTMLLine.have_pair += 1
-                logger.debug(f"处理后的结尾文本: {self.__orig_line[-1] if type(self.__orig_line[-1]) == str else self.__orig_line[-1].text}")
-            logger.debug(f"和声行括号处理完成，当前配对括号数: {TTMLLine.have_pair}")
-
-    def __role(self) -> int:
-        return ((int(TTMLLine.have_bg) + int(self.__is_bg)) * 3
-                + int(TTMLLine.have_duet) + int(self.__is_duet))
-
-    def __raw(self) -> tuple[str, str|None]:
-        logger.debug("生成原始文本格式")
-        logger.debug(f"处理行类型: {'和声行' if self.__is_bg else '主要行'}")
-        
-        # 生成主要文本
-        role_text = f'[{self.__role()}]'
-        logger.debug(f"角色标记: {role_text}")
-        
-        # 根据行内容类型生成不同格式
-        if len(self.__orig_line) != 1 or type(self.__orig_line[0]) != str:
-            content_text = ''.join([str(v) for v in self.__orig_line])
-            logger.debug(f"多音节/复杂行内容: {content_text}")
-        else:
-            content_text = f'{self.__orig_line[0]}({int(self.__begin)},{self.__end - self.__begin})'
-            logger.debug(f"单行内容: {content_text}")
-        
-        main_text = role_text + content_text
-        logger.info(f"完整主要文本: {main_text}")
-        
-        # 处理翻译文本
-        if self.__ts_line:
-            trans_text = f'[{self.__begin}]{self.__ts_line}'
-            logger.info(f"生成翻译文本: {trans_text}")
-        else:
-            trans_text = None
-            logger.info("无翻译文本")
-        
-        return (main_text, trans_text)
 
-    def to_str(self) -> tuple[tuple[str, str|None],tuple[str, str|None]|None]:
-        return self.__raw(), (self.__bg_line.__raw() if self.__bg_line else None)
+        self.__text = ''
+        on_done, self.__on_done = self.__on_done, None
+        if on_done:
+            on_done()
 
-def ttml_to_lyricify_syllable_text(ttml_content):
-    """将TTML文本内容转换为Lyricify Syllable文本"""
-    logger.info("开始TTML到Lyricify Syllable的转换")
-    logger.debug(f"输入TTML内容长度: {len(ttml_content)}字符")
-    
-    # 重置状态变量
-    TTMLLine.have_duet = False
-    TTMLLine.have_bg = False
-    TTMLLine.have_ts = False
-    TTMLLine.have_pair = 0
-    logger.debug("重置所有状态变量")
-
-    lyric_text = []
-    trans_text = []
-    
-    try:
-        # 预处理XML内容，移除可能导致解析错误的内容
-        logger.debug("开始预处理XML内容")
-        ttml_content = ttml_content.replace('xmlns=""', '')
-        logger.debug("移除了空的xmlns属性")
-        
-        # 解析XML内容
-        logger.debug("开始解析XML内容")
-        dom: Document = xml.dom.minidom.parseString(ttml_content)  # 解析XML字符串
-        tt: Document = dom.documentElement  # 获取根元素
-        logger.debug(f"XML根元素标签名: {tt.tagName}")
-
-        # 获取tt中的body/head元素
-        logger.debug("尝试获取body和head元素")
-        body: Element = tt.getElementsByTagName('body')[0]
-        head: Element = tt.getElementsByTagName('head')[0]
-        logger.debug("成功获取body和head元素")
-
-        if body and head:
-            # 获取body/head中的<div>/<metadata>子元素
-            logger.debug(f"尝试获取<div>/<metadata>子元素")
-            div: Element = body.getElementsByTagName('div')[0]
-            metadata: Element = head.getElementsByTagName('metadata')[0]
-
-            # 获取div中的所有<p>子元素
-            logger.debug(f"尝试获取div中的所有<p>子元素")
-            p_elements: NodeList[Element] = div.getElementsByTagName('p')
-            agent_elements: NodeList[Element] = metadata.getElementsByTagName('ttm:agent')
-
-            # 检查是否有对唱
-            logger.debug(f"开始检查对唱信息，共发现{len(agent_elements)}个agent元素")
-            for meta in agent_elements:
-                agent_id = meta.getAttribute('xml:id')
-                logger.debug(f"检查agent元素: id={agent_id}")
-                if agent_id != 'v1':
-                    TTMLLine.have_duet = True
-                    logger.info(f"发现对唱声部: {agent_id}")
-
-            lines: list[TTMLLine] = []
-            # 遍历每个<p>元素
-            total_p_elements = len(p_elements)
-            logger.info(f"开始处理歌词行，共{total_p_elements}行")
-            
-            for index, p in enumerate(p_elements):
-                logger.info(f"处理第{index + 1}/{total_p_elements}行")
-                lines.append(TTMLLine(p))
-                result = lines[-1].to_str()[0][0]
-                logger.info(f"第{index + 1}行转换结果: {result}")
-                logger.trace(f"原始XML内容: {p.toxml()}")
-
-            # 生成输出文本
-            for line in lines:
-                main_line, bg_line = line.to_str()
-                lyric_text.append(main_line[0])
-                if main_line[1]:
-                    trans_text.append(main_line[1])
-                elif TTMLLine.have_ts:
-                    # 如果有翻译但当前行没有，添加空行保持行数一致
-                        trans_text.append(f"[{line._TTMLLine__begin}]")
-
-                if bg_line:
-                    lyric_text.append(bg_line[0])
-                    if bg_line[1]:
-                        trans_text.append(bg_line[1])
-                    elif TTMLLine.have_ts:
-                        # 如果有翻译但当前行没有，添加空行保持行数一致
-                        trans_text.append(f"[{line._TTMLLine__bg_line._TTMLLine__begin}]")
+class UIDispatcher:
+    """工作线程向界面线程投递回调
 
-        else:
-            logger.exception("错误: 找不到<body>元素")
-            return False, None, None
+    回调放入线程安全的队列，随后通过 event_generate 发出虚拟事件；界面线程收到事件后立即执行队列中的所有回调，
+    结果就绪即可送达，不需要定时轮询
+    """
+    EVENT = '<<UIDispatch>>'
 
-    except Exception as e:
-        logger.exception(f"无法解析TTML内容: {str(e)}")
-        return False, None, None
-            
-    return True, "\n".join(lyric_text), "\n".join(trans_text) if TTMLLine.have_ts else None
+    def __init__(self, root):
+        self.__root = root
+        self.__queue: Queue = Queue()
+        root.bind(self.EVENT, self.__drain, add='+')
+
+    def post(self, callback, *args):
+        """在任意线程中调用，callback(*args) 会在界面线程中执行"""
+        self.__queue.put((callback, args))
+        try:
+            self.__root.event_generate(self.EVENT, when='tail')
+        except (tk.TclError, RuntimeError):
+            # 窗口已关闭或主循环已退出
+            pass
+
+    def __drain(self, event=None):
+        while True:
+            try:
+                callback, args = self.__queue.get_nowait()
+            except Empty:
+                return
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.exception(f"界面回调执行失败: {str(e)}")
 
 # GUI应用类
 class TTMLToLyricifySyllableApp:
@@ -429,6 +305,9 @@ class TTMLToLyricifySyllableApp:
         # 设置线程锁，用于防止多线程操作时的竞态条件
         self.thread_lock = threading.Lock()
         
+        # 工作线程向界面线程投递回调
+        self.dispatcher = UIDispatcher(self.root)
+        
         # 设置图标（如果有）
         try:
             icon_path = get_resource_path("icon.ico")
@@ -442,15 +321,41 @@ class TTMLToLyricifySyllableApp:
         self.log_enabled = tk.BooleanVar(value=False)
         self.word_wrap_enabled = tk.BooleanVar(value=False)
         self.previous_word_wrap_state = False  # 添加变量跟踪上一次的自动换行状态
-        
-        # 设置样式
+        self.streaming_enabled = tk.BooleanVar(value=False)  # 是否使用流式解析引擎
+        self.performance_enabled = tk.BooleanVar(value=False)  # 性能模式：关闭逐行日志
+        self.profile_enabled = tk.BooleanVar(value=False)  # 性能分析：转换时写入 cProfile/tracemalloc 报告
+        self.preview_enabled = tk.BooleanVar(value=False)  # 大文件预览：只显示文本开头部分
+        self.cancel_event: threading.Event | None = None  # 当前转换的取消标记
+        self.auto_convert_enabled = tk.BooleanVar(value=False)  # 自动转换：编辑后增量转换
+        self.auto_converter = IncrementalConverter()
+        self.auto_convert_job: str | None = None
+        self.auto_convert_running = False
+        self.auto_convert_pending = False
+        # 转换结果缓存：内存缓存始终启用，勾选「磁盘缓存」后同时保存到软件目录/cache
+        self.disk_cache_enabled = tk.BooleanVar(value=False)
+        self.conversion_cache = ConversionCache()
+        # AMLL DB 客户端，首次搜索时创建，所有搜索共用连接和磁盘缓存
+        self.amll_client = None
+        # 多文件转换队列窗口，拖放或导入多个文件时打开
+        self.queue_window = None
+        # 完整的输入/输出文本，预览或分片写入时文本框中的内容并不完整
+        self.input_source: str | None = None
+        self.lyric_result: str | None = None
+        self.trans_result: str | None = None
+        
+        # 设置样式：先使用浅色主题绘制窗口，首次绘制后再检测系统主题（见 detect_system_theme）
+        self.current_theme = "Light"
         self.setup_styles()
         
         # 创建主框架
         self.create_widgets()
         
-        # 绑定拖放事件
-        self.setup_drag_drop()
+        # 分片写入大文本，进度显示在状态栏
+        self.input_writer = ChunkedTextWriter(self.root, self.input_text, self.show_progress)
+        self.output_writer = ChunkedTextWriter(self.root, self.output_text, self.show_progress)
+        self.trans_writer = ChunkedTextWriter(self.root, self.trans_text, self.show_progress)
+        
+        # 拖放事件在窗口首次绘制后由 main 调用 setup_drag_drop 绑定
         
         # 状态消息
         self.status_message = ""
@@ -460,6 +365,9 @@ class TTMLToLyricifySyllableApp:
         
         # 绑定复选框的变量跟踪
         self.log_enabled.trace_add("write", self.on_log_enabled_change)
+        self.preview_enabled.trace_add("write", self.on_preview_change)
+        self.auto_convert_enabled.trace_add("write", self.on_auto_convert_change)
+        self.disk_cache_enabled.trace_add("write", self.on_disk_cache_change)
         
         # 初始化文本框换行状态
         self.toggle_word_wrap()
@@ -476,6 +384,40 @@ class TTMLToLyricifySyllableApp:
             # 移除所有处理器
             logger.remove()
             self.set_status("日志记录已禁用")
+
+    def on_disk_cache_change(self, *args):
+        enabled = self.disk_cache_enabled.get()
+        self.conversion_cache.cache_dir = cache_dir if enabled else None
+        if enabled:
+            # 在后台清除长期未使用的磁盘缓存
+            threading.Thread(target=self.conversion_cache.evict, daemon=True).start()
+        logger.info(f"磁盘缓存: {enabled}")
+        self.set_status(f"磁盘缓存已{'启用，缓存目录为 软件目录/cache' if enabled else '禁用'}")
+
+    def on_preview_change(self, *args):
+        """切换预览模式后按新模式重新显示已加载的完整内容"""
+        if self.input_source is not None or self.preview_enabled.get():
+            content = self.input_source if self.input_source is not None else self.input_text.get(1.0, tk.END).rstrip('\n')
+            if len(content) > PREVIEW_THRESHOLD:
+                self.update_input_text_threaded(content)
+        if self.lyric_result is not None and len(self.lyric_result) > PREVIEW_THRESHOLD:
+            self.show_results(self.lyric_result, self.trans_result)
+        self.set_status(f"大文件预览已{'启用' if self.preview_enabled.get() else '禁用'}")
+
+    def show_progress(self, fraction: float):
+        """在状态栏显示分片写入进度，完成后自动隐藏"""
+        if fraction >= 1:
+            self.progress_bar.pack_forget()
+            return
+        if not self.progress_bar.winfo_ismapped():
+            self.progress_bar.pack(side=tk.LEFT, padx=(10, 0))
+        self.progress_var.set(fraction * 100)
+
+    def preview(self, text: str) -> str:
+        """预览模式下大文本只显示开头部分"""
+        if self.preview_enabled.get() and len(text) > PREVIEW_THRESHOLD:
+            return make_preview(text)
+        return text
     
     def update_theme_colors(self):
         """更新所有UI元素的颜色以匹配当前主题"""
@@ -514,8 +456,7 @@ class TTMLToLyricifySyllableApp:
     }
     
     def setup_styles(self):
-        # 检测系统主题
-        self.current_theme = "Dark" if darkdetect.isDark() else "Light"
+        # 按当前主题设置样式
         theme_colors = self.DARK_THEME if self.current_theme == "Dark" else self.LIGHT_THEME
         
         # 设置ttk样式
@@ -534,6 +475,21 @@ class TTMLToLyricifySyllableApp:
             self.input_text.configure(bg=theme_colors["text_bg"], fg=theme_colors["text_fg"])
             self.output_text.configure(bg=theme_colors["text_bg"], fg=theme_colors["text_fg"])
             self.trans_text.configure(bg=theme_colors["text_bg"], fg=theme_colors["text_fg"])
+    
+    def detect_system_theme(self):
+        """检测系统主题并启动主题监听线程（darkdetect 不可用时保持浅色主题）
+
+        在窗口首次绘制后调用，darkdetect 的导入不在启动路径上
+        """
+        try:
+            darkdetect = load_module('darkdetect')
+        except ImportError:
+            logger.warning("无法导入darkdetect，将使用浅色主题")
+            return
+        theme = "Dark" if darkdetect.isDark() else "Light"
+        if theme != self.current_theme:
+            self.current_theme = theme
+            self.setup_styles()
         
         # 启动主题监听线程
         if not hasattr(self, '_theme_listener_started'):
@@ -573,6 +529,7 @@ class TTMLToLyricifySyllableApp:
         self.input_text.pack(fill=tk.BOTH, expand=True)
         self.input_text.insert(tk.END, "粘贴文本或拖动文件到此处")
         self.input_text.bind("<FocusIn>", self.clear_placeholder)
+        self.input_text.bind("<<Modified>>", self.on_input_modified)
         
         # 右侧标签和文本框
         ttk.Label(right_frame, text="Lyricify Syllable输出").pack(anchor=tk.W, pady=(0, 5))
@@ -603,10 +560,16 @@ class TTMLToLyricifySyllableApp:
         self.amll_search_btn = ttk.Button(left_buttons_frame, text="从 AMLL DB 搜索", command=self.open_amll_search)
         self.amll_search_btn.pack(side=tk.LEFT)
         
+        self.amll_bulk_btn = ttk.Button(left_buttons_frame, text="批量获取", command=self.open_amll_bulk)
+        self.amll_bulk_btn.pack(side=tk.LEFT, padx=(5, 0))
+        
         # 右侧按钮
         right_buttons_frame = ttk.Frame(bottom_frame)
         right_buttons_frame.pack(side=tk.RIGHT)
         
+        self.cancel_btn = ttk.Button(right_buttons_frame, text="取消", command=self.cancel_conversion, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.RIGHT, padx=(5, 0))
+        
         self.convert_btn = ttk.Button(right_buttons_frame, text="转换", command=self.convert_ttml)
         self.convert_btn.pack(side=tk.RIGHT, padx=(5, 0))
         
@@ -623,6 +586,10 @@ class TTMLToLyricifySyllableApp:
         self.status_label = ttk.Label(status_frame, text="")
         self.status_label.pack(side=tk.LEFT)
         
+        # 大文本分片写入进度条，仅在写入时显示
+        self.progress_var = tk.DoubleVar(value=0)
+        self.progress_bar = ttk.Progressbar(status_frame, variable=self.progress_var, maximum=100, length=120)
+        
         # 复选框框架
         checkbox_frame = ttk.Frame(status_frame)
         checkbox_frame.pack(side=tk.RIGHT)
@@ -634,11 +601,43 @@ class TTMLToLyricifySyllableApp:
         # 日志复选框
         self.log_checkbox = ttk.Checkbutton(checkbox_frame, text="启用日志记录", variable=self.log_enabled)
         self.log_checkbox.pack(side=tk.RIGHT)
+        
+        # 性能分析复选框
+        self.profile_checkbox = ttk.Checkbutton(checkbox_frame, text="性能分析", variable=self.profile_enabled)
+        self.profile_checkbox.pack(side=tk.RIGHT, padx=(0, 10))
+        
+        # 流式解析复选框
+        self.streaming_checkbox = ttk.Checkbutton(checkbox_frame, text="流式解析", variable=self.streaming_enabled)
+        self.streaming_checkbox.pack(side=tk.RIGHT, padx=(0, 10))
+        
+        # 性能模式复选框
+        self.performance_checkbox = ttk.Checkbutton(checkbox_frame, text="性能模式", variable=self.performance_enabled)
+        self.performance_checkbox.pack(side=tk.RIGHT, padx=(0, 10))
+        
+        # 大文件预览复选框
+        self.preview_checkbox = ttk.Checkbutton(checkbox_frame, text="大文件预览", variable=self.preview_enabled)
+        self.preview_checkbox.pack(side=tk.RIGHT, padx=(0, 10))
+        
+        # 自动转换复选框
+        self.auto_convert_checkbox = ttk.Checkbutton(checkbox_frame, text="自动转换", variable=self.auto_convert_enabled)
+        self.auto_convert_checkbox.pack(side=tk.RIGHT, padx=(0, 10))
+        
+        # 磁盘缓存复选框
+        self.disk_cache_checkbox = ttk.Checkbutton(checkbox_frame, text="磁盘缓存", variable=self.disk_cache_enabled)
+        self.disk_cache_checkbox.pack(side=tk.RIGHT, padx=(0, 10))
     
     def setup_drag_drop(self):
-        # 为输入文本框绑定拖放事件
+        """导入 tkinterdnd2，为已创建的根窗口加载 tkdnd 后为输入文本框绑定拖放事件
+
+        在窗口首次绘制后调用，tkinterdnd2 的导入及 tkdnd 的加载不在启动路径上
+        """
         try:
-            self.input_text.drop_target_register(DND_FILES)
+            tkinterdnd2 = load_module('tkinterdnd2')
+            # 根窗口是普通的 tk.Tk，需要为其加载 tkdnd；旧版本的 tkinterdnd2 没有公开的 require
+            TkinterDnD = tkinterdnd2.TkinterDnD
+            require = getattr(TkinterDnD, 'require', None) or TkinterDnD._require
+            require(self.root)
+            self.input_text.drop_target_register(tkinterdnd2.DND_FILES)
             self.input_text.dnd_bind('<<Drop>>', self.handle_drop)
             logger.info("拖放功能已启用")
         except Exception as e:
@@ -646,12 +645,32 @@ class TTMLToLyricifySyllableApp:
             # 如果拖放功能不可用，添加提示标签
             ttk.Label(self.root, text="注意：拖放功能不可用，请使用导入按钮").pack(pady=5)
     
+    def enqueue_files(self, paths: list[str]):
+        """将多个文件（或目录中的 .ttml 文件）加入转换队列"""
+        # 拖放或多选得到的是实际路径，不展开通配符
+        files = collect_ttml_files(paths, use_glob=False)
+        if not files:
+            self.set_status("没有找到TTML文件")
+            return
+        if self.queue_window is None:
+            self.queue_window = ConversionQueueWindow(self.root, self)
+        self.queue_window.add_files(files)
+        self.queue_window.lift()
+    
     def handle_drop(self, event):
         # 处理文件拖放
         try:
             file_path = event.data
             logger.debug(f"接收到拖放事件，原始数据: {event.data}")
             
+            # 拖放多个文件或目录时加入转换队列，单个文件仍读取到输入框
+            if isinstance(file_path, str):
+                paths = self.root.tk.splitlist(file_path)
+                if len(paths) > 1 or (paths and os.path.isdir(paths[0])):
+                    logger.info(f"拖放了 {len(paths)} 个路径，加入转换队列")
+                    self.enqueue_files(list(paths))
+                    return
+            
             # 移除可能的引号和前缀
             if isinstance(file_path, str):
                 # Windows路径处理
@@ -666,18 +685,8 @@ class TTMLToLyricifySyllableApp:
                 if os.path.isfile(file_path):
                     logger.info(f"开始读取文件: {file_path}")
                     try:
-                        try:
-                            logger.debug("尝试使用UTF-8编码读取文件")
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                content = f.read()
-                            logger.debug("UTF-8编码读取成功")
-                        except UnicodeDecodeError:
-                            # 尝试其他编码
-                            logger.debug("UTF-8编码读取失败，尝试使用GBK编码")
-                            with open(file_path, 'r', encoding='gbk') as f:
-                                content = f.read()
-                            logger.debug("GBK编码读取成功")
-                            
+                        # 只读取一次字节，根据 BOM/编码声明/开头内容识别编码（UTF-8 或 GBK 等）
+                        content = read_ttml_file(file_path)
                         logger.debug(f"文件内容长度: {len(content)}字符")
                         self.update_input_text_threaded(content)
                         self.set_status(f"文件读取成功: {file_path}")
@@ -700,14 +709,14 @@ class TTMLToLyricifySyllableApp:
     
     def clear_placeholder(self, event):
         # 清除占位文本
-        if self.input_text.get(1.0, tk.END).strip() == "粘贴文本或拖动文件到此处":
+        if self.input_source is None and self.input_text.get(1.0, tk.END).strip() == "粘贴文本或拖动文件到此处":
             self.input_text.delete(1.0, tk.END)
     
     def paste_from_clipboard(self):
         # 从剪贴板粘贴内容
         logger.debug("尝试从剪贴板获取内容")
         try:
-            clipboard_content = pyperclip.paste()
+            clipboard_content = load_module('pyperclip').paste()
             if clipboard_content:
                 logger.debug(f"剪贴板内容长度: {len(clipboard_content)}字符")
                 logger.debug(f"剪贴板内容前50个字符: {clipboard_content[:50]}...")
@@ -725,21 +734,19 @@ class TTMLToLyricifySyllableApp:
     
     def import_file(self):
         # 导入文件
-        file_path = filedialog.askopenfilename(
-            title="选择TTML文件",
+        file_paths = filedialog.askopenfilenames(
+            title="选择TTML文件（可多选，多个文件将加入转换队列）",
             filetypes=[("TTML文件", "*.ttml"), ("XML文件", "*.xml"), ("所有文件", "*.*")]
         )
         
+        if len(file_paths) > 1:
+            self.enqueue_files(list(file_paths))
+            return
+        
+        file_path = file_paths[0] if file_paths else None
         if file_path:
             try:
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                except UnicodeDecodeError:
-                    # 尝试其他编码
-                    with open(file_path, 'r', encoding='gbk') as f:
-                        content = f.read()
-                
+                content = read_ttml_file(file_path)
                 self.update_input_text_threaded(content)
                 logger.info(f"成功读取文件: {file_path}")
             except Exception as e:
@@ -750,9 +757,9 @@ class TTMLToLyricifySyllableApp:
     def copy_lyrics_to_clipboard(self):
         # 复制歌词内容到剪贴板
         try:
-            output_content = self.output_text.get(1.0, tk.END).strip()
+            output_content = (self.lyric_result if self.lyric_result is not None else self.output_text.get(1.0, tk.END)).strip()
             if output_content:
-                pyperclip.copy(output_content)
+                load_module('pyperclip').copy(output_content)
                 self.set_status("歌词写入剪切板成功")
                 logger.info("成功复制歌词内容到剪贴板")
             else:
@@ -766,9 +773,9 @@ class TTMLToLyricifySyllableApp:
     def copy_trans_to_clipboard(self):
         # 复制翻译内容到剪贴板
         try:
-            trans_content = self.trans_text.get(1.0, tk.END).strip()
+            trans_content = (self.trans_result if self.trans_result is not None else self.trans_text.get(1.0, tk.END)).strip()
             if trans_content:
-                pyperclip.copy(trans_content)
+                load_module('pyperclip').copy(trans_content)
                 self.set_status("翻译写入剪切板成功")
                 logger.info("成功复制翻译内容到剪贴板")
             else:
@@ -781,107 +788,241 @@ class TTMLToLyricifySyllableApp:
     
     def convert_ttml(self):
         # 转换TTML到Lyricify Syllable
-        ttml_content = self.input_text.get(1.0, tk.END).strip()
+        # 预览模式下文本框中只有部分内容，使用完整的输入
+        ttml_content = (self.input_source if self.input_source is not None else self.input_text.get(1.0, tk.END)).strip()
         
         if not ttml_content or ttml_content == "粘贴文本或拖动文件到此处":
             self.set_status("请先输入TTML内容")
             messagebox.showinfo("提示", "请先输入TTML内容")
             return
         
-        # 禁用转换按钮，防止重复点击
+        # 禁用转换按钮，防止重复点击；转换期间可以取消
         self.convert_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
         
         # 显示转换中状态
         self.set_status("正在转换...")
         self.root.update()
         
-        # 创建一个队列用于线程间通信
-        result_queue = Queue()
+        # 转换线程通过 dispatcher 将进度和结果直接投递到界面线程
+        streaming = self.streaming_enabled.get()
+        profile = self.profile_enabled.get()
+        report_path = None
+        self.cancel_event = cancel_event = threading.Event()
+        finished = False
+        context = TTMLContext(self.performance_enabled.get(),
+                              progress=lambda done, total: self.dispatcher.post(process_progress, done, total),
+                              cancel_event=cancel_event)
+        start_time = perf_counter()
         
         # 定义转换线程的工作函数
         def conversion_worker():
+            nonlocal report_path
             try:
-                success, lyric_text, trans_text = ttml_to_lyricify_syllable_text(ttml_content)
-                # 将结果放入队列
-                result_queue.put((success, lyric_text, trans_text))
+                if profile:
+                    # 性能分析时不使用缓存，报告写入 log 目录
+                    from ttml_profile import run_profiled
+                    (success, lyric_text, trans_text), report_path = run_profiled(
+                        log_dir, "GUI 转换", context, ttml_to_lyricify_syllable_text, ttml_content, streaming, context)
+                else:
+                    success, lyric_text, trans_text = ttml_to_lyricify_syllable_text(ttml_content, streaming, context,
+                                                                                     self.conversion_cache)
+                result = (success, lyric_text, trans_text)
+            except ConversionCancelled:
+                # 取消时投递 None
+                result = None
             except Exception as e:
-                # 发生异常时，将异常信息放入队列
-                result_queue.put((False, None, None, str(e)))
+                # 发生异常时，投递异常信息
+                result = (False, None, None, str(e))
+            self.dispatcher.post(process_result, result)
+        
+        # 显示最新的进度及处理速度
+        def process_progress(done, total):
+            if finished or cancel_event.is_set():
+                return
+            rate = done / max(perf_counter() - start_time, 1e-6)
+            if total:
+                self.show_progress(min(done / total, 0.99))
+                self.set_status(f"正在转换... {done}/{total} 行，{rate:.0f} 行/秒")
+            else:
+                self.set_status(f"正在转换... 已处理 {done} 行，{rate:.0f} 行/秒")
         
         # 定义处理转换结果的函数
-        def process_result():
-            # 检查队列中是否有结果
-            if not result_queue.empty():
-                # 获取结果
-                result = result_queue.get()
+        def process_result(result):
+            nonlocal finished
+            finished = True
+            self.show_progress(1)
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.cancel_event = None
+            
+            # 检查是否被取消或有异常
+            if result is None:
+                self.set_status("转换已取消")
+            elif len(result) == 4:
+                success, _, _, error_msg = result
+                self.set_status("转换失败，请检查TTML格式是否正确")
+                logger.exception(f"转换失败: {error_msg}")
+                messagebox.showerror("转换错误", f"转换过程中发生错误: {error_msg}")
                 
-                # 检查是否有异常
-                if len(result) == 4:
-                    success, _, _, error_msg = result
-                    self.set_status("转换失败，请检查TTML格式是否正确")
-                    logger.exception(f"转换失败: {error_msg}")
-                    messagebox.showerror("转换错误", f"转换过程中发生错误: {error_msg}")
+                # 显示详细错误信息
+                self.output_writer.cancel()
+                self.trans_writer.cancel()
+                self.lyric_result = self.trans_result = None
+                self.output_text.config(state=tk.NORMAL)
+                self.output_text.delete(1.0, tk.END)
+                self.output_text.insert(tk.END, f"转换错误: {error_msg}\n\n请检查TTML格式是否正确")
+                self.output_text.config(state=tk.DISABLED)
+            else:
+                success, lyric_text, trans_text = result
+                
+                if success:
+                    # 更新输出文本（大文本分片写入）
+                    self.show_results(lyric_text, trans_text)
                     
-                    # 显示详细错误信息
-                    self.output_text.config(state=tk.NORMAL)
-                    self.output_text.delete(1.0, tk.END)
-                    self.output_text.insert(tk.END, f"转换错误: {error_msg}\n\n请检查TTML格式是否正确")
-                    self.output_text.config(state=tk.DISABLED)
-                else:
-                    success, lyric_text, trans_text = result
+                    # 更新按钮状态
+                    self.copy_lyrics_btn.config(state=tk.NORMAL if lyric_text else tk.DISABLED)
+                    self.copy_trans_btn.config(state=tk.NORMAL if trans_text else tk.DISABLED)
                     
-                    if success:
-                        # 更新输出文本
-                        self.output_text.config(state=tk.NORMAL)
-                        self.output_text.delete(1.0, tk.END)
-                        self.output_text.insert(tk.END, lyric_text)
-                        self.output_text.config(state=tk.DISABLED)
-                        
-                        # 更新翻译文本
-                        self.trans_text.config(state=tk.NORMAL)
-                        self.trans_text.delete(1.0, tk.END)
-                        if trans_text:
-                            self.trans_text.insert(tk.END, trans_text)
-                        self.trans_text.config(state=tk.DISABLED)
-                        
-                        # 更新按钮状态
-                        self.copy_lyrics_btn.config(state=tk.NORMAL if lyric_text else tk.DISABLED)
-                        self.copy_trans_btn.config(state=tk.NORMAL if trans_text else tk.DISABLED)
-                        
-                        # 更新状态
-                        status_msg = "转换成功"
-                        if TTMLLine.have_pair > 0:
-                            status_msg += f"，移除了 {TTMLLine.have_pair} 处括号"
-                        self.set_status(status_msg)
-                    else:
-                        self.set_status("转换失败，请检查TTML格式是否正确")
-                
-                # 重新启用转换按钮
-                self.convert_btn.config(state=tk.NORMAL)
-                return
+                    # 更新状态
+                    status_msg = "转换成功（使用缓存）" if context.cache_hit else "转换成功"
+                    if context.have_pair > 0:
+                        status_msg += f"，移除了 {context.have_pair} 处括号"
+                    if report_path is not None:
+                        logger.info(f"性能分析报告: {report_path}")
+                        status_msg += f"，性能报告已写入 log/{os.path.basename(report_path)}"
+                    self.set_status(status_msg)
+                else:
+                    self.set_status("转换失败，请检查TTML格式是否正确")
             
-            # 如果队列为空，继续等待结果
-            self.root.after(100, process_result)
+            # 重新启用转换按钮
+            self.convert_btn.config(state=tk.NORMAL)
         
         # 启动转换线程
         conversion_thread = threading.Thread(target=conversion_worker)
         conversion_thread.daemon = True  # 设置为守护线程，随主线程退出而退出
         conversion_thread.start()
-        
-        # 开始检查结果
-        self.root.after(100, process_result)
     
     def set_status(self, message):
         # 更新状态消息
         self.status_label.config(text=f"提示: {message}")
         logger.trace(f"状态更新: {message}")
         
+    def cancel_conversion(self):
+        """请求取消当前转换，转换线程会在处理下一行之前停止"""
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.set_status("正在取消转换...")
+            logger.info("用户请求取消转换")
+
+    def show_results(self, lyric_text: str, trans_text: str | None, keep_position: bool = False):
+        """显示转换结果，复制按钮始终使用完整结果；keep_position 为 True 时保持输出框的滚动位置"""
+        self.lyric_result = lyric_text
+        self.trans_result = trans_text
+        lyric_position = self.output_text.yview()[0]
+        trans_position = self.trans_text.yview()[0]
+
+        def on_trans_done():
+            if keep_position:
+                self.output_text.yview_moveto(lyric_position)
+                self.trans_text.yview_moveto(trans_position)
+
+        # 歌词写完后再写翻译，进度条依次反映两者的写入进度
+        self.output_writer.write(self.preview(lyric_text),
+                                 lambda: self.trans_writer.write(self.preview(trans_text or ''), on_trans_done))
+
+    def on_input_modified(self, event=None):
+        """输入框内容变化时重新开始防抖计时"""
+        # 清除修改标记本身也会触发 <<Modified>>，此时标记为 False，直接忽略
+        if not self.input_text.edit_modified():
+            return
+        # 重置修改标记，下次修改时才会再次触发 <<Modified>>
+        self.input_text.edit_modified(False)
+        if self.auto_convert_enabled.get():
+            self.schedule_auto_convert()
+
+    def schedule_auto_convert(self):
+        if self.auto_convert_job is not None:
+            self.root.after_cancel(self.auto_convert_job)
+        self.auto_convert_job = self.root.after(AUTO_CONVERT_DELAY, self.auto_convert)
+
+    def on_auto_convert_change(self, *args):
+        enabled = self.auto_convert_enabled.get()
+        self.set_status(f"自动转换已{'启用' if enabled else '禁用'}")
+        if enabled:
+            self.schedule_auto_convert()
+
+    def auto_convert(self):
+        """在后台线程中增量转换当前输入，只重新解析改动过的行"""
+        self.auto_convert_job = None
+        if not self.auto_convert_enabled.get():
+            return
+        # 上一次自动转换尚未结束，结束后再转换一次
+        if self.auto_convert_running:
+            self.auto_convert_pending = True
+            return
+        # 手动转换或分片加载进行中时不自动转换，加载完成后会再次触发
+        if self.cancel_event is not None or self.input_writer.busy:
+            return
+
+        ttml_content = (self.input_source if self.input_source is not None else self.input_text.get(1.0, tk.END)).strip()
+        if not ttml_content or ttml_content == "粘贴文本或拖动文件到此处":
+            return
+
+        self.auto_convert_running = True
+        performance = self.performance_enabled.get()
+        start_time = perf_counter()
+
+        def auto_convert_worker():
+            try:
+                result = self.auto_converter.convert(ttml_content, performance)
+            except Exception as e:
+                logger.exception(f"自动转换失败: {str(e)}")
+                result = (False, None, None)
+            self.dispatcher.post(self._on_auto_convert_result, result, perf_counter() - start_time)
+
+        auto_convert_thread = threading.Thread(target=auto_convert_worker)
+        auto_convert_thread.daemon = True
+        auto_convert_thread.start()
+
+    def _on_auto_convert_result(self, result, elapsed: float):
+        """在主线程中原位更新自动转换的结果"""
+        self.auto_convert_running = False
+        success, lyric_text, trans_text = result
+        if success:
+            self.show_results(lyric_text, trans_text, keep_position=True)
+            self.copy_lyrics_btn.config(state=tk.NORMAL if lyric_text else tk.DISABLED)
+            self.copy_trans_btn.config(state=tk.NORMAL if trans_text else tk.DISABLED)
+            self.set_status(f"自动转换完成（{elapsed * 1000:.0f}ms），复用 {self.auto_converter.reused} 行，"
+                            f"重新解析 {self.auto_converter.parsed} 行")
+        else:
+            # 编辑过程中的文档经常暂时不合法，只提示不弹窗
+            self.set_status("自动转换失败，请检查TTML格式是否正确")
+
+        if self.auto_convert_pending:
+            self.auto_convert_pending = False
+            self.auto_convert()
+
+    def get_amll_client(self):
+        """返回共用的 AMLL DB 客户端，首次调用时创建并在后台清除过期的缓存"""
+        if self.amll_client is None:
+            amll_db = importlib.import_module('amll_db')
+            self.amll_client = amll_db.AMLLClient(os.path.join(cache_dir, 'amll'),
+                                                  os.environ.get('AMLL_DB_URL', amll_db.DEFAULT_BASE_URL))
+            threading.Thread(target=self.amll_client.evict, daemon=True).start()
+        return self.amll_client
+
     def open_amll_search(self):
         # 打开AMLL DB搜索窗口
         logger.info("打开 AMLL DB 搜索工具")
         search_window = AMLLSearchWindow(self.root, self)
         search_window.grab_set()  # 模态窗口
 
+    def open_amll_bulk(self):
+        # 打开AMLL DB批量获取窗口
+        logger.info("打开 AMLL DB 批量获取工具")
+        AMLLBulkWindow(self.root, self)
+
     def update_input_text_threaded(self, content):
         """在独立线程中更新输入文本框的内容"""
         # 禁用相关按钮
@@ -903,12 +1044,12 @@ class TTMLToLyricifySyllableApp:
                 # 从队列获取内容
                 text_content = content_queue.get()
                 
-                # 使用after方法在主线程中安全地更新UI
-                self.root.after(0, lambda: self._update_text_ui(text_content))
+                # 通过dispatcher在主线程中安全地更新UI
+                self.dispatcher.post(self._update_text_ui, text_content)
             except Exception as e:
                 logger.exception(f"文本更新失败: {str(e)}")
-                # 使用after方法在主线程中安全地显示错误
-                self.root.after(0, lambda: self._show_update_error(str(e)))
+                # 通过dispatcher在主线程中安全地显示错误
+                self.dispatcher.post(self._show_update_error, str(e))
         
         # 启动更新线程
         update_thread = threading.Thread(target=update_worker)
@@ -916,19 +1057,28 @@ class TTMLToLyricifySyllableApp:
         update_thread.start()
     
     def _update_text_ui(self, content):
-        """在主线程中实际更新UI"""
+        """在主线程中实际更新UI，大文本分片写入，预览模式下只显示开头部分"""
         try:
-            # 更新文本框
-            self.input_text.delete(1.0, tk.END)
-            self.input_text.insert(tk.END, content)
+            shown = self.preview(content)
+            is_preview = shown is not content
+            # 预览时文本框只读，转换使用保存的完整内容
+            self.input_source = content if is_preview else None
+            self.input_text.config(state=tk.NORMAL)
             
-            # 重新启用按钮
-            self.paste_btn.config(state=tk.NORMAL)
-            self.import_btn.config(state=tk.NORMAL)
-            self.convert_btn.config(state=tk.NORMAL)
+            def on_done():
+                if is_preview:
+                    self.input_text.config(state=tk.DISABLED)
+                
+                # 重新启用按钮
+                self.paste_btn.config(state=tk.NORMAL)
+                self.import_btn.config(state=tk.NORMAL)
+                self.convert_btn.config(state=tk.NORMAL)
+                
+                # 更新状态
+                self.set_status("内容已加载（预览）" if is_preview else "内容已加载")
             
-            # 更新状态
-            self.set_status("内容已加载")
+            # 更新文本框
+            self.input_writer.write(shown, on_done)
         except Exception as e:
             logger.exception(f"UI更新失败: {str(e)}")
             self._show_update_error(str(e))
@@ -1103,20 +1253,27 @@ class AMLLSearchWindow(tk.Toplevel):
             messagebox.showinfo("提示", "请输入音乐ID")
             return
         
+        # requests 仅在搜索时使用，首次搜索时才导入（在主线程中导入，缺失时可以直接提示）
+        try:
+            load_module('requests')
+            amll_db = importlib.import_module('amll_db')
+            client = self.main_app.get_amll_client()
+        except ImportError:
+            self.set_status("缺少requests库，无法搜索")
+            messagebox.showerror("错误", "缺少requests库，无法搜索歌词。请重新下载完整版本或联系开发者。")
+            return
+        
         # 平台代码映射
-        platform_code = {
-            "网易云": "ncm",
-            "QQ音乐": "qq",
-            "Apple Music": "am",
-            "Spotify": "spotify"
-        }.get(platform)
+        platform_code = amll_db.PLATFORM_CODES.get(platform)
         
         if not platform_code:
             self.set_status("不支持的平台")
             return
         
-        # 构建URL
-        url = f"https://amll-ttml-db.stevexmh.net/{platform_code}/{music_id}"
+        if not amll_db.MUSIC_ID_PATTERN.fullmatch(music_id):
+            self.set_status("音乐ID格式无效")
+            messagebox.showinfo("提示", "音乐ID只能包含字母、数字、下划线和连字符")
+            return
         
         # 禁用搜索按钮，防止重复点击
         self.search_btn.config(state=tk.DISABLED)
@@ -1125,97 +1282,85 @@ class AMLLSearchWindow(tk.Toplevel):
         self.set_status("正在搜索...")
         self.update_idletasks()
         
-        # 创建一个队列用于线程间通信
-        result_queue = Queue()
-        
-        # 定义搜索线程的工作函数
+        # 定义搜索线程的工作函数，结果通过 dispatcher 直接投递到界面线程
         def search_worker():
             try:
-                # 发送请求
-                response = requests.get(url, timeout=10)
-                
-                # 将结果放入队列
-                result_queue.put(("success", response))
+                # 发送请求（有效期内的结果直接从本地缓存读取）
+                response = client.fetch(platform_code, music_id)
+                result = ("success", response)
             except Exception as e:
-                # 发生异常时，将异常信息放入队列
-                result_queue.put(("error", str(e)))
+                # 发生异常时，投递异常信息
+                result = ("error", str(e))
+            self.main_app.dispatcher.post(process_result, *result)
         
         # 定义处理搜索结果的函数
-        def process_result():
-            # 检查队列中是否有结果
-            if not result_queue.empty():
-                # 获取结果
-                result_type, result_data = result_queue.get()
+        def process_result(result_type, result_data):
+            # 搜索窗口可能已被关闭
+            if not self.winfo_exists():
+                return
+            
+            if result_type == "success":
+                # 搜索成功
+                response = result_data
                 
-                if result_type == "success":
-                    # 搜索成功
-                    response = result_data
+                # 检查响应
+                if response.status_code == 200:
+                    # 保存搜索结果
+                    self.search_result = response.text
                     
-                    # 检查响应
-                    if response.status_code == 200:
-                        # 保存搜索结果
-                        self.search_result = response.text
-                        
-                        # 更新预览
-                        self.result_text.config(state=tk.NORMAL)
-                        self.result_text.delete(1.0, tk.END)
-                        self.result_text.insert(tk.END, self.search_result)
-                        self.result_text.config(state=tk.DISABLED)
-                        
-                        # 启用按钮
-                        self.import_btn.config(state=tk.NORMAL)
-                        self.copy_btn.config(state=tk.NORMAL)
-                        
-                        self.set_status("搜索成功!")
-                    else:
-                        self.set_status(f"搜索失败: HTTP {response.status_code}")
-                        self.result_text.config(state=tk.NORMAL)
-                        self.result_text.delete(1.0, tk.END)
-                        self.result_text.insert(tk.END, f"搜索失败: HTTP {response.status_code}\n\n可能的原因:\n- 歌曲ID不存在\n- 该平台未收录此歌曲\n- 服务器暂时不可用")
-                        self.result_text.config(state=tk.DISABLED)
-                        
-                        # 禁用按钮
-                        self.import_btn.config(state=tk.DISABLED)
-                        self.copy_btn.config(state=tk.DISABLED)
-                else:
-                    # 发生异常
-                    error_msg = result_data
-                    # 统一错误提示信息
-                    error_tip = "搜索出错: 请检查网络或尝试使用VPN或代理"
-                    self.set_status(error_tip)
+                    # 更新预览
+                    self.result_text.config(state=tk.NORMAL)
+                    self.result_text.delete(1.0, tk.END)
+                    self.result_text.insert(tk.END, self.search_result)
+                    self.result_text.config(state=tk.DISABLED)
                     
-                    logger.exception(f"AMLL搜索出错: {error_msg}")
+                    # 启用按钮
+                    self.import_btn.config(state=tk.NORMAL)
+                    self.copy_btn.config(state=tk.NORMAL)
                     
+                    self.set_status("搜索成功!" if response.source == "network" else "搜索成功!（使用本地缓存）")
+                else:
+                    self.set_status(f"搜索失败: HTTP {response.status_code}")
                     self.result_text.config(state=tk.NORMAL)
                     self.result_text.delete(1.0, tk.END)
-                    # 统一网络错误提示
-                    if "Connection" in error_msg or "远程主机" in error_msg or "timeout" in error_msg or "refused" in error_msg:
-                        self.result_text.insert(tk.END, "搜索错误：请检查网络或尝试使用VPN或代理\n\n")
-                    else:
-                        self.result_text.insert(tk.END, f"搜索出错: {error_msg}\n\n请检查网络或尝试使用VPN或代理\n\n")
-                    
-                    # 添加完整错误信息
-                    self.result_text.insert(tk.END, f"完整错误信息:\n{error_msg}")
+                    self.result_text.insert(tk.END, f"搜索失败: HTTP {response.status_code}\n\n可能的原因:\n- 歌曲ID不存在\n- 该平台未收录此歌曲\n- 服务器暂时不可用")
                     self.result_text.config(state=tk.DISABLED)
                     
-                    # 禁用导入按钮但启用复制按钮（方便复制错误信息）
+                    # 禁用按钮
                     self.import_btn.config(state=tk.DISABLED)
-                    self.copy_btn.config(state=tk.NORMAL)
+                    self.copy_btn.config(state=tk.DISABLED)
+            else:
+                # 发生异常
+                error_msg = result_data
+                # 统一错误提示信息
+                error_tip = "搜索出错: 请检查网络或尝试使用VPN或代理"
+                self.set_status(error_tip)
                 
-                # 重新启用搜索按钮
-                self.search_btn.config(state=tk.NORMAL)
-                return
+                logger.exception(f"AMLL搜索出错: {error_msg}")
+                
+                self.result_text.config(state=tk.NORMAL)
+                self.result_text.delete(1.0, tk.END)
+                # 统一网络错误提示
+                if "Connection" in error_msg or "远程主机" in error_msg or "timeout" in error_msg or "refused" in error_msg:
+                    self.result_text.insert(tk.END, "搜索错误：请检查网络或尝试使用VPN或代理\n\n")
+                else:
+                    self.result_text.insert(tk.END, f"搜索出错: {error_msg}\n\n请检查网络或尝试使用VPN或代理\n\n")
+                
+                # 添加完整错误信息
+                self.result_text.insert(tk.END, f"完整错误信息:\n{error_msg}")
+                self.result_text.config(state=tk.DISABLED)
+                
+                # 禁用导入按钮但启用复制按钮（方便复制错误信息）
+                self.import_btn.config(state=tk.DISABLED)
+                self.copy_btn.config(state=tk.NORMAL)
             
-            # 如果队列为空，继续等待结果
-            self.after(100, process_result)
+            # 重新启用搜索按钮
+            self.search_btn.config(state=tk.NORMAL)
         
         # 启动搜索线程
         search_thread = threading.Thread(target=search_worker)
         search_thread.daemon = True  # 设置为守护线程，随主线程退出而退出
         search_thread.start()
-        
-        # 开始检查结果
-        self.after(100, process_result)
     
     def import_result(self):
         # 导入搜索结果到主窗口
@@ -1228,34 +1373,372 @@ class AMLLSearchWindow(tk.Toplevel):
         # 复制搜索结果到剪贴板
         if self.search_result:
             try:
-                pyperclip.copy(self.search_result)
+                load_module('pyperclip').copy(self.search_result)
                 self.set_status("已复制到剪贴板")
             except Exception as e:
                 self.set_status(f"复制失败: {str(e)}")
                 logger.exception(f"复制到剪贴板失败: {str(e)}")
 
+class AMLLBulkWindow(tk.Toplevel):
+    """从 AMLL DB 批量获取歌词：每行一个 平台:音乐ID，下载后转换并输出 .lys / _trans.lrc 文件"""
+    def __init__(self, parent, main_app):
+        super().__init__(parent)
+        self.title("从 AMLL DB 批量获取")
+        self.geometry("500x360")
+        self.current_theme = main_app.current_theme
+        theme_colors = main_app.DARK_THEME if self.current_theme == "Dark" else main_app.LIGHT_THEME
+        self.configure(bg=theme_colors["bg"])
+        self.resizable(False, False)
+        
+        # 设置图标（如果有）
+        try:
+            icon_path = get_resource_path("icon.ico")
+            if os.path.exists(icon_path):
+                self.iconbitmap(icon_path)
+        except Exception as e:
+            logger.warning(f"AMLL批量获取窗口加载图标失败: {str(e)}")
+        
+        self.main_app = main_app
+        self.output_dir = os.path.join(get_app_path(), 'output')
+        self.cancel_event: threading.Event | None = None
+        
+        self.create_widgets()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        
+        logger.debug("AMLL DB 批量获取窗口已初始化")
+    
+    def create_widgets(self):
+        main_frame = ttk.Frame(self)
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        ttk.Label(main_frame, text="每行一个 平台:音乐ID（平台为 ncm/qq/am/spotify，如 ncm:123456）").pack(anchor=tk.W, pady=(0, 5))
+        
+        theme_colors = self.main_app.DARK_THEME if self.current_theme == "Dark" else self.main_app.LIGHT_THEME
+        self.id_text = tk.Text(main_frame, wrap=tk.NONE, bg=theme_colors["text_bg"], fg=theme_colors["text_fg"], height=10)
+        self.id_text.pack(fill=tk.BOTH, expand=True)
+        
+        # 输出目录
+        dir_frame = ttk.Frame(main_frame)
+        dir_frame.pack(fill=tk.X, pady=(10, 0))
+        self.dir_label = ttk.Label(dir_frame, text=f"输出目录: {self.output_dir}")
+        self.dir_label.pack(side=tk.LEFT)
+        ttk.Button(dir_frame, text="选择", command=self.choose_output_dir).pack(side=tk.RIGHT)
+        
+        # 进度
+        self.progress_var = tk.DoubleVar(value=0)
+        ttk.Progressbar(main_frame, variable=self.progress_var, maximum=100).pack(fill=tk.X, pady=(10, 0))
+        self.status_label = ttk.Label(main_frame, text="")
+        self.status_label.pack(anchor=tk.W, pady=(5, 0))
+        
+        # 底部按钮
+        bottom_frame = ttk.Frame(self)
+        bottom_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        
+        self.close_btn = ttk.Button(bottom_frame, text="关闭", command=self.close)
+        self.close_btn.pack(side=tk.LEFT)
+        
+        self.start_btn = ttk.Button(bottom_frame, text="开始", command=self.start)
+        self.start_btn.pack(side=tk.RIGHT)
+        
+        self.cancel_btn = ttk.Button(bottom_frame, text="取消", command=self.cancel, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.RIGHT, padx=(0, 5))
+    
+    def set_status(self, message):
+        self.status_label.config(text=message)
+        logger.info(f"AMLL批量获取状态更新: {message}")
+    
+    def choose_output_dir(self):
+        output_dir = filedialog.askdirectory(parent=self, initialdir=self.output_dir)
+        if output_dir:
+            self.output_dir = output_dir
+            self.dir_label.config(text=f"输出目录: {self.output_dir}")
+    
+    def start(self):
+        # requests 仅在获取时使用，首次获取时才导入
+        try:
+            load_module('requests')
+            amll_db = importlib.import_module('amll_db')
+            client = self.main_app.get_amll_client()
+        except ImportError:
+            self.set_status("缺少requests库，无法获取")
+            messagebox.showerror("错误", "缺少requests库，无法获取歌词。请重新下载完整版本或联系开发者。", parent=self)
+            return
+        
+        try:
+            items = amll_db.parse_id_list(self.id_text.get(1.0, tk.END).splitlines())
+        except ValueError as e:
+            self.set_status(str(e))
+            messagebox.showinfo("提示", str(e), parent=self)
+            return
+        if not items:
+            self.set_status("请输入音乐ID")
+            return
+        
+        self.start_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
+        self.progress_var.set(0)
+        self.set_status(f"正在获取 {len(items)} 首歌曲...")
+        
+        self.cancel_event = cancel_event = threading.Event()
+        streaming = self.main_app.streaming_enabled.get()
+        output_dir = self.output_dir
+        start_time = perf_counter()
+        
+        # 工作线程通过 dispatcher 将进度和结果投递到界面线程
+        def bulk_worker():
+            try:
+                result = amll_db.bulk_fetch_convert(client, items, output_dir, streaming=streaming,
+                                                    progress=lambda done, total: self.main_app.dispatcher.post(process_progress, done, total),
+                                                    cancel_event=cancel_event)
+            except Exception as e:
+                logger.exception(f"批量获取出错: {str(e)}")
+                result = str(e)
+            self.main_app.dispatcher.post(process_result, result)
+        
+        def process_progress(done, total):
+            if not self.winfo_exists() or cancel_event.is_set():
+                return
+            rate = done / max(perf_counter() - start_time, 1e-6)
+            self.progress_var.set(done / total * 100)
+            self.set_status(f"正在获取... {done}/{total}，{rate:.1f} 首/秒")
+        
+        def process_result(report):
+            self.cancel_event = None
+            if not self.winfo_exists():
+                return
+            self.start_btn.config(state=tk.NORMAL)
+            self.cancel_btn.config(state=tk.DISABLED)
+            if isinstance(report, str):
+                self.set_status(f"批量获取出错: {report}")
+                return
+            
+            status_msg = (f"{'已取消，' if report.cancelled else ''}成功 {len(report.succeeded)}，失败 {len(report.failed)}，"
+                          f"{report.rate:.1f} 首/秒")
+            self.set_status(status_msg)
+            if report.failed:
+                # 在列表中只保留失败的条目，方便重试
+                self.id_text.delete(1.0, tk.END)
+                self.id_text.insert(tk.END, "\n".join(f"{platform_code}:{music_id}  # {reason}"
+                                                       for platform_code, music_id, reason in report.failed))
+        
+        threading.Thread(target=bulk_worker, daemon=True).start()
+    
+    def cancel(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.set_status("正在取消，等待进行中的下载完成...")
+    
+    def close(self):
+        self.cancel()
+        self.destroy()
+
+class ConversionQueueWindow(tk.Toplevel):
+    """多文件转换队列：在后台进程池中并行转换，输出 .lys / _trans.lrc 到源文件旁或指定目录"""
+    # 队列中各任务的状态
+    WAITING, DONE, FAILED, CANCELLED = "等待", "完成", "失败", "已取消"
+    
+    def __init__(self, parent, main_app):
+        super().__init__(parent)
+        self.title("转换队列")
+        self.geometry("640x400")
+        self.current_theme = main_app.current_theme
+        theme_colors = main_app.DARK_THEME if self.current_theme == "Dark" else main_app.LIGHT_THEME
+        self.configure(bg=theme_colors["bg"])
+        
+        # 设置图标（如果有）
+        try:
+            icon_path = get_resource_path("icon.ico")
+            if os.path.exists(icon_path):
+                self.iconbitmap(icon_path)
+        except Exception as e:
+            logger.warning(f"转换队列窗口加载图标失败: {str(e)}")
+        
+        self.main_app = main_app
+        self.output_dir: str | None = None  # None 表示输出到源文件所在目录
+        self.executor = None
+        # 任务 ID -> (文件路径, Future)
+        self.jobs: dict[str, tuple] = {}
+        # 完成回调已执行（界面和计数已更新）的任务 ID
+        self.handled: set[str] = set()
+        self.pending = 0
+        self.finished = 0
+        self.failed = 0
+        self.start_time = 0.0
+        
+        self.create_widgets()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        
+        logger.debug("转换队列窗口已初始化")
+    
+    def create_widgets(self):
+        main_frame = ttk.Frame(self)
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        # 任务列表
+        self.job_tree = ttk.Treeview(main_frame, columns=("status", "detail"), height=12)
+        self.job_tree.heading("#0", text="文件")
+        self.job_tree.heading("status", text="状态")
+        self.job_tree.heading("detail", text="详情")
+        self.job_tree.column("#0", width=280)
+        self.job_tree.column("status", width=60, anchor=tk.CENTER)
+        self.job_tree.column("detail", width=260)
+        scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=self.job_tree.yview)
+        self.job_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.job_tree.pack(fill=tk.BOTH, expand=True)
+        
+        # 输出目录
+        dir_frame = ttk.Frame(self)
+        dir_frame.pack(fill=tk.X, padx=10)
+        self.dir_label = ttk.Label(dir_frame, text="输出目录: 源文件所在目录")
+        self.dir_label.pack(side=tk.LEFT)
+        ttk.Button(dir_frame, text="源文件目录", command=lambda: self.set_output_dir(None)).pack(side=tk.RIGHT)
+        ttk.Button(dir_frame, text="选择", command=self.choose_output_dir).pack(side=tk.RIGHT, padx=(0, 5))
+        
+        # 底部按钮
+        bottom_frame = ttk.Frame(self)
+        bottom_frame.pack(fill=tk.X, padx=10, pady=10)
+        
+        self.status_label = ttk.Label(bottom_frame, text="")
+        self.status_label.pack(side=tk.LEFT)
+        
+        ttk.Button(bottom_frame, text="清除已完成", command=self.clear_finished).pack(side=tk.RIGHT)
+        self.cancel_btn = ttk.Button(bottom_frame, text="取消", command=self.cancel, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.RIGHT, padx=(0, 5))
+    
+    def set_output_dir(self, output_dir: str | None):
+        self.output_dir = output_dir
+        self.dir_label.config(text=f"输出目录: {output_dir or '源文件所在目录'}")
+    
+    def choose_output_dir(self):
+        output_dir = filedialog.askdirectory(parent=self)
+        if output_dir:
+            self.set_output_dir(output_dir)
+    
+    def get_executor(self):
+        """首次添加任务时创建进程池，进程数为 CPU 核心数"""
+        if self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, initializer=worker_init)
+        return self.executor
+    
+    def add_files(self, files: list[tuple[str, str]]):
+        """将文件（collect_ttml_files 的结果）加入队列并立即提交到进程池，新加入的文件使用当前的输出目录
+
+        输出目录中保持拖入目录的结构；输出路径与前面的文件重复的文件不转换，直接标记为失败
+        """
+        from concurrent.futures import Future
+        executor = self.get_executor()
+        streaming = self.main_app.streaming_enabled.get()
+        if not self.pending:
+            self.start_time = perf_counter()
+            self.finished = self.failed = 0
+        planned, conflicts = plan_outputs(files, self.output_dir)
+        jobs = [(path, out_dir, None) for path, out_dir in planned]
+        jobs += [(path, None, f"输出路径与 {owner} 相同，未转换") for path, owner in conflicts]
+        for path, out_dir, error in jobs:
+            job_id = self.job_tree.insert("", tk.END, text=os.path.basename(path), values=(self.WAITING, path))
+            if error is None:
+                future = executor.submit(convert_file_in_worker, path, out_dir, streaming)
+            else:
+                # 与转换失败的结果相同，经由同样的完成回调更新界面
+                future = Future()
+                future.set_result((path, False, error, 0, False, 0.0))
+            self.jobs[job_id] = (path, future)
+            self.pending += 1
+            # 完成回调在进程池的管理线程中执行，通过 dispatcher 回到界面线程
+            future.add_done_callback(lambda f, job_id=job_id: self.main_app.dispatcher.post(self.on_job_done, job_id, f))
+        self.cancel_btn.config(state=tk.NORMAL)
+        self.update_summary()
+        logger.info(f"转换队列新增 {len(files)} 个文件")
+    
+    def on_job_done(self, job_id, future):
+        self.pending -= 1
+        if not self.winfo_exists() or job_id not in self.jobs:
+            return
+        if future.cancelled():
+            self.job_tree.item(job_id, values=(self.CANCELLED, self.jobs[job_id][0]))
+        else:
+            try:
+                _, success, lyric_path, have_pair, _, elapsed = future.result()
+            except Exception as e:
+                success, lyric_path, have_pair, elapsed = False, str(e), 0, 0.0
+            self.finished += 1
+            if success:
+                detail = f"{elapsed * 1000:.0f}ms，移除 {have_pair} 处括号 → {lyric_path}"
+                self.job_tree.item(job_id, values=(self.DONE, detail))
+            else:
+                self.failed += 1
+                self.job_tree.item(job_id, values=(self.FAILED, lyric_path or "请检查TTML格式是否正确"))
+        self.handled.add(job_id)
+        if not self.pending:
+            self.cancel_btn.config(state=tk.DISABLED)
+        self.update_summary()
+    
+    def update_summary(self):
+        total = self.finished + self.pending
+        rate = self.finished / max(perf_counter() - self.start_time, 1e-6)
+        message = f"队列: 完成 {self.finished}/{total}，失败 {self.failed}，{rate:.1f} 文件/秒"
+        self.status_label.config(text=message)
+        self.main_app.set_status(message)
+    
+    def cancel(self):
+        """取消尚未开始的任务，已开始的任务会继续完成"""
+        for _, future in self.jobs.values():
+            future.cancel()
+        self.cancel_btn.config(state=tk.DISABLED)
+    
+    def clear_finished(self):
+        # 只清除完成回调已执行的任务：Future 已完成时回调可能仍在 dispatcher 中等待执行
+        for job_id in self.handled:
+            self.job_tree.delete(job_id)
+            del self.jobs[job_id]
+        self.handled.clear()
+    
+    def close(self):
+        self.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.main_app.queue_window = None
+        self.destroy()
+
 # 主函数
-def main():
-    # 根据是否成功导入tkinterdnd2创建根窗口
-    if HAS_DND:
-        root = TkinterDnD.Tk()
-        logger.info("使用TkinterDnD创建窗口，拖放功能已启用")
-    else:
-        root = tk.Tk()
-        logger.warning("使用普通Tk创建窗口，拖放功能不可用")
+def main(report_startup: bool = False):
+    """启动GUI；report_startup 为 True 时在窗口首次绘制后输出冷启动耗时报告，并追加到 log/startup.log"""
+    # 使用普通的 Tk 创建根窗口，拖放功能在首次绘制后加载
+    root = tk.Tk()
     
     # 创建应用
     app = TTMLToLyricifySyllableApp(root)
+
+    def on_first_paint():
+        # 空闲回调在已排队的界面绘制任务之后执行，此时窗口已完成首次绘制
+        startup_report.mark_first_paint()
+        logger.info(f"启动耗时统计 - {startup_report.summary()}")
+        if report_startup:
+            print(startup_report.summary())
+            startup_report.save(os.path.join(log_dir, 'startup.log'), globals().get('VERSION'))
+
+    root.after_idle(on_first_paint)
+    # 空闲回调按注册顺序执行：首次绘制之后再加载拖放功能、检测系统主题
+    root.after_idle(app.setup_drag_drop)
+    root.after_idle(app.detect_system_theme)
     
     # 运行主循环
     root.mainloop()
 
 if __name__ == "__main__":
+    # 打包后的程序中转换队列的子进程需要
+    from multiprocessing import freeze_support
+    freeze_support()
+    
     # 设置版本信息
     VERSION = "v1.3.0"
     print(f"\nTTML转Lyricify Syllable工具 {VERSION} - GUI版本")
     print("基于 TTML_to_Lyricify_Syllable_Tool 开发")
     print("项目地址：https://github.com/MiaowCham/TTML_to_Lyricify_Syllable_Tool\n")
     
-    # 启动应用
-    main()
\ No newline at end of file
+    # 启动应用（--startup-report 或环境变量 TTML_STARTUP_REPORT=1 时输出冷启动耗时报告）
+    main('--startup-report' in sys.argv[1:] or os.environ.get('TTML_STARTUP_REPORT') == '1')
\ No newline at end of file
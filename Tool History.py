@@ -1,13 +1,12 @@
 #-*- coding: UTF-8-*-
 #记得改一下版本号（
+import argparse
 import os
-from re import compile, Pattern, Match
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import string
 import sys
-import xml
-from typing import Iterator, TextIO, AnyStr
-from xml.dom.minicompat import NodeList
-from xml.dom.minidom import Document, Element
+import time
 
 from pip import main as pip_main
 
@@ -42,317 +41,423 @@ def setup_logger(input_path: str):
         return True
     return False
 
-class TTMLTime:
-    __pattern: Pattern = compile(r'\d+')
-
-    def __init__(self, centi: str = ''):
-        if centi == '': return
-        # 使用 finditer 获取匹配的迭代器
-        matches: Iterator[Match[str]] = TTMLTime.__pattern.finditer(centi)
-        # 获取下一个匹配
-        iterator: Iterator[Match[str]] = iter(matches)  # 将匹配对象转换为迭代器
-
-        self.__minute: int = int(next(iterator).group())
-        self.__second: int = int(next(iterator).group())
-        self.__micros: int = int(next(iterator).group())
-
-    def __str__(self) -> str:
-        return f'{self.__minute:02}:{self.__second:02}.{self.__micros:03}'
-
-    def __int__(self) -> int:
-        return (self.__minute * 60 + self.__second) * 1000 + self.__micros
-
-    def __ge__(self, other) -> bool:
-        return (self.__minute, self.__second, self.__micros) >= (other.__minute, other.__second, other.__micros)
-
-    def __ne__(self, other) -> bool:
-        return (self.__minute, self.__second, self.__micros) != (other.__minute, other.__second, other.__micros)
-
-    def __sub__(self, other) -> int:
-        return abs(int(self) - int(other))
-
-
-class TTMLSyl:
-    def __init__(self, element: Element):
-        self.__element: Element = element
-
-        self.__begin: TTMLTime = TTMLTime(element.getAttribute("begin"))
-        self.__end: TTMLTime = TTMLTime(element.getAttribute("end"))
-        self.text: str = element.childNodes[0].nodeValue
-
-    def __str__(self) -> str:
-        return f'{self.text}({int(self.__begin)},{self.__end - self.__begin})'
-
-    def get_begin(self) -> TTMLTime:
-        return self.__begin
-
-    def get_end(self) -> TTMLTime:
-        return self.__end
-
-
-class TTMLLine:
-    have_ts: bool = False
-    have_duet: bool = False
-    have_bg: bool = False
-    have_pair: int = 0
-
-    __before: Pattern[AnyStr] = compile(r'^\({2,}')
-    __after: Pattern[AnyStr] = compile(r'\){2,}$')
-
-    def __init__(self, element: Element, is_bg: bool = False):
-        self.__element: Element = element
-        self.__orig_line: list[TTMLSyl | str] = []
-        self.__ts_line: str | None = None
-        self.__bg_line: TTMLLine | None = None
-        self.__is_bg: bool = is_bg
-
-        TTMLLine.have_bg |= is_bg
-
-        # 获取传入元素的 agent 属性
-        agent: string = element.getAttribute("ttm:agent")
-        self.__is_duet: bool = bool(agent and agent != 'v1')
-
-        # 获取 <p> 元素的所有子节点，包括文本节点
-        child_elements: list[Element] = element.childNodes  # iter() 会返回所有子元素和文本节点
-
-        # 遍历所有子元素
-        for child in child_elements:
-            if child.nodeType == 3 and child.nodeValue:  # 如果是文本节点（例如空格或换行）
-                if len(self.__orig_line) > 0 and len(child.nodeValue) < 2:
-                    self.__orig_line[-1].text += child.nodeValue
-                else:
-                    self.__orig_line.append(child.nodeValue)
+# 转换核心位于 ttml_converter，与 GUI 共用
+from ttml_converter import ConversionCache, TTMLContext, collect_ttml_files, convert_file_in_worker, plan_outputs, \
+    render_lys, ttml_to_lys, worker_init, write_text_atomic
+
+# 转换缓存目录，与日志文件夹相邻
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+
+def run_batch(patterns: list[str], output_dir: str | None = None, jobs: int | None = None, streaming: bool = False,
+              use_cache: bool = False) -> int:
+    """批量转换入口，返回退出码（有失败文件时为 1）"""
+    files = collect_ttml_files(patterns)
+    if not files:
+        print("\033[91m没有找到TTML文件\033[0m")
+        return 1
+
+    if output_dir is None:
+        output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output')
+    # 输出目录中保持输入的目录结构；输出路径仍然重复的文件（如不同输入目录中的同名文件）不转换
+    planned, conflicts = plan_outputs(files, output_dir)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(files)))
+    print(f"共找到 {len(files)} 个TTML文件，使用 {jobs} 个进程转换")
+
+    failures: list[str] = []
+    for path, owner in conflicts:
+        failures.append(path)
+        print(f"\033[91m输出路径重复，未转换: {path}（与 {owner} 相同）\033[0m")
+    pairs: int = 0
+    cached: int = 0
+    if use_cache:
+        # 清除长期未使用的磁盘缓存，避免缓存目录无限增长
+        ConversionCache(cache_dir=cache_dir).evict()
+    start = time.perf_counter()
+    # 每个文件在子进程中使用独立的 TTMLContext（性能模式），统计信息随结果一起传回主进程
+    worker = partial(convert_file_in_worker, streaming=streaming)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=worker_init,
+                             initargs=(use_cache, cache_dir if use_cache else None)) as executor:
+        for path, success, _, have_pair, cache_hit, _ in executor.map(worker, *zip(*planned),
+                                                                      chunksize=max(1, len(files) // (jobs * 4))):
+            if success:
+                pairs += have_pair
+                cached += cache_hit
             else:
-                # 获取 <span> 中的属性
-                role: str = child.getAttribute("ttm:role")
-
-                # 没有role代表是一个syl
-                if role == "":
-                    if child.childNodes[0].nodeValue:
-                        self.__orig_line.append(TTMLSyl(child))
-
-                elif role == "x-bg":
-                    # 和声行
-                    self.__bg_line = TTMLLine(child, True)
-                    self.__bg_line.__is_duet = self.__is_duet
-                elif role == "x-translation":
-                    # 翻译行
-                    TTMLLine.have_ts = True
-                    self.__ts_line = f'{child.childNodes[0].data}'
-
-        if len(self.__orig_line) != 1 or type(self.__orig_line[0]) != str:
-            self.__begin = self.__orig_line[0].get_begin()
-            self.__end = self.__orig_line[0].get_end()
+                failures.append(path)
+                print(f"\033[91m转换失败: {path}\033[0m")
+    elapsed = time.perf_counter() - start
+
+    cache_info = f"未变化（使用缓存）: {cached}\n" if use_cache else ""
+    print(f"\n================================\n"
+          f"\033[93m批量转换完成\033[0m\n"
+          f"文件总数: {len(files)}，成功: {len(files) - len(failures)}，失败: {len(failures)}\n"
+          f"{cache_info}"
+          f"耗时: {elapsed:.2f} 秒，速度: {len(files) / elapsed:.1f} 文件/秒\n"
+          f"共移除 {pairs} 处括号\n"
+          f"================================")
+    return 1 if failures else 0
+
+def run_amll_bulk(list_path: str, output_dir: str | None = None, jobs: int | None = None, streaming: bool = False,
+                  retries: int = 3, base_url: str | None = None) -> int:
+    """从 AMLL DB 批量下载并转换 平台:音乐ID 列表（"-" 表示从标准输入读取），返回退出码（有失败条目时为 1）"""
+    # requests 仅在此模式中使用
+    from amll_db import DEFAULT_BASE_URL, AMLLClient, bulk_fetch_convert, parse_id_list
+
+    try:
+        if list_path == '-':
+            items = parse_id_list(sys.stdin)
         else:
-            self.__begin: TTMLTime = TTMLTime(element.getAttribute("begin"))
-            self.__end: TTMLTime = TTMLTime(element.getAttribute("end"))
-
-        if is_bg:
-            if TTMLLine.__before.search(self.__orig_line[0] if type(self.__orig_line[0]) == str else self.__orig_line[0].text):
-                if type(self.__orig_line[0]) == str:
-                    self.__orig_line[0] = TTMLLine.__before.sub('(', self.__orig_line[0])
-                else:
-                    self.__orig_line[0].text = TTMLLine.__before.sub('(', self.__orig_line[0].text)
-                TTMLLine.have_pair += 1
-            if TTMLLine.__after.search(self.__orig_line[-1] if type(self.__orig_line[-1]) == str else self.__orig_line[-1].text):
-                if type(self.__orig_line[-1]) == str:
-                    self.__orig_line[-1] = TTMLLine.__after.sub(')', self.__orig_line[-1])
-                else:
-                    self.__orig_line[-1].text = TTMLLine.__after.sub(')', self.__orig_line[-1].text)
-                TTMLLine.have_pair += 1
-
-    def __role(self) -> int:
-        return ((int(TTMLLine.have_bg) + int(self.__is_bg)) * 3
-                + int(TTMLLine.have_duet) + int(self.__is_duet))
-
-    def __raw(self) -> tuple[str, str | None]:
-        return (f'[{self.__role()}]' + (''.join([str(v) for v in self.__orig_line] if len(self.__orig_line) != 1 or type(
-            self.__orig_line[0]) != str else f'{self.__orig_line[0]}({int(self.__begin)},{self.__end - self.__begin})')),
-                f'[{self.__begin}]{self.__ts_line}' if self.__ts_line else None)
-
-    def to_str(self) -> tuple[tuple[str, str | None], tuple[str, str | None] | None]:
-        return self.__raw(), (self.__bg_line.__raw() if self.__bg_line else None)
-
-def ttml_to_lys(input_path):
-    """主转换函数"""
-    TTMLLine.have_duet = False
-    TTMLLine.have_bg = False
-    TTMLLine.have_ts = False
-    TTMLLine.have_pair = 0
-
-    lyric_path: str = ''
-    trans_path: str = ''
+            with open(list_path, encoding='utf8') as f:
+                items = parse_id_list(f)
+    except (OSError, ValueError) as e:
+        print(f"\033[91m无法读取ID列表: {str(e)}\033[0m")
+        return 1
+    if not items:
+        print("\033[91mID列表为空\033[0m")
+        return 1
+
+    if output_dir is None:
+        output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output')
+    jobs = max(1, jobs or 8)
+    print(f"共 {len(items)} 首歌曲，使用 {jobs} 个并发下载")
+
+    # 每个下载线程保持一个连接
+    client = AMLLClient(os.path.join(cache_dir, 'amll'), base_url or DEFAULT_BASE_URL, pool_size=jobs)
+    # 逐行日志在多线程下没有意义，只保留警告
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
     try:
-        # 解析XML文件
-        logger.debug(f"尝试解析XML文件")
-        dom: Document = xml.dom.minidom.parse(input_path)  # 假设文件名是 'books.xml'
-        tt: Document = dom.documentElement  # 获取根元素
-
-        # 获取tt中的body/head元素
-        logger.debug(f"尝试获取tt中的body/head元素")
-        body: Element = tt.getElementsByTagName('body')[0]
-        head: Element = tt.getElementsByTagName('head')[0]
-
-        if body and head:
-            # 获取body/head中的<div>/<metadata>子元素
-            logger.debug(f"尝试获取<div>/<metadata>子元素")
-            div: Element = body.getElementsByTagName('div')[0]
-            metadata: Element = head.getElementsByTagName('metadata')[0]
-
-            # 获取div中的所有<p>子元素
-            logger.debug(f"尝试获取div中的所有<p>子元素")
-            p_elements: NodeList[Element] = div.getElementsByTagName('p')
-            agent_elements: NodeList[Element] = metadata.getElementsByTagName('ttm:agent')
-
-            # 检查是否有对唱
-            logger.debug(f"检查是否有对唱")
-            for meta in agent_elements:
-                if meta.getAttribute('xml:id') != 'v1':
-                    TTMLLine.have_duet = True
-                    logger.debug(f"发现对唱")
-
-            lines: list[TTMLLine] = []
-            # 遍历每个<p>元素
-            logger.debug(f"开始执行转换")
-            for p in p_elements:
-                lines.append(TTMLLine(p))
-                # 打印行
-                logger.info(f"TTML第{p_elements.index(p)}行转换结果：{lines[-1].to_str()[0][0]}")
-
-            print(f"实时转换结果可能与实际输出有差异，请以实际输出为准")
-            
-            # 获取当前.py文件的目录路径
-            logger.debug(f"获取脚本所在的目录路径")
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-
-            # 创建output目录（如果不存在的话）
-            logger.debug(f"创建output目录（如果不存在的话）")
-            output_dir = os.path.join(script_dir, 'output')
-            os.makedirs(output_dir, exist_ok=True)  # 确保目录存在
-
-            # 修改路径
-            base_name = os.path.splitext(input_path)[0]
-
-            lyric_file: TextIO|None = None
-            trans_file: TextIO|None = None
-
-            lyric_path = os.path.join(output_dir, f"{os.path.basename(base_name)}.lys")
-            lyric_file = open(lyric_path, 'w', encoding='utf8')
-            logger.debug(f"写入lys文件")
-
-            if TTMLLine.have_ts:
-                logger.debug(f"翻译行存在")
-                trans_path = os.path.join(output_dir, f"{os.path.basename(base_name)}_trans.lrc")
-                trans_file = open(trans_path, 'w', encoding='utf8')
-                logger.debug(f"写入lrc翻译文件")
-
-            count: int = 0
-
-            for main_line, bg_line in [line.to_str() for line in lines]:
-                lyric_file.write(main_line[0] + '\n')
-                lyric_file.flush()
-                if main_line[1]:
-                    trans_file.write(main_line[1] + '\n')
-                    trans_file.flush()
-
-                if bg_line:
-                    lyric_file.write(bg_line[0] + '\n')
-                    lyric_file.flush()
-                    if bg_line[1]:
-                        trans_file.write(bg_line[1] + '\n')
-                        trans_file.flush()
-                    count += 1
-
+        report = bulk_fetch_convert(client, items, output_dir, jobs, retries, streaming=streaming)
+    finally:
+        client.close()
+
+    for platform_code, music_id, reason in report.failed:
+        print(f"\033[91m失败: {platform_code}:{music_id}（{reason}）\033[0m")
+    print(f"\n================================\n"
+          f"\033[93m批量获取完成\033[0m\n"
+          f"总数: {report.total}，成功: {len(report.succeeded)}，失败: {len(report.failed)}，使用本地缓存: {report.from_cache}，"
+          f"确认未更新: {report.revalidated}\n"
+          f"耗时: {report.elapsed:.2f} 秒，速度: {report.rate:.1f} 首/秒，下载 {report.downloaded_bytes / 1024:.0f} KB\n"
+          f"================================")
+    return 1 if report.failed else 0
+
+# 命令行模式的退出码
+EXIT_OK = 0
+EXIT_FAILED = 1  # 有输入转换失败
+EXIT_USAGE = 2  # 参数错误或输入文件不存在
+
+def run_convert(inputs: list[str], output_dir: str | None = None, to_stdout: bool = False, trans_path: str | None = None,
+                no_trans: bool = False, streaming: bool = False, profile: bool = False) -> int:
+    """转换命令行给出的文件（"-" 表示标准输入），返回退出码
+
+    标准输入的结果以及 to_stdout 为 True 时，歌词写入标准输出，翻译写入 trans_path（未指定时丢弃）；
+    否则写入 output_dir 下的 .lys / _trans.lrc 文件并在标准输出中逐行打印歌词文件路径。
+    profile 为 True 时每次转换都进行性能分析，报告写入 log 目录，报告路径打印到标准错误
+    """
+    missing = [path for path in inputs if path != '-' and not os.path.isfile(path)]
+    if missing:
+        for path in missing:
+            print(f"文件不存在: {path}", file=sys.stderr)
+        return EXIT_USAGE
+
+    if output_dir is None:
+        output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output')
+
+    if profile:
+        from ttml_profile import run_profiled
+
+    def convert(path: str, context: TTMLContext, func, *args):
+        if not profile:
+            return func(*args)
+        result, report_path = run_profiled(log_dir, path, context, func, *args)
+        print(f"性能报告: {report_path}", file=sys.stderr)
+        return result
+
+    status = EXIT_OK
+    trans_parts: list[str] = []
+    for path in inputs:
+        context = TTMLContext(performance=True)
+        source = sys.stdin.buffer.read() if path == '-' else path
+        if path != '-' and not to_stdout and not no_trans:
+            success, lyric_path, _ = convert(path, context, ttml_to_lys, source, streaming, output_dir, context)
+            if not success:
+                print(f"转换失败: {path}", file=sys.stderr)
+                status = EXIT_FAILED
+                continue
+            print(lyric_path, flush=True)
+            continue
+
+        try:
+            lyric_body, trans_body = convert(path, context, render_lys, source, streaming, context)
+        except Exception as e:
+            print(f"转换失败: {path}: {str(e)}", file=sys.stderr)
+            status = EXIT_FAILED
+            continue
+        if path == '-' or to_stdout:
+            # 直接写入字节，保持 \n 换行且不受控制台编码影响
+            sys.stdout.buffer.write(lyric_body.encode('utf8'))
+            sys.stdout.buffer.flush()
+            if trans_body is not None and trans_path and not no_trans:
+                trans_parts.append(trans_body)
+        else:
+            # 不输出翻译时只写入 .lys 文件
+            os.makedirs(output_dir, exist_ok=True)
+            lyric_path = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(path))[0]}.lys")
+            write_text_atomic(lyric_path, lyric_body)
+            print(lyric_path, flush=True)
+
+    if trans_parts:
+        with open(trans_path, 'w', encoding='utf8') as f:
+            f.write(''.join(trans_parts))
+    return status
+
+def run_watch(root: str, output_dir: str | None = None, streaming: bool = False, debounce: float = 1.0,
+              use_polling: bool = False) -> int:
+    """监视文件夹并自动转换新增或修改的 TTML 文件，按 Ctrl+C 结束"""
+    from ttml_watch import PollingBackend, TTMLWatcher
+
+    if not os.path.isdir(root):
+        print(f"\033[91m目录不存在: {root}\033[0m")
+        return EXIT_USAGE
+
+    def on_converted(path: str, success: bool):
+        if success:
+            print(f"已转换: {path}", flush=True)
         else:
-            logger.exception("错误: 找不到<body>元素")
+            print(f"\033[91m转换失败: {path}\033[0m", flush=True)
 
-    except Exception as e:
-        logger.exception(f"无法解析TTML文件: {input_path}")
-        return False, None, None
-            
-    return True, lyric_path, trans_path
+    # 只保留警告日志，转换结果由 on_converted 输出
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+    watcher = TTMLWatcher(root, output_dir, streaming, debounce, use_polling, on_converted=on_converted)
+    print(f"正在监视 {watcher.root}（{'轮询' if isinstance(watcher.backend, PollingBackend) else 'inotify'}），按 Ctrl+C 结束")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    print(f"\n已转换 {watcher.converted} 个文件，跳过未变化的 {watcher.skipped} 次保存，失败 {watcher.failed} 个")
+    return EXIT_FAILED if watcher.failed else EXIT_OK
+
+def run_server(address: str, jobs: int | None = None, max_body_mb: float = 8) -> int:
+    """启动本地 HTTP 转换服务，address 为 [主机:]端口，按 Ctrl+C 结束"""
+    from ttml_server import make_server, serve
+
+    host, _, port = address.rpartition(':')
+    if not port.isdigit():
+        print(f"\033[91m无效的地址: {address}\033[0m")
+        return EXIT_USAGE
+    # 服务运行期间只保留警告日志
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+    server = make_server(host or '127.0.0.1', int(port), jobs, int(max_body_mb * 1024 * 1024))
+    print(f"转换服务已启动: http://{host or '127.0.0.1'}:{server.server_address[1]}（POST /convert，GET /health），按 Ctrl+C 结束")
+    serve(server)
+    return EXIT_OK
+
+# 各选项（argparse dest -> (选项名, 可用的模式)）只在对应模式中生效，convert 为直接转换输入文件；
+# 在其他模式中给出（值与默认值不同）时报错，而不是静默忽略
+OPTION_MODES: dict[str, tuple[str, tuple[str, ...]]] = {
+    'stdout': ('--stdout', ('convert',)),
+    'trans': ('--trans', ('convert',)),
+    'no_trans': ('--no-trans', ('convert',)),
+    'profile': ('--profile', ('convert',)),
+    'output_dir': ('-o', ('convert', 'batch', 'amll', 'watch')),
+    'streaming': ('--streaming', ('convert', 'batch', 'amll', 'watch')),
+    'jobs': ('-j', ('batch', 'amll', 'serve')),
+    'cache': ('--cache', ('batch',)),
+    'retries': ('--retries', ('amll',)),
+    'amll_url': ('--amll-url', ('amll',)),
+    'debounce': ('--debounce', ('watch',)),
+    'poll': ('--poll', ('watch',)),
+    'max_body': ('--max-body', ('serve',)),
+}
+
+def main(argv: list[str]) -> int:
+    """非交互命令行入口"""
+    parser = argparse.ArgumentParser(
+        prog='Tool History.py', description='TTML to Lyricify Syllable Tool 命令行模式',
+        epilog='退出码: 0 全部成功，1 有文件转换失败，2 参数错误或输入文件不存在。'
+               '示例: cat a.ttml | python "Tool History.py" - > a.lys；'
+               'find lyrics -name "*.ttml" | xargs -P 8 -n 16 python "Tool History.py" -o output')
+    parser.add_argument('inputs', nargs='*', metavar='FILE',
+                        help='要转换的 TTML 文件，"-" 表示从标准输入读取；未指定任何输入和模式时读取标准输入')
+    parser.add_argument('--stdout', action='store_true', help='将歌词写入标准输出而不是 .lys 文件')
+    parser.add_argument('--trans', metavar='PATH', help='写入标准输出时，将翻译写入此文件（默认丢弃翻译）')
+    parser.add_argument('--no-trans', action='store_true', help='不输出翻译')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--batch', nargs='+', metavar='PATH',
+                      help='批量转换目录（递归查找 .ttml）、通配符（如 "lyrics/**/*.ttml"）或文件')
+    mode.add_argument('--amll', metavar='LIST',
+                      help='从 AMLL DB 批量下载并转换，LIST 为每行一个 "平台:音乐ID" 的文本文件（如 ncm:123456），"-" 表示标准输入')
+    mode.add_argument('--watch', metavar='DIR',
+                      help='监视目录树，自动转换新增或修改的 .ttml 文件（默认输出到源文件所在目录）')
+    mode.add_argument('--serve', metavar='[HOST:]PORT',
+                      help='启动本地 HTTP 转换服务：POST /convert 提交 TTML，返回 JSON 或 multipart')
+    parser.add_argument('-o', '--output-dir', help='输出目录，默认为脚本目录下的 output')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='并行进程数，默认为 CPU 核心数；--amll 模式下为并发下载数，默认为 8；--serve 模式下为工作进程数')
+    parser.add_argument('--streaming', action='store_true', help='使用流式解析引擎')
+    parser.add_argument('--cache', action='store_true', help='启用转换缓存（脚本目录下的 cache），跳过内容未变化的文件')
+    parser.add_argument('--retries', type=int, default=3, help='--amll 模式下每首歌曲的最大重试次数，默认为 3')
+    parser.add_argument('--amll-url', help='AMLL DB 服务器地址，默认为官方服务器')
+    parser.add_argument('--debounce', type=float, default=1.0, help='--watch 模式下文件停止变化多少秒后再转换，默认为 1')
+    parser.add_argument('--poll', action='store_true', help='--watch 模式下使用定时轮询代替 inotify')
+    parser.add_argument('--max-body', type=float, default=8, metavar='MB', help='--serve 模式下请求体大小上限（MB），默认为 8')
+    parser.add_argument('--profile', action='store_true',
+                        help='使用 cProfile 和 tracemalloc 分析每次转换，报告（各阶段耗时及内存峰值、耗时最多的函数）写入 log 目录')
+    args = parser.parse_args(argv)
+
+    run_mode = next((name for name in ('batch', 'amll', 'watch', 'serve') if getattr(args, name)), 'convert')
+    if run_mode != 'convert' and args.inputs:
+        parser.error('--batch/--amll/--watch/--serve 不能与输入文件同时使用')
+    for dest, (option, modes) in OPTION_MODES.items():
+        if run_mode not in modes and getattr(args, dest) != parser.get_default(dest):
+            allowed = '/'.join('直接转换输入文件' if name == 'convert' else f'--{name}' for name in modes)
+            parser.error(f'{option} 只能用于 {allowed}')
+    if args.trans and args.no_trans:
+        parser.error('--trans 不能与 --no-trans 同时使用')
+    if args.trans and not args.stdout and any(path != '-' for path in args.inputs):
+        # 写入文件时翻译总是保存为 _trans.lrc
+        parser.error('--trans 只用于写入标准输出的转换（标准输入或 --stdout），转换文件时翻译保存为 _trans.lrc')
+    if args.serve:
+        return run_server(args.serve, args.jobs, args.max_body)
+    if args.watch:
+        return run_watch(args.watch, args.output_dir, args.streaming, args.debounce, args.poll)
+    if not (args.batch or args.amll):
+        # 写入标准输出时只保留警告日志，输出可以直接用于管道
+        logger.remove()
+        logger.add(sys.stderr, level='WARNING')
+        return run_convert(args.inputs or ['-'], args.output_dir, args.stdout, args.trans, args.no_trans, args.streaming,
+                           args.profile)
+    if args.amll:
+        return run_amll_bulk(args.amll, args.output_dir, args.jobs, args.streaming, args.retries, args.amll_url)
+    return run_batch(args.batch, args.output_dir, args.jobs, args.streaming, args.cache)
+
+
+# 是否使用流式解析引擎，输入"Enable streaming"切换
+streaming_enabled: bool = False
+
+class SessionStats:
+    """交互模式本次运行的转换统计，输入"stats"查看"""
+    def __init__(self):
+        self.count: int = 0
+        self.failures: int = 0
+        self.total_time: float = 0.0
+        self.max_time: float = 0.0
+
+    def record(self, success: bool, elapsed: float):
+        self.count += 1
+        self.failures += not success
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+    def summary(self) -> str:
+        average = self.total_time / self.count if self.count else 0.0
+        return (f"转换次数: {self.count}，成功: {self.count - self.failures}，失败: {self.failures}\n"
+                f"总耗时: {self.total_time:.2f} 秒，平均: {average * 1000:.0f} ms，最长: {self.max_time * 1000:.0f} ms")
 
 def step(argv_h):
-    if len(sys.argv) != 2 or argv_h == True: #如果第一次是图标输入，此后只能窗口输入
-        input_path = input("\n请将TTML文件拖放到此窗口上或输入文件路径，按回车键进行转换\n输入\"help\"查看帮助或者当前版本可能存在的bug\n文件路径: ")
-        # 检查是否启用日志
-        if is_logging_enabled(input_path):
-            setup_logger(input_path)
-            logger.info("日志保存已启用")
-            step(argv_h)  # 重新提示用户输入
-            return
-        # 检查是否输入 "about"
-        if input_path.strip().lower() == "about":
-            # 输出关于信息并记录日志
-            logger.info("输出\"关于\"信息")
-            logger.info(f"版本号 {VERSION}")
-            print("\n\033[94m"
-            "TTML to Lyricify Syllable Tool\n\033[0m"
-            "一个适用于 AMLL TTML 文件转 Lyricify Syllable 的小工具\n"
-            f"版本号：{VERSION}\n"
-            "更新内容：修复背景人声ID错误的问题/修改启用日志的判断条件/新增\"关于\"文本\n\n"
-            "项目地址：https://github.com/MiaowCham/TTML_to_Lyricify_Syllable_Tool\n"
-            "Github Acitons 版本：https://github.com/HKLHaoBin/ttml_to_lys")
-            step(argv_h)  # 重新提示用户输入
-            return
-        # 检查是否输入 "help"
-        if input_path.strip().lower() == "help":
-            # 输出帮助信息
-            print("\n\033[94m"
-            "帮助信息\n\033[0m"
-            "- 输入\"Enable logging\"启用日志保存\n"
-            "- 输入\"about\"以查看关于及版本信息\n"
-            "\033[94m待修复bug\n\033[0m"
-            "- 在TTML原文件及文件路径无误的情况下仍提示文件不存在，请检查您的文件路径及文件名是否包含引号或单引号（或者其他非法字符），去除后即可正常读取")
-            step(argv_h)  # 重新提示用户输入
-            return
-        
-        logger.info(f"==========================")
-        logger.debug(f"窗口输入")
-        logger.debug(f"图标输入历史: {argv_h}")
-        logger.debug(f"len(sys.argv): {len(sys.argv)}")
-    else:
-        input_path = sys.argv[1]
-        argv_h = True
-        logger.info(f"==========================")
-        logger.debug(f"图标输入")
-        logger.debug(f"图标输入历史: {argv_h}")
-        logger.debug(f"len(sys.argv): {len(sys.argv)}")
-        
-    logger.debug(f"用户输入: \"{input_path}\"")
-
-    if input_path.startswith("&"):
-        logger.debug(f"检测到 VS Code & PowerShell 受害者，尝试修复路径")
-    else:
-        logger.debug(f"未检测到 VS Code & PowerShell 受害者迹象，仍然尝试修复路径")
-    input_path = input_path.lstrip("&").strip(string.whitespace + "'\"")
-
-    logger.debug(f"接收到文件: \"{input_path}\"")
-
-    if not os.path.exists(input_path):
-        logger.error(f"文件不存在: \"{input_path}\"")
-        print("\033[91m文件不存在！请重试\033[0m")
-        print("如果确定文件存在，请检查您的文件路径及文件名是否包含引号或单引号（或者其他非法字符），去除后即可正常读取")
-        step(argv_h)
-
-    success, lyric_path, trans_path = ttml_to_lys(input_path)
-    if success:
-        print(f"\n================================\n\033[93m转换成功！\033[0m\n\033[94m输出文件: \033[0m\"{lyric_path}\"")
-        if TTMLLine.have_ts:
-            print(f"\033[94m翻译文件: \033[0m\"{trans_path}\"")
-        if TTMLLine.have_pair:
-            print(f"处理文件时移除了 {TTMLLine.have_pair} 处括号")
-            print(f"无须担心，移除的括号你并不需要")
-        print(f"================================\n")
-    else:
-        print(f"\033[91m转换失败: {input_path}\033[0m")
-
-    # 传回argv_h信息，保证后续只能窗口输入
-    input_path = ""
-    step(argv_h)
+    """交互模式主循环：逐次读取文件路径或命令并转换，直到输入结束（EOF/Ctrl+C）"""
+    global streaming_enabled
+    stats = SessionStats()
+    while True:
+        if len(sys.argv) != 2 or argv_h == True: #如果第一次是图标输入，此后只能窗口输入
+            try:
+                input_path = input("\n请将TTML文件拖放到此窗口上或输入文件路径，按回车键进行转换\n输入\"help\"查看帮助或者当前版本可能存在的bug\n文件路径: ")
+            except (EOFError, KeyboardInterrupt):
+                print(f"\n{stats.summary()}")
+                return
+            command = input_path.strip().lower()
+            # 检查是否启用日志
+            if is_logging_enabled(input_path):
+                setup_logger(input_path)
+                logger.info("日志保存已启用")
+                continue
+            # 检查是否输入 "Enable streaming"
+            if command == "enable streaming":
+                streaming_enabled = not streaming_enabled
+                logger.info(f"流式解析引擎: {streaming_enabled}")
+                print(f"\n已{'启用' if streaming_enabled else '关闭'}流式解析引擎")
+                continue
+            # 检查是否输入 "stats"
+            if command == "stats":
+                print(f"\n\033[94m本次运行统计\n\033[0m{stats.summary()}")
+                continue
+            # 检查是否输入 "about"
+            if command == "about":
+                # 输出关于信息并记录日志
+                logger.info("输出\"关于\"信息")
+                logger.info(f"版本号 {VERSION}")
+                print("\n\033[94m"
+                "TTML to Lyricify Syllable Tool\n\033[0m"
+                "一个适用于 AMLL TTML 文件转 Lyricify Syllable 的小工具\n"
+                f"版本号：{VERSION}\n"
+                "更新内容：修复背景人声ID错误的问题/修改启用日志的判断条件/新增\"关于\"文本\n\n"
+                "项目地址：https://github.com/MiaowCham/TTML_to_Lyricify_Syllable_Tool\n"
+                "Github Acitons 版本：https://github.com/HKLHaoBin/ttml_to_lys")
+                continue
+            # 检查是否输入 "help"
+            if command == "help":
+                # 输出帮助信息
+                print("\n\033[94m"
+                "帮助信息\n\033[0m"
+                "- 输入\"Enable logging\"启用日志保存\n"
+                "- 输入\"Enable streaming\"切换流式解析引擎（适用于大文件，输出不变）\n"
+                "- 输入\"stats\"查看本次运行的转换次数及耗时统计\n"
+                "- 输入\"about\"以查看关于及版本信息\n"
+                "\033[94m待修复bug\n\033[0m"
+                "- 在TTML原文件及文件路径无误的情况下仍提示文件不存在，请检查您的文件路径及文件名是否包含引号或单引号（或者其他非法字符），去除后即可正常读取")
+                continue
+            
+            logger.info(f"==========================")
+            logger.debug(f"窗口输入")
+            logger.debug(f"图标输入历史: {argv_h}")
+            logger.debug(f"len(sys.argv): {len(sys.argv)}")
+        else:
+            input_path = sys.argv[1]
+            argv_h = True
+            logger.info(f"==========================")
+            logger.debug(f"图标输入")
+            logger.debug(f"图标输入历史: {argv_h}")
+            logger.debug(f"len(sys.argv): {len(sys.argv)}")
+            
+        logger.debug(f"用户输入: \"{input_path}\"")
+
+        if input_path.startswith("&"):
+            logger.debug(f"检测到 VS Code & PowerShell 受害者，尝试修复路径")
+        else:
+            logger.debug(f"未检测到 VS Code & PowerShell 受害者迹象，仍然尝试修复路径")
+        input_path = input_path.lstrip("&").strip(string.whitespace + "'\"")
+
+        logger.debug(f"接收到文件: \"{input_path}\"")
+
+        if not os.path.exists(input_path):
+            logger.error(f"文件不存在: \"{input_path}\"")
+            print("\033[91m文件不存在！请重试\033[0m")
+            print("如果确定文件存在，请检查您的文件路径及文件名是否包含引号或单引号（或者其他非法字符），去除后即可正常读取")
+            continue
+
+        context = TTMLContext()
+        start = time.perf_counter()
+        success, lyric_path, trans_path = ttml_to_lys(input_path, streaming_enabled, context=context)
+        stats.record(success, time.perf_counter() - start)
+        print(f"实时转换结果可能与实际输出有差异，请以实际输出为准")
+        if success:
+            print(f"\n================================\n\033[93m转换成功！\033[0m\n\033[94m输出文件: \033[0m\"{lyric_path}\"")
+            if context.have_ts:
+                print(f"\033[94m翻译文件: \033[0m\"{trans_path}\"")
+            if context.have_pair:
+                print(f"处理文件时移除了 {context.have_pair} 处括号")
+                print(f"无须担心，移除的括号你并不需要")
+            print(f"================================\n")
+        else:
+            print(f"\033[91m转换失败: {input_path}\033[0m")
 
 
 if __name__ == '__main__':
     VERSION = "v5.2"
+    # 有以 "-" 开头的参数、多个文件或标准输入不是终端（管道、xargs）时进入非交互模式，否则保持拖放/窗口输入的交互模式
+    if any(arg.startswith('-') for arg in sys.argv[1:]) or len(sys.argv) > 2 or not sys.stdin.isatty():
+        sys.exit(main(sys.argv[1:]))
     argv = False
     step(argv)
@@ -0,0 +1,298 @@
+"""AMLL TTML DB 客户端
+
+- AMLLClient: 按平台和音乐ID获取 TTML 歌词。所有请求共用一个 requests.Session（保持连接），
+  获取到的歌词按 平台+音乐ID 保存到本地磁盘缓存：有效期内直接使用本地内容，过期后通过
+  ETag/Last-Modified 条件请求确认是否更新，网络不可用时回退到本地内容
+- bulk_fetch_convert: 以有限的并发数批量下载 平台:音乐ID 列表中的歌词，转换并输出 .lys / _trans.lrc
+- base_url 可以指向本地的测试服务器，GUI 中也可以通过环境变量 AMLL_DB_URL 指定
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from re import compile
+from threading import Event, Lock
+from typing import Callable, Iterable
+
+import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+
+from ttml_converter import TTMLContext, ttml_to_lys, write_text_atomic
+
+DEFAULT_BASE_URL = "https://amll-ttml-db.stevexmh.net"
+
+# 平台名称到 AMLL DB 平台代码的映射
+PLATFORM_CODES = {
+    "网易云": "ncm",
+    "QQ音乐": "qq",
+    "Apple Music": "am",
+    "Spotify": "spotify"
+}
+
+# 音乐ID只允许字母、数字、下划线和连字符，同时用作缓存文件名
+MUSIC_ID_PATTERN = compile(r'[\w-]+')
+
+# 这些状态码表示服务器暂时不可用，可以重试
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# 单次重试的最长等待时间（秒）
+MAX_RETRY_DELAY = 30
+
+class FetchResult:
+    """一次查询的结果
+
+    source 表示内容来源：network（网络获取）、cache（有效期内的本地缓存）、
+    revalidated（服务器确认本地缓存未变化）、offline（网络或服务器不可用，使用过期的本地缓存）
+    """
+    def __init__(self, status_code: int, text: str, source: str):
+        self.status_code: int = status_code
+        self.text: str = text
+        self.source: str = source
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code == 200
+
+class AMLLClient:
+    """AMLL TTML DB 客户端，可在多个线程中共用
+
+    ttl 秒内的缓存直接使用，不发送请求；超过 max_age 秒未更新的缓存由 evict 清除。
+    cache_dir 为 None 时不使用磁盘缓存，但仍然复用连接；pool_size 为每个主机保持的连接数，
+    应不小于共用客户端的线程数，否则多出的连接用完即关闭
+    """
+    def __init__(self, cache_dir: str | None = None, base_url: str = DEFAULT_BASE_URL,
+                 ttl: float = 24 * 3600, max_age: float = 30 * 24 * 3600, timeout: float = 10,
+                 pool_size: int = 10):
+        self.cache_dir: str | None = cache_dir
+        self.base_url: str = base_url.rstrip('/')
+        self.ttl: float = ttl
+        self.max_age: float = max_age
+        self.timeout: float = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max(1, pool_size))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.__lock = Lock()
+
+    def url(self, platform_code: str, music_id: str) -> str:
+        return f"{self.base_url}/{platform_code}/{music_id}"
+
+    def __path(self, platform_code: str, music_id: str) -> str:
+        return os.path.join(self.cache_dir, platform_code, f"{music_id}.json")
+
+    def __load(self, platform_code: str, music_id: str) -> dict | None:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self.__path(platform_code, music_id), encoding='utf8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def __store(self, platform_code: str, music_id: str, entry: dict):
+        if not self.cache_dir:
+            return
+        try:
+            path = self.__path(platform_code, music_id)
+            with self.__lock:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                write_text_atomic(path, json.dumps(entry, ensure_ascii=False))
+        except OSError as e:
+            logger.warning(f"写入AMLL DB缓存失败: {str(e)}")
+
+    def fetch(self, platform_code: str, music_id: str, retries: int = 0, backoff: float = 0.5) -> FetchResult:
+        """获取指定平台及音乐ID的 TTML 歌词
+
+        网络错误或服务器暂时不可用时最多重试 retries 次，第 n 次重试前等待 backoff * 2^n 秒
+        （服务器返回 Retry-After 时取两者中较大的值）。
+        重试后仍然网络错误或服务器暂时不可用时使用过期的本地缓存（source 为 offline）。
+        音乐ID格式无效时抛出 ValueError；网络错误且没有本地缓存时抛出 requests.RequestException
+        """
+        if platform_code not in PLATFORM_CODES.values():
+            raise ValueError(f"不支持的平台: {platform_code}")
+        if not MUSIC_ID_PATTERN.fullmatch(music_id):
+            raise ValueError(f"音乐ID格式无效: {music_id}")
+
+        entry = self.__load(platform_code, music_id)
+        now = time.time()
+        if entry is not None and now - entry['fetched_at'] < self.ttl:
+            logger.debug(f"使用AMLL DB缓存: {platform_code}/{music_id}")
+            return FetchResult(200, entry['text'], 'cache')
+
+        # 缓存已过期，使用条件请求确认内容是否变化
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        url = self.url(platform_code, music_id)
+        response: requests.Response | None = None
+        error: requests.RequestException | None = None
+        for attempt in range(retries + 1):
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                response, error = None, e
+            else:
+                if response.status_code not in RETRY_STATUS:
+                    break
+            if attempt < retries:
+                delay = backoff * 2 ** attempt
+                retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+                delay = min(delay, MAX_RETRY_DELAY)
+                logger.debug(f"请求AMLL DB失败，{delay:.1f} 秒后重试（{attempt + 1}/{retries}）: {url}")
+                time.sleep(delay)
+
+        if response is None:
+            if entry is None:
+                raise error
+            logger.warning(f"请求AMLL DB失败，使用本地缓存: {str(error)}")
+            return FetchResult(200, entry['text'], 'offline')
+        if response.status_code in RETRY_STATUS and entry is not None:
+            # 重试后服务器仍暂时不可用，与网络错误相同地使用本地内容
+            logger.warning(f"AMLL DB暂时不可用（HTTP {response.status_code}），使用本地缓存: {url}")
+            return FetchResult(200, entry['text'], 'offline')
+
+        if response.status_code == 304 and entry is not None:
+            logger.debug(f"AMLL DB内容未变化: {url}")
+            entry['fetched_at'] = now
+            self.__store(platform_code, music_id, entry)
+            return FetchResult(200, entry['text'], 'revalidated')
+
+        if response.status_code == 200:
+            # 服务器未声明编码时按 UTF-8 解码，避免 requests 回退到 ISO-8859-1
+            if response.encoding is None or response.encoding.lower() == 'iso-8859-1':
+                response.encoding = 'utf-8'
+            self.__store(platform_code, music_id, {
+                'text': response.text,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'fetched_at': now
+            })
+        return FetchResult(response.status_code, response.text, 'network')
+
+    def evict(self, max_age: float | None = None) -> int:
+        """清除超过 max_age 秒（默认为 self.max_age）未更新的缓存，返回清除的条目数"""
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return 0
+        deadline = time.time() - (self.max_age if max_age is None else max_age)
+        removed = 0
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < deadline:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+        if removed:
+            logger.info(f"已清除 {removed} 条过期的AMLL DB缓存")
+        return removed
+
+    def close(self):
+        self.session.close()
+
+
+def parse_id_list(lines: Iterable[str]) -> list[tuple[str, str]]:
+    """解析每行一个的 平台:音乐ID 列表，返回 [(平台代码, 音乐ID)]
+
+    平台可以是平台代码（ncm/qq/am/spotify）或平台名称，忽略空行和 # 之后的注释，重复的条目只保留一个；
+    存在格式无效的行时抛出 ValueError
+    """
+    items: dict[tuple[str, str], None] = {}
+    for number, line in enumerate(lines, 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        platform, sep, music_id = line.partition(':')
+        platform, music_id = platform.strip(), music_id.strip()
+        platform_code = PLATFORM_CODES.get(platform, platform.lower())
+        if not sep or platform_code not in PLATFORM_CODES.values() or not MUSIC_ID_PATTERN.fullmatch(music_id):
+            raise ValueError(f"第{number}行格式无效: {line}")
+        items[(platform_code, music_id)] = None
+    return list(items)
+
+class BulkReport:
+    """批量下载转换的结果统计
+
+    from_cache 为直接使用本地缓存（有效期内或网络不可用）的条目数，revalidated 为服务器确认缓存未变化（304）的条目数，
+    downloaded_bytes 只统计实际通过网络下载的歌词内容
+    """
+    def __init__(self, total: int):
+        self.total: int = total
+        self.succeeded: list[tuple[str, str]] = []
+        # (平台代码, 音乐ID, 失败原因)
+        self.failed: list[tuple[str, str, str]] = []
+        self.from_cache: int = 0
+        self.revalidated: int = 0
+        self.downloaded_bytes: int = 0
+        self.elapsed: float = 0.0
+        self.cancelled: bool = False
+
+    @property
+    def done(self) -> int:
+        return len(self.succeeded) + len(self.failed)
+
+    @property
+    def rate(self) -> float:
+        """每秒完成的条目数"""
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+def bulk_fetch_convert(client: AMLLClient, items: list[tuple[str, str]], output_dir: str, jobs: int = 8,
+                       retries: int = 3, backoff: float = 0.5, streaming: bool = False,
+                       progress: Callable[[int, int], None] | None = None,
+                       cancel_event: Event | None = None) -> BulkReport:
+    """以最多 jobs 个并发下载 items 中的歌词，逐个转换并输出 {平台代码}_{音乐ID}.lys / _trans.lrc
+
+    progress(已完成数, 总数) 在工作线程中调用；cancel_event 被设置后不再开始新的条目，
+    已开始的条目会继续完成
+    """
+    report = BulkReport(len(items))
+    lock = Lock()
+    start = time.perf_counter()
+
+    def process(platform_code: str, music_id: str) -> tuple[bool, str]:
+        if cancel_event is not None and cancel_event.is_set():
+            return False, ''
+        try:
+            result = client.fetch(platform_code, music_id, retries, backoff)
+        except requests.RequestException as e:
+            return False, f"网络错误: {str(e)}"
+        if not result.ok:
+            return False, f"HTTP {result.status_code}"
+
+        data = result.text.encode('utf8')
+        with lock:
+            if result.source == 'network':
+                report.downloaded_bytes += len(data)
+            elif result.source == 'revalidated':
+                report.revalidated += 1
+            else:
+                report.from_cache += 1
+        success, _, _ = ttml_to_lys(data, streaming, output_dir, TTMLContext(performance=True),
+                                    base_name=f"{platform_code}_{music_id}")
+        return success, '' if success else "转换失败"
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = {executor.submit(process, *item): item for item in items}
+        for future in as_completed(futures):
+            platform_code, music_id = futures[future]
+            success, reason = future.result()
+            if success:
+                report.succeeded.append((platform_code, music_id))
+            elif reason:
+                report.failed.append((platform_code, music_id, reason))
+                logger.warning(f"批量获取失败 {platform_code}:{music_id}: {reason}")
+            if progress is not None:
+                progress(report.done, report.total)
+
+    report.cancelled = cancel_event is not None and cancel_event.is_set() and report.done < report.total
+    report.elapsed = time.perf_counter() - start
+    return report
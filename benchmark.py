@@ -0,0 +1,265 @@
+"""TTML 转换核心基准测试
+
+生成 AMLL 风格的合成 TTML（可配置行数、每行音节数、对唱、x-bg 背景人声、x-translation 翻译），
+分别测量 GUI 文本接口 ttml_to_lyricify_syllable_text 与命令行 ttml_to_lys 的吞吐量：
+每秒行数、每秒音节数、峰值内存（RSS）以及 parse/build/render/write 各阶段耗时。
+
+每个用例在独立子进程中运行，峰值内存互不干扰。示例：
+
+    python benchmark.py
+    python benchmark.py --lines 1000 5000 --syllables 8 --engine streaming
+    python benchmark.py --json result.json
+    python benchmark.py --baseline result.json --threshold 0.15
+    python benchmark.py --scaling
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+TTML_HEAD = ('<tt xmlns="http://www.w3.org/ns/ttml" xmlns:ttm="http://www.w3.org/ns/ttml#metadata" '
+             'xmlns:amll="http://www.example.com/ns/amll" xmlns:itunes="http://music.apple.com/lyric-ttml-internal">')
+
+WORDS = ('word', 'la', "it's", 'night', '夜', '空', 'love', 'you')
+
+PHASES = ('parse', 'build', 'render', 'write')
+
+# --scaling 使用的行数梯度
+SCALING_LINES = [1000, 5000, 10000, 25000, 50000]
+
+def format_time(ms: int) -> str:
+    return f'{ms // 60000:02}:{ms // 1000 % 60:02}.{ms % 1000:03}'
+
+def generate_ttml(lines: int, syllables: int, duet: bool = True, bg_ratio: float = 0.3,
+                  ts_ratio: float = 0.6, seed: int = 0) -> tuple[str, int]:
+    """生成合成 AMLL TTML，返回 (TTML 文本, 音节总数)
+
+    duet 为 True 时约三成的行分配给 v2 声部；bg_ratio / ts_ratio 分别为带背景人声、带翻译的行所占比例
+    """
+    rand = random.Random(seed)
+    out = [TTML_HEAD, '<head><metadata><ttm:agent type="person" xml:id="v1"/>']
+    if duet:
+        out.append('<ttm:agent type="other" xml:id="v2"/>')
+    out.append('<amll:meta key="musicName" value="benchmark"/></metadata></head>')
+    out.append('<body dur="999:00.000"><div xmlns="" begin="00:00.000" end="999:00.000">')
+
+    total = 0
+    ms = 500
+    for index in range(lines):
+        agent = 'v2' if duet and rand.random() < 0.3 else 'v1'
+        begin = ms
+        spans = []
+        for _ in range(syllables):
+            duration = rand.randint(100, 600)
+            spans.append(f'<span begin="{format_time(ms)}" end="{format_time(ms + duration)}">{rand.choice(WORDS)} </span>')
+            ms += duration
+        total += syllables
+
+        if rand.random() < bg_ratio:
+            count = max(1, syllables // 2)
+            bg_begin = ms
+            bg_spans = []
+            for i in range(count):
+                duration = rand.randint(100, 400)
+                word = rand.choice(WORDS)
+                if i == 0:
+                    word = '(' + word
+                if i == count - 1:
+                    word += ')'
+                bg_spans.append(f'<span begin="{format_time(ms)}" end="{format_time(ms + duration)}">{word}</span>')
+                ms += duration
+            total += count
+            if rand.random() < ts_ratio:
+                bg_spans.append('<span ttm:role="x-translation" xml:lang="zh-CN">背景翻译</span>')
+            spans.append(f'<span ttm:role="x-bg" begin="{format_time(bg_begin)}" end="{format_time(ms)}">'
+                         + ''.join(bg_spans) + '</span>')
+
+        if rand.random() < ts_ratio:
+            spans.append(f'<span ttm:role="x-translation" xml:lang="zh-CN">第{index + 1}行翻译</span>')
+
+        out.append(f'<p begin="{format_time(begin)}" end="{format_time(ms)}" ttm:agent="{agent}" '
+                   f'itunes:key="L{index + 1}">' + ''.join(spans) + '</p>')
+        ms += rand.randint(0, 300)
+
+    out.append('</div></body></tt>')
+    return ''.join(out), total
+
+def load_module():
+    """加载转换核心（不依赖 tkinter，两个被测接口都位于该模块）"""
+    sys.path.insert(0, base_dir)
+    import ttml_converter
+    return ttml_converter
+
+def peak_rss_kb() -> int | None:
+    """当前进程的峰值 RSS（KB），平台不支持时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def run_case(case: dict) -> dict:
+    """在当前进程中执行一个用例（由子进程调用），返回最快一轮的耗时及各阶段耗时"""
+    module = load_module()
+    module.logger.remove()
+    if case['full_log']:
+        # 添加一个丢弃输出的处理器，使逐行日志真正被格式化
+        module.logger.add(lambda message: None, level='DEBUG')
+    streaming = case['engine'] == 'streaming'
+    rss_before = peak_rss_kb()
+
+    with open(case['path'], encoding='utf8') as f:
+        content = f.read()
+
+    best: dict | None = None
+    with tempfile.TemporaryDirectory() as output_dir:
+        for _ in range(case['repeat']):
+            context = module.TTMLContext(performance=not case['full_log'])
+            start = perf_counter()
+            if case['target'] == 'gui':
+                success = module.ttml_to_lyricify_syllable_text(content, streaming, context)[0]
+            else:
+                success = module.ttml_to_lys(case['path'], streaming, output_dir, context)[0]
+            elapsed = perf_counter() - start
+            if not success:
+                raise RuntimeError(f"转换失败: {case['target']} / {case['engine']}")
+            if best is None or elapsed < best['seconds']:
+                best = {'seconds': elapsed, 'timings': dict(context.timings)}
+
+    best['rss_before_kb'] = rss_before
+    best['peak_rss_kb'] = peak_rss_kb()
+    return best
+
+def spawn_case(case: dict) -> dict:
+    """在独立子进程中执行用例，避免不同用例之间的内存峰值相互影响"""
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', json.dumps(case)],
+                            capture_output=True, text=True, encoding='utf8')
+    if result.returncode != 0:
+        raise RuntimeError(f"子进程执行失败:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def format_rss(kb: int | None) -> str:
+    return '-' if kb is None else f'{kb / 1024:.1f}MB'
+
+def run_benchmark(args) -> list[dict]:
+    targets = ['gui', 'cli'] if args.target == 'both' else [args.target]
+    engines = ['minidom', 'streaming'] if args.engine == 'both' else [args.engine]
+    results = []
+
+    header = f"{'目标':<5}{'引擎':<11}{'行数':>7}{'音节数':>9}{'行/秒':>11}{'音节/秒':>12}{'峰值内存':>10}  " \
+             + '  '.join(f'{phase:>8}' for phase in PHASES)
+    print(header)
+    with tempfile.TemporaryDirectory() as work_dir:
+        for lines in args.lines:
+            content, syllables = generate_ttml(lines, args.syllables, not args.no_duet,
+                                               args.bg_ratio, args.ts_ratio, args.seed)
+            path = os.path.join(work_dir, f'bench_{lines}.ttml')
+            with open(path, 'w', encoding='utf8') as f:
+                f.write(content)
+
+            for target in targets:
+                for engine in engines:
+                    case = {'target': target, 'engine': engine, 'path': path,
+                            'repeat': args.repeat, 'full_log': args.full_log}
+                    result = spawn_case(case)
+                    seconds = result['seconds']
+                    record = {'target': target, 'engine': engine, 'lines': lines, 'syllables': syllables,
+                              'seconds': seconds, 'lines_per_sec': lines / seconds,
+                              'syllables_per_sec': syllables / seconds, 'peak_rss_kb': result['peak_rss_kb'],
+                              'rss_before_kb': result['rss_before_kb'], 'timings': result['timings']}
+                    results.append(record)
+                    phases = '  '.join(f"{result['timings'][phase] * 1000:>6.1f}ms" if phase in result['timings']
+                                       else f"{'-':>8}" for phase in PHASES)
+                    print(f"{target:<5}{engine:<11}{lines:>7}{syllables:>9}{record['lines_per_sec']:>11.0f}"
+                          f"{record['syllables_per_sec']:>12.0f}{format_rss(record['peak_rss_kb']):>10}  {phases}")
+    return results
+
+def compare_baseline(results: list[dict], baseline_path: str, threshold: float) -> int:
+    """与之前保存的结果比较，行/秒下降超过 threshold 时返回 1"""
+    with open(baseline_path, encoding='utf8') as f:
+        baseline = {(r['target'], r['engine'], r['lines']): r for r in json.load(f)}
+
+    regressed = False
+    for record in results:
+        old = baseline.get((record['target'], record['engine'], record['lines']))
+        if old is None:
+            continue
+        change = record['lines_per_sec'] / old['lines_per_sec'] - 1
+        if change < -threshold:
+            regressed = True
+            print(f"性能回退: {record['target']}/{record['engine']}/{record['lines']}行 "
+                  f"{old['lines_per_sec']:.0f} -> {record['lines_per_sec']:.0f} 行/秒 ({change:+.1%})")
+    if not regressed:
+        print(f"未发现超过 {threshold:.0%} 的性能回退")
+    return 1 if regressed else 0
+
+def check_scaling(results: list[dict], limit: float) -> int:
+    """检查耗时是否随行数线性增长：最大规模与最小规模的单行耗时之比超过 limit 时返回 1"""
+    failed = False
+    for target, engine in dict.fromkeys((r['target'], r['engine']) for r in results):
+        records = sorted((r for r in results if r['target'] == target and r['engine'] == engine),
+                         key=lambda r: r['lines'])
+        smallest, largest = records[0], records[-1]
+        ratio = (largest['seconds'] / largest['lines']) / (smallest['seconds'] / smallest['lines'])
+        status = '线性' if ratio <= limit else '非线性'
+        failed |= ratio > limit
+        print(f"{target}/{engine}: {smallest['lines']} -> {largest['lines']}行，单行耗时变为 {ratio:.2f} 倍（{status}）")
+    return 1 if failed else 0
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="TTML 转换核心基准测试")
+    parser.add_argument('--lines', type=int, nargs='+', default=[500, 2000], help="生成的歌词行数，可指定多个")
+    parser.add_argument('--syllables', type=int, default=6, help="每行主歌词的音节数")
+    parser.add_argument('--no-duet', action='store_true', help="不生成对唱声部")
+    parser.add_argument('--bg-ratio', type=float, default=0.3, help="带 x-bg 背景人声的行所占比例")
+    parser.add_argument('--ts-ratio', type=float, default=0.6, help="带 x-translation 翻译的行所占比例")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--target', choices=['gui', 'cli', 'both'], default='both', help="被测接口")
+    parser.add_argument('--engine', choices=['minidom', 'streaming', 'both'], default='both', help="解析引擎")
+    parser.add_argument('--repeat', type=int, default=3, help="每个用例重复次数，取最快一轮")
+    parser.add_argument('--full-log', action='store_true', help="关闭性能模式，计入逐行日志的开销")
+    parser.add_argument('--json', metavar='PATH', help="将结果保存为 JSON")
+    parser.add_argument('--baseline', metavar='PATH', help="与保存的 JSON 结果比较")
+    parser.add_argument('--threshold', type=float, default=0.15, help="判定为性能回退的行/秒下降比例")
+    parser.add_argument('--scaling', action='store_true',
+                        help=f"线性扩展回归测试：默认以 {SCALING_LINES} 行测试命令行接口并计入逐行日志")
+    parser.add_argument('--scaling-limit', type=float, default=2.0, help="允许的单行耗时增长倍数")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.scaling:
+        # 行号查找之类的二次复杂度只会在日志被格式化时出现，因此需要计入日志开销
+        if args.lines == parser.get_default('lines'):
+            args.lines = SCALING_LINES
+        if args.target == parser.get_default('target'):
+            args.target = 'cli'
+        if args.repeat == parser.get_default('repeat'):
+            args.repeat = 1
+        args.full_log = True
+
+    if args.worker:
+        print(json.dumps(run_case(json.loads(args.worker))))
+        return 0
+
+    results = run_benchmark(args)
+    if args.json:
+        with open(args.json, 'w', encoding='utf8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存至 {args.json}")
+    code = 0
+    if args.scaling:
+        code |= check_scaling(results, args.scaling_limit)
+    if args.baseline:
+        code |= compare_baseline(results, args.baseline, args.threshold)
+    return code
+
+if __name__ == '__main__':
+    sys.exit(main())
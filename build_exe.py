@@ -142,6 +142,8 @@ def build_exe():
             "--windowed",
             "--name=TTML_to_LYS_Tool",
             "--hidden-import=requests",
+            "--hidden-import=amll_db",
+            "--hidden-import=ttml_profile",
             "--hidden-import=loguru",
             "--hidden-import=pyperclip",
             "--hidden-import=tkinterdnd2",
@@ -160,6 +162,8 @@ def build_exe():
             "--windowed",
             "--name=TTML_to_LYS_Tool",
             "--hidden-import=requests",
+            "--hidden-import=amll_db",
+            "--hidden-import=ttml_profile",
             "--hidden-import=loguru",
             "--hidden-import=pyperclip",
             "--hidden-import=tkinterdnd2",
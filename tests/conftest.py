@@ -0,0 +1,90 @@
+import importlib.util
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+import pytest
+
+# 测试直接导入仓库根目录下的模块
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE_TTML = (
+    '<tt xmlns="http://www.w3.org/ns/ttml" xmlns:ttm="http://www.w3.org/ns/ttml#metadata" '
+    'xmlns:itunes="http://music.apple.com/lyric-ttml-internal"><head><metadata>'
+    '<ttm:agent type="person" xml:id="v1"/></metadata></head><body dur="00:04.799">'
+    '<div begin="00:00.781" end="00:04.799">'
+    '<p begin="00:00.781" end="00:02.320" ttm:agent="v1" itunes:key="L1">'
+    '<span begin="00:00.781" end="00:01.225">示</span><span begin="00:01.225" end="00:02.320">例</span></p>'
+    '<p begin="00:03.694" end="00:04.799" ttm:agent="v1" itunes:key="L2">'
+    '<span begin="00:03.694" end="00:04.078">English </span><span begin="00:04.078" end="00:04.799">one</span>'
+    '<span ttm:role="x-translation" xml:lang="zh-CN">翻译</span></p>'
+    '</div></body></tt>'
+)
+
+
+class StandInServer:
+    """本地替身 HTTP 服务器
+
+    routes 为 路径 -> [(状态码, 响应头, 响应体), ...]，按顺序依次返回，最后一个重复使用；
+    未配置的路径返回 404。requests 记录每个请求的 (路径, 请求头)
+    """
+    def __init__(self):
+        self.routes: dict[str, list[tuple[int, dict[str, str], str]]] = {}
+        self.requests: list[tuple[str, dict[str, str]]] = []
+        self.__lock = Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                status, headers, body = stand_in.respond(self.path, dict(self.headers))
+                data = body.encode('utf8')
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.__thread = Thread(target=self.httpd.serve_forever, daemon=True)
+        self.__thread.start()
+
+    def respond(self, path: str, headers: dict[str, str]) -> tuple[int, dict[str, str], str]:
+        with self.__lock:
+            self.requests.append((path, headers))
+            responses = self.routes.get(path)
+            if not responses:
+                return 404, {}, 'not found'
+            return responses.pop(0) if len(responses) > 1 else responses[0]
+
+    def hits(self, path: str) -> int:
+        return sum(1 for request_path, _ in self.requests if request_path == path)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    server = StandInServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def tool():
+    """命令行版本（Tool History.py）模块，文件名含空格，无法直接 import"""
+    spec = importlib.util.spec_from_file_location('tool_history', os.path.join(ROOT, 'Tool History.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
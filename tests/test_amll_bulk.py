@@ -0,0 +1,95 @@
+"""bulk_fetch_convert 批量下载转换（使用本地替身服务器）"""
+import time
+
+from amll_db import AMLLClient, bulk_fetch_convert, parse_id_list
+from conftest import SAMPLE_TTML
+
+
+def test_success_writes_output(stand_in, tmp_path):
+    stand_in.routes['/ncm/1'] = [(200, {}, SAMPLE_TTML)]
+    stand_in.routes['/qq/2'] = [(200, {}, SAMPLE_TTML)]
+    client = AMLLClient(base_url=stand_in.url)
+    progress = []
+    report = bulk_fetch_convert(client, [('ncm', '1'), ('qq', '2')], str(tmp_path), jobs=2,
+                                progress=lambda done, total: progress.append((done, total)))
+
+    assert sorted(report.succeeded) == [('ncm', '1'), ('qq', '2')]
+    assert report.failed == [] and report.done == 2
+    assert progress[-1] == (2, 2)
+    assert report.downloaded_bytes == 2 * len(SAMPLE_TTML.encode('utf8'))
+    lyric = (tmp_path / 'ncm_1.lys').read_text(encoding='utf8')
+    assert lyric.startswith('[0]示(781,444)例(1225,1095)')
+    assert '[00:03.694]翻译' in (tmp_path / 'ncm_1_trans.lrc').read_text(encoding='utf8')
+    assert (tmp_path / 'qq_2.lys').exists()
+
+
+def test_not_found_is_failure(stand_in, tmp_path):
+    stand_in.routes['/ncm/1'] = [(200, {}, SAMPLE_TTML)]
+    report = bulk_fetch_convert(AMLLClient(base_url=stand_in.url), [('ncm', '1'), ('ncm', '404')],
+                                str(tmp_path), retries=2, backoff=0.01)
+
+    assert report.succeeded == [('ncm', '1')]
+    assert report.failed == [('ncm', '404', 'HTTP 404')]
+    # 404 不重试
+    assert stand_in.hits('/ncm/404') == 1
+    assert not (tmp_path / 'ncm_404.lys').exists()
+
+
+def test_unavailable_retries_after_delay(stand_in, tmp_path):
+    stand_in.routes['/am/1'] = [(503, {'Retry-After': '1'}, ''), (200, {}, SAMPLE_TTML)]
+    start = time.perf_counter()
+    report = bulk_fetch_convert(AMLLClient(base_url=stand_in.url), [('am', '1')], str(tmp_path),
+                                retries=3, backoff=0.01)
+
+    assert report.succeeded == [('am', '1')]
+    assert stand_in.hits('/am/1') == 2
+    # Retry-After 大于退避时间时按 Retry-After 等待
+    assert time.perf_counter() - start >= 1
+    assert (tmp_path / 'am_1.lys').exists()
+
+
+def test_unavailable_gives_up_after_retries(stand_in, tmp_path):
+    stand_in.routes['/am/1'] = [(503, {}, '')]
+    start = time.perf_counter()
+    report = bulk_fetch_convert(AMLLClient(base_url=stand_in.url), [('am', '1')], str(tmp_path),
+                                retries=2, backoff=0.1)
+
+    assert report.failed == [('am', '1', 'HTTP 503')]
+    assert stand_in.hits('/am/1') == 3
+    # 指数退避：0.1 + 0.2 秒
+    assert time.perf_counter() - start >= 0.3
+
+
+def test_counters_separate_cache_and_revalidation(stand_in, tmp_path):
+    stand_in.routes['/ncm/1'] = [(200, {'ETag': '"v1"'}, SAMPLE_TTML)]
+    stand_in.routes['/ncm/2'] = [(200, {'ETag': '"v2"'}, SAMPLE_TTML), (304, {'ETag': '"v2"'}, '')]
+    cache_dir = str(tmp_path / 'amll')
+    items = [('ncm', '1'), ('ncm', '2')]
+    first = bulk_fetch_convert(AMLLClient(cache_dir, stand_in.url), items, str(tmp_path / 'out'))
+    assert (first.from_cache, first.revalidated) == (0, 0)
+    assert first.downloaded_bytes == 2 * len(SAMPLE_TTML.encode('utf8'))
+
+    # ncm:1 在有效期内直接使用缓存；ncm:2 的有效期为 0，通过 304 确认未变化
+    client = AMLLClient(cache_dir, stand_in.url)
+    second = bulk_fetch_convert(client, items[:1], str(tmp_path / 'out'))
+    client.ttl = 0
+    third = bulk_fetch_convert(client, items[1:], str(tmp_path / 'out'))
+    assert (second.from_cache, second.revalidated, second.downloaded_bytes) == (1, 0, 0)
+    assert (third.from_cache, third.revalidated, third.downloaded_bytes) == (0, 1, 0)
+    assert len(third.succeeded) == 1
+
+
+def test_parse_id_list():
+    lines = ['ncm:1  # 注释', '', 'QQ音乐:2', 'ncm:1']
+    assert parse_id_list(lines) == [('ncm', '1'), ('qq', '2')]
+
+
+def test_pool_holds_a_connection_per_worker(stand_in, tmp_path, caplog):
+    items = [('ncm', str(number)) for number in range(48)]
+    for _, music_id in items:
+        stand_in.routes[f'/ncm/{music_id}'] = [(200, {}, SAMPLE_TTML)]
+    client = AMLLClient(base_url=stand_in.url, pool_size=16)
+    report = bulk_fetch_convert(client, items, str(tmp_path), jobs=16)
+
+    assert len(report.succeeded) == 48
+    assert 'Connection pool is full' not in caplog.text
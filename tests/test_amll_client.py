@@ -0,0 +1,117 @@
+"""AMLLClient 条件请求、有效期、离线回退与缓存清理（使用本地替身服务器）"""
+import os
+import socket
+import time
+
+import pytest
+import requests
+
+from amll_db import AMLLClient
+from conftest import SAMPLE_TTML
+
+LAST_MODIFIED = 'Wed, 01 Jan 2025 00:00:00 GMT'
+
+
+def closed_port_url() -> str:
+    """返回一个当前没有服务监听的本地地址"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def test_revalidates_with_etag_and_last_modified(stand_in, tmp_path):
+    stand_in.routes['/ncm/1'] = [(200, {'ETag': '"v1"', 'Last-Modified': LAST_MODIFIED}, SAMPLE_TTML),
+                                 (304, {'ETag': '"v1"'}, '')]
+    client = AMLLClient(str(tmp_path), stand_in.url, ttl=0)
+    first = client.fetch('ncm', '1')
+    second = client.fetch('ncm', '1')
+
+    assert (first.source, second.source) == ('network', 'revalidated')
+    assert second.ok and second.text == SAMPLE_TTML
+    headers = stand_in.requests[-1][1]
+    assert headers['If-None-Match'] == '"v1"'
+    assert headers['If-Modified-Since'] == LAST_MODIFIED
+
+
+def test_changed_content_replaces_cache(stand_in, tmp_path):
+    stand_in.routes['/ncm/1'] = [(200, {'ETag': '"v1"'}, SAMPLE_TTML), (200, {'ETag': '"v2"'}, 'new')]
+    client = AMLLClient(str(tmp_path), stand_in.url, ttl=0)
+    client.fetch('ncm', '1')
+    assert client.fetch('ncm', '1').text == 'new'
+
+    stand_in.routes['/ncm/1'] = [(304, {}, '')]
+    assert client.fetch('ncm', '1').text == 'new'
+    assert stand_in.requests[-1][1]['If-None-Match'] == '"v2"'
+
+
+def test_uses_cache_until_ttl_expires(stand_in, tmp_path):
+    stand_in.routes['/qq/1'] = [(200, {'ETag': '"v1"'}, SAMPLE_TTML), (304, {}, '')]
+    client = AMLLClient(str(tmp_path), stand_in.url, ttl=3600)
+    client.fetch('qq', '1')
+    cached = client.fetch('qq', '1')
+    assert cached.source == 'cache' and cached.text == SAMPLE_TTML
+    assert stand_in.hits('/qq/1') == 1
+
+    # 有效期已过，重新向服务器确认
+    client.ttl = 0
+    assert client.fetch('qq', '1').source == 'revalidated'
+    assert stand_in.hits('/qq/1') == 2
+
+
+def test_offline_falls_back_to_stale_cache(stand_in, tmp_path):
+    stand_in.routes['/am/1'] = [(200, {}, SAMPLE_TTML)]
+    AMLLClient(str(tmp_path), stand_in.url).fetch('am', '1')
+
+    offline = AMLLClient(str(tmp_path), closed_port_url(), ttl=0, timeout=2)
+    result = offline.fetch('am', '1')
+    assert result.source == 'offline' and result.ok and result.text == SAMPLE_TTML
+
+    # 没有本地缓存时抛出网络错误
+    with pytest.raises(requests.RequestException):
+        offline.fetch('am', '2')
+
+
+def test_unavailable_server_falls_back_to_stale_cache(stand_in, tmp_path):
+    stand_in.routes['/qq/1'] = [(200, {'ETag': '"v1"'}, SAMPLE_TTML), (503, {}, '')]
+    client = AMLLClient(str(tmp_path), stand_in.url, ttl=0)
+    client.fetch('qq', '1')
+    result = client.fetch('qq', '1', retries=2, backoff=0.01)
+    assert result.source == 'offline' and result.ok and result.text == SAMPLE_TTML
+    assert stand_in.hits('/qq/1') == 4
+
+    # 没有本地缓存时返回服务器的状态码
+    stand_in.routes['/qq/2'] = [(503, {}, '')]
+    assert client.fetch('qq', '2').status_code == 503
+
+
+def test_without_cache_dir_always_requests(stand_in):
+    stand_in.routes['/spotify/1'] = [(200, {}, SAMPLE_TTML)]
+    client = AMLLClient(base_url=stand_in.url)
+    client.fetch('spotify', '1')
+    client.fetch('spotify', '1')
+    assert stand_in.hits('/spotify/1') == 2
+
+
+def test_rejects_invalid_ids(tmp_path):
+    client = AMLLClient(str(tmp_path), closed_port_url())
+    with pytest.raises(ValueError):
+        client.fetch('ncm', '../x')
+    with pytest.raises(ValueError):
+        client.fetch('unknown', '1')
+
+
+def test_evict_removes_old_entries(stand_in, tmp_path):
+    stand_in.routes['/ncm/old'] = [(200, {}, SAMPLE_TTML)]
+    stand_in.routes['/ncm/new'] = [(200, {}, SAMPLE_TTML)]
+    client = AMLLClient(str(tmp_path), stand_in.url, max_age=3600)
+    client.fetch('ncm', 'old')
+    client.fetch('ncm', 'new')
+    old_path = tmp_path / 'ncm' / 'old.json'
+    stale = time.time() - 7200
+    os.utime(old_path, (stale, stale))
+
+    assert client.evict() == 1
+    assert not old_path.exists()
+    assert (tmp_path / 'ncm' / 'new.json').exists()
+    assert client.evict(max_age=0) == 1
@@ -0,0 +1,43 @@
+"""批量转换的输出路径：保持输入的目录结构，不同目录中的同名文件不互相覆盖"""
+import pytest
+
+from conftest import SAMPLE_TTML
+from ttml_converter import collect_ttml_files, plan_outputs
+
+
+@pytest.fixture
+def lyrics(tmp_path):
+    root = tmp_path / 'lyrics'
+    for name in ('a.ttml', 'w/True/a.ttml', 'w/False/a.ttml'):
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(SAMPLE_TTML, encoding='utf8')
+    return root
+
+
+def test_batch_keeps_directory_structure(tool, lyrics, tmp_path):
+    out = tmp_path / 'out'
+    assert tool.run_batch([str(lyrics)], str(out), jobs=2) == 0
+    for name in ('a.lys', 'w/True/a.lys', 'w/False/a.lys'):
+        assert (out / name).read_text(encoding='utf8').startswith('[0]示(781,444)')
+
+
+def test_glob_is_relative_to_prefix(lyrics, tmp_path):
+    files = collect_ttml_files([str(lyrics / 'w' / '*' / 'a.ttml')])
+    assert sorted(subdir for _, subdir in files) == ['False', 'True']
+    planned, conflicts = plan_outputs(files, str(tmp_path / 'out'))
+    assert conflicts == []
+    assert sorted(out_dir for _, out_dir in planned) == [str(tmp_path / 'out' / 'False'),
+                                                         str(tmp_path / 'out' / 'True')]
+
+
+def test_same_output_path_fails(tool, lyrics, tmp_path):
+    out = tmp_path / 'out'
+    # 两个目录参数的结构相同，第二个目录中的文件与第一个的输出路径重复
+    patterns = [str(lyrics / 'w' / 'True'), str(lyrics / 'w' / 'False')]
+    planned, conflicts = plan_outputs(collect_ttml_files(patterns), str(out))
+    assert [path for path, _ in planned] == [str(lyrics / 'w' / 'True' / 'a.ttml')]
+    assert conflicts == [(str(lyrics / 'w' / 'False' / 'a.ttml'), str(lyrics / 'w' / 'True' / 'a.ttml'))]
+
+    assert tool.run_batch(patterns, str(out)) == 1
+    assert (out / 'a.lys').exists()
@@ -0,0 +1,24 @@
+"""命令行参数检查：只在其他模式中生效的选项报错，而不是静默忽略"""
+import pytest
+
+
+@pytest.mark.parametrize('argv', [
+    ['--batch', 'x', '--stdout'],
+    ['--serve', '8000', '--no-trans'],
+    ['--serve', '8000', '-o', 'out'],
+    ['--serve', '8000', '--streaming'],
+    ['--batch', 'x', '--poll'],
+    ['--debounce', '2', 'a.ttml'],
+    ['--watch', 'x', '--amll-url', 'http://127.0.0.1'],
+    ['--batch', 'x', '--retries', '1'],
+    ['--amll', 'ids.txt', '--max-body', '1'],
+    ['--watch', 'x', '-j', '2'],
+    ['--amll', 'ids.txt', '--cache'],
+    ['--watch', 'x', 'a.ttml'],
+])
+def test_rejects_option_outside_its_mode(tool, argv, capsys):
+    with pytest.raises(SystemExit) as exc_info:
+        tool.main(argv)
+    assert exc_info.value.code == 2
+    err = capsys.readouterr().err
+    assert '只能用于' in err or '不能与输入文件同时使用' in err
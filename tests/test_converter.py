@@ -0,0 +1,50 @@
+"""转换核心：minidom 与流式（iterparse）两种引擎的输出、转换缓存"""
+import os
+import time
+
+import pytest
+
+from conftest import SAMPLE_TTML
+from ttml_converter import ConversionCache, ttml_to_lyricify_syllable_text
+
+INDENTED_TTML = SAMPLE_TTML.replace(
+    '<span begin="00:00.781"', '\n        <span begin="00:00.781"').replace(
+    '</span><span begin="00:01.225"', '</span>\n        <span begin="00:01.225"').replace(
+    '</span></p>', '</span>\n      </p>')
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_indented_paragraph_matches_compact(streaming):
+    expected = ttml_to_lyricify_syllable_text(SAMPLE_TTML, streaming)
+    success, lyric, trans = ttml_to_lyricify_syllable_text(INDENTED_TTML, streaming)
+    assert success
+    assert (lyric, trans) == expected[1:]
+    assert lyric.splitlines()[0] == '[0]示(781,444)例(1225,1095)'
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_spaces_between_spans_are_kept(streaming):
+    spaced = SAMPLE_TTML.replace('</span><span begin="00:01.225"', '</span> <span begin="00:01.225"')
+    _, lyric, _ = ttml_to_lyricify_syllable_text(spaced, streaming)
+    assert lyric.splitlines()[0] == '[0]示 (781,444)例(1225,1095)'
+
+
+def test_cache_evicts_unused_disk_entries(tmp_path):
+    cache = ConversionCache(cache_dir=str(tmp_path), max_age=3600)
+    old_key, used_key = cache.key('old', 'text'), cache.key('used', 'text')
+    cache.put(old_key, {'lyric': 'old'})
+    cache.put(used_key, {'lyric': 'used'})
+    # 同一目录中的 AMLL DB 缓存不受影响
+    amll_path = tmp_path / 'amll' / 'ncm' / '1.json'
+    amll_path.parent.mkdir(parents=True)
+    amll_path.write_text('{}', encoding='utf8')
+    stale = time.time() - 7200
+    for path in (tmp_path / old_key[:2] / f"{old_key}.json", tmp_path / used_key[:2] / f"{used_key}.json", amll_path):
+        os.utime(path, (stale, stale))
+
+    # 从磁盘命中时更新最后使用时间
+    assert ConversionCache(cache_dir=str(tmp_path)).get(used_key) == {'lyric': 'used'}
+    assert cache.evict() == 1
+    assert ConversionCache(cache_dir=str(tmp_path)).get(old_key) is None
+    assert amll_path.exists()
+    assert cache.evict(max_age=0) == 1
@@ -0,0 +1,93 @@
+"""GUI 大文本分片写入与预览（不需要显示器，使用假的 root / Text）"""
+import benchmark
+import TTML_to_Lyricify_Syllable_GUI as gui
+
+
+class FakeRoot:
+    """记录 after 调度的回调，由测试手动执行"""
+    def __init__(self):
+        self.jobs = []
+
+    def after(self, ms, callback):
+        self.jobs.append(callback)
+        return f"after#{len(self.jobs)}"
+
+    def after_cancel(self, job):
+        pass
+
+    def run(self):
+        while self.jobs:
+            self.jobs.pop(0)()
+
+
+class FakeText:
+    def __init__(self):
+        self.chunks = []
+
+    def cget(self, name):
+        return 'normal'
+
+    def config(self, **kwargs):
+        pass
+
+    def delete(self, start, end):
+        self.chunks.clear()
+
+    def insert(self, index, text):
+        self.chunks.append(text)
+
+
+def single_line_ttml(size: int) -> str:
+    text, _ = benchmark.generate_ttml(lines=size // 400, syllables=8)
+    assert '\n' not in text
+    assert len(text) >= size
+    return text
+
+
+def test_chunk_end_prefers_newline():
+    text = 'a' * 7 + '\n' + 'b' * 10
+    assert gui.chunk_end(text, 0, 5) == 8
+    assert gui.chunk_end(text, 8, 5) == 13
+    assert gui.chunk_end(text, 13, 5) == len(text)
+
+
+def test_chunk_end_hard_cut_without_newline():
+    text = 'a' * 100
+    assert gui.chunk_end(text, 0, 10) == 10
+    assert gui.chunk_end(text, 90, 10) == 100
+
+
+def test_writer_splits_single_line_text():
+    text = single_line_ttml(3 * 1024 * 1024)
+    root, widget = FakeRoot(), FakeText()
+    progress = []
+    done = []
+    gui.ChunkedTextWriter(root, widget, progress.append).write(text, lambda: done.append(True))
+    # 第一片同步写入，其余通过 after 调度
+    assert len(widget.chunks) == 1
+    root.run()
+    assert ''.join(widget.chunks) == text
+    assert len(widget.chunks) >= len(text) // (2 * gui.CHUNK_SIZE)
+    assert max(map(len, widget.chunks)) <= 2 * gui.CHUNK_SIZE
+    assert progress[-1] == 1 and done == [True]
+
+
+def test_preview_truncates_single_line_text():
+    text = single_line_ttml(2 * 1024 * 1024)
+    preview = gui.make_preview(text)
+    shown, _, note = preview.rpartition('\n')
+    assert len(shown) <= gui.PREVIEW_SIZE
+    assert text.startswith(shown) and shown.endswith('>')
+    assert f"共 {len(text)} 个字符" in note
+
+
+def test_preview_cuts_at_line_end():
+    text = ''.join(f"[{i}]line\n" for i in range(100000))
+    preview = gui.make_preview(text)
+    assert len(preview) < 2 * gui.PREVIEW_SIZE
+    assert "共 100000 行" in preview
+    assert text.startswith(preview.split('\n……')[0])
+
+
+def test_preview_keeps_short_text():
+    assert gui.make_preview('abc') == 'abc'
@@ -0,0 +1,79 @@
+"""HTTP 转换服务（使用线程池，不启动工作进程）"""
+import time
+from threading import Event, Thread
+
+import pytest
+import requests
+
+import ttml_server
+from conftest import SAMPLE_TTML
+
+
+@pytest.fixture
+def server():
+    httpd = ttml_server.make_server('127.0.0.1', 0, jobs=1, max_body=64 * 1024, queue_size=1, use_threads=True)
+    thread = Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+    httpd.executor.shutdown(cancel_futures=True)
+
+
+def test_convert_json(server):
+    _, url = server
+    response = requests.post(f"{url}/convert", data=SAMPLE_TTML.encode('utf8'))
+    assert response.status_code == 200
+    body = response.json()
+    assert body['lyric'].startswith('[0]示(781,444)')
+    assert body['trans'].endswith('[00:03.694]翻译')
+
+    response = requests.post(f"{url}/convert", json={'ttml': SAMPLE_TTML}, params={'format': 'multipart'})
+    assert response.headers['Content-Type'].startswith('multipart/mixed')
+    assert 'filename="trans.lrc"' in response.text
+
+
+def test_invalid_and_oversized(server):
+    _, url = server
+    assert requests.post(f"{url}/convert", data=b'<tt').status_code == 422
+    assert requests.post(f"{url}/convert", data=b'x' * (65 * 1024)).status_code == 413
+    stats = requests.get(f"{url}/health").json()
+    assert (stats['failed'], stats['too_large']) == (1, 1)
+
+
+def test_timed_out_conversion_keeps_slot(server, monkeypatch):
+    httpd, url = server
+    release = Event()
+    finished = Event()
+
+    def slow_convert(data, streaming):
+        release.wait(10)
+        finished.set()
+        return True, 'lyric', None, 0
+
+    monkeypatch.setattr(ttml_server, 'convert_text_in_worker', slow_convert)
+    monkeypatch.setattr(ttml_server, 'CONVERT_TIMEOUT', 0.2)
+
+    assert requests.post(f"{url}/convert", data=b'<tt/>').status_code == 504
+    # 超时的转换仍在运行，唯一的名额没有释放
+    response = requests.post(f"{url}/convert", data=b'<tt/>')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+    # 转换结束后名额由完成回调释放
+    release.set()
+    assert finished.wait(5)
+    for _ in range(50):
+        response = requests.post(f"{url}/convert", data=b'<tt/>')
+        if response.status_code != 503:
+            break
+        time.sleep(0.05)
+    assert response.json()['lyric'] == 'lyric'
+
+
+def test_submit_failure_releases_slot(server):
+    httpd, url = server
+    httpd.executor.shutdown()
+    for _ in range(3):
+        assert requests.post(f"{url}/convert", data=b'<tt/>').status_code == 500
+    assert httpd.stats['rejected'] == 0
@@ -0,0 +1,28 @@
+"""目录监视：启动扫描与内容未变化的保存（使用定时轮询）"""
+import os
+import time
+
+from conftest import SAMPLE_TTML
+from ttml_watch import TTMLWatcher
+
+
+def test_unchanged_save_after_restart_is_skipped(tmp_path):
+    source = tmp_path / 'src' / 'sub' / 'a.ttml'
+    source.parent.mkdir(parents=True)
+    source.write_text(SAMPLE_TTML, encoding='utf8')
+    output = tmp_path / 'out'
+    TTMLWatcher(str(tmp_path / 'src'), str(output), use_polling=True).convert(str(source))
+    assert (output / 'sub' / 'a.lys').exists()
+
+    # 重启后输出已是最新，只更新修改时间的保存不重新转换
+    watcher = TTMLWatcher(str(tmp_path / 'src'), str(output), use_polling=True)
+    watcher.scan_existing()
+    later = time.time() + 10
+    os.utime(source, (later, later))
+    watcher.convert(str(source))
+    assert (watcher.converted, watcher.skipped) == (0, 1)
+
+    source.write_text(SAMPLE_TTML.replace('示', '字'), encoding='utf8')
+    watcher.convert(str(source))
+    assert watcher.converted == 1
+    assert (output / 'sub' / 'a.lys').read_text(encoding='utf8').startswith('[0]字')
@@ -0,0 +1,1066 @@
+"""TTML (AMLL标准) 转 Lyricify Syllable 的转换核心
+
+不依赖 tkinter 及任何网络相关库，GUI、命令行以及其他服务进程均从此模块导入转换功能：
+
+- ttml_to_lyricify_syllable_text: 将 TTML 文本转换为 Lyricify Syllable 文本
+- ttml_to_lys: 转换 TTML 文件并输出 .lys / _trans.lrc 文件，render_lys 只返回文件内容，不写入文件
+- IncrementalConverter: 增量转换，只重新解析源码发生变化的 <p>
+- ConversionCache: 以输入内容哈希为键的转换结果缓存，两个转换接口均可通过 cache 参数使用
+- read_ttml_file / open_ttml_bytes: 一次读取文件字节（大文件使用内存映射）并识别编码
+- collect_ttml_files / walk_ttml_files: 展开目录、通配符及文件路径，得到待转换的 .ttml 文件
+- worker_init / convert_file_in_worker / convert_text_in_worker: 批量转换、转换队列及转换服务的进程池共用的工作函数
+"""
+import codecs
+import glob
+import hashlib
+import json
+import mmap
+import os
+import sys
+import tempfile
+import xml.dom.minidom
+from array import array
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+from io import BytesIO, StringIO
+from re import compile, Pattern, DOTALL
+from time import perf_counter, time
+from threading import Event, Lock
+from typing import IO, Callable, Iterator, AnyStr
+from xml.dom.minicompat import NodeList
+from xml.dom.minidom import Document, Element
+from xml.etree import ElementTree
+
+from loguru import logger
+
+# 转换器版本，转换结果发生变化时需要递增，使已有的转换缓存失效
+CONVERTER_VERSION = 2
+
+@lru_cache(maxsize=4096)
+def parse_ttml_time(text: str) -> int:
+    """将TTML时间戳解析为毫秒数
+
+    支持 hh:mm:ss.fff、mm:ss.fff、ss.fff 时钟格式（小数位数不限）以及 12.3s / 123ms 偏移格式。
+    相邻音节的 end/begin 通常是同一个字符串，结果会被缓存
+    """
+    text = text.strip()
+    if text.endswith('ms'):
+        return round(float(text[:-2]))
+    if text.endswith('s'):
+        return round(float(text[:-1]) * 1000)
+
+    clock, _, fraction = text.partition('.')
+    seconds: int = 0
+    for part in clock.split(':'):
+        seconds = seconds * 60 + int(part)
+
+    millis: int = seconds * 1000
+    if len(fraction) == 3:
+        millis += int(fraction)
+    elif fraction:
+        millis += round(int(fraction) * 1000 / 10 ** len(fraction))
+    return millis
+
+class TTMLTime:
+    __slots__ = ('__millis',)
+
+    def __init__(self, centi: str = ''):
+        if centi == '':
+            logger.debug("初始化空的TTMLTime对象")
+            self.__millis: int = 0
+            return
+        self.__millis: int = parse_ttml_time(centi)
+
+    @classmethod
+    def from_millis(cls, millis: int) -> 'TTMLTime':
+        time: TTMLTime = cls.__new__(cls)
+        time.__millis = millis
+        return time
+
+    def __str__(self) -> str:
+        minute, millis = divmod(self.__millis, 60000)
+        return f'{minute:02}:{millis // 1000:02}.{millis % 1000:03}'
+
+    def __int__(self) -> int:
+        return self.__millis
+
+    def __ge__(self, other) -> bool:
+        return self.__millis >= other.__millis
+
+    def __ne__(self, other) -> bool:
+        return self.__millis != other.__millis
+
+    def __sub__(self, other) -> int:
+        return abs(self.__millis - other.__millis)
+
+# ElementTree 会将带前缀的名称展开为 {命名空间}本地名
+TTM_NS: str = '{http://www.w3.org/ns/ttml#metadata}'
+XML_NS: str = '{http://www.w3.org/XML/1998/namespace}'
+
+class QuietLogger:
+    """性能模式使用的日志记录器，丢弃所有逐行日志，不做任何格式化"""
+    def opt(self, *args, **kwargs) -> 'QuietLogger':
+        return self
+
+    def trace(self, *args, **kwargs):
+        pass
+
+    debug = info = trace
+
+def log_failure(message: str):
+    """在 except 块中调用：以一行 ERROR 记录失败原因，完整的异常堆栈只在 DEBUG 级别记录
+
+    命令行的非交互模式只输出 WARNING 以上的日志，不会显示堆栈；日志文件中仍保留完整堆栈
+    """
+    logger.opt(depth=1).error(message)
+    logger.opt(depth=1, exception=True).debug("异常详情")
+
+class ConversionCancelled(Exception):
+    """转换被 TTMLContext.cancel_event 取消"""
+
+class TTMLContext:
+    """单次转换的文档级状态（翻译/对唱/和声标记及移除括号计数）
+
+    每次转换使用独立的实例，多个转换可以在不同线程中同时进行。
+    performance 为 True 时启用性能模式，逐行日志完全关闭；
+    timings 记录各阶段（parse/build/render/write）累计耗时，单位为秒；
+    tracemalloc 启用时 memory 记录各阶段内的内存分配峰值，peak_memory 记录整个转换的峰值（字节）；
+    progress 为进度回调 progress(已处理行数, 总行数)，在转换线程中调用，总行数未知时为 0；
+    cancel_event 被设置后，转换会在处理下一行之前抛出 ConversionCancelled
+    """
+    # 两次进度回调之间的最短间隔（秒）
+    PROGRESS_INTERVAL: float = 0.05
+
+    def __init__(self, performance: bool = False, progress: Callable[[int, int], None] | None = None,
+                 cancel_event: Event | None = None):
+        self.have_ts: bool = False
+        self.have_duet: bool = False
+        self.have_bg: bool = False
+        self.have_pair: int = 0
+        # 逐行日志使用的记录器
+        self.log = QuietLogger() if performance else logger
+        self.timings: dict[str, float] = {}
+        self.memory: dict[str, int] = {}
+        self.peak_memory: int = 0
+        self.progress = progress
+        self.cancel_event: Event | None = cancel_event
+        self.total_lines: int = 0
+        # 结果是否来自转换缓存
+        self.cache_hit: bool = False
+        self.__last_progress: float = 0.0
+
+    def line_done(self, count: int):
+        """每处理完一行调用一次：检查是否已取消，并按间隔报告进度"""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise ConversionCancelled()
+        if self.progress is not None:
+            now = perf_counter()
+            if now - self.__last_progress >= self.PROGRESS_INTERVAL or count == self.total_lines:
+                self.__last_progress = now
+                self.progress(count, self.total_lines)
+
+    @contextmanager
+    def phase(self, name: str):
+        """计时一个转换阶段，多次进入同名阶段时耗时累加；tracemalloc 启用时同时记录本阶段的内存分配峰值"""
+        # 未导入 tracemalloc 时一定没有启用，不为此导入
+        tracemalloc = sys.modules.get('tracemalloc')
+        tracing = tracemalloc is not None and tracemalloc.is_tracing()
+        if tracing:
+            base, peak = tracemalloc.get_traced_memory()
+            self.peak_memory = max(self.peak_memory, peak)
+            tracemalloc.reset_peak()
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + perf_counter() - start
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                self.peak_memory = max(self.peak_memory, peak)
+                self.memory[name] = max(self.memory.get(name, 0), peak - base)
+
+class TTMLLine:
+    __before: Pattern[AnyStr] = compile(r'^\({2,}')
+    __after: Pattern[AnyStr] = compile(r'\){2,}$')
+
+    def __init__(self, element: Element, context: TTMLContext, is_bg: bool = False, index: int = 0):
+        context.log.opt(lazy=True).debug("创建新的TTMLLine对象，处理元素: {}", element.toxml)
+        self.__setup(context, element.getAttribute("ttm:agent"), is_bg, index)
+
+        # 获取 <p> 元素的所有子节点，包括文本节点
+        child_elements:list[Element] = element.childNodes  # iter() 会返回所有子元素和文本节点
+
+        # 遍历所有子元素
+        for child in child_elements:
+            if child.nodeType == 3 and child.nodeValue:  # 如果是文本节点（例如空格或换行）
+                self.__add_text(child.nodeValue)
+            else:
+                # 获取 <span> 中的属性
+                role:str = child.getAttribute("ttm:role")
+                self.__log.trace("处理span元素，role属性: {}", role)
+
+                # 没有role代表是一个syl
+                if role == "":
+                    if child.childNodes[0].nodeValue:
+                        self.__add_syl(child.childNodes[0].nodeValue, child.getAttribute("begin"), child.getAttribute("end"))
+
+                elif role == "x-bg":
+                    # 和声行
+                    self.__log.info("检测到和声行，开始处理")
+                    self.__add_bg(TTMLLine(child, context, True, index))
+                elif role == "x-translation":
+                    # 翻译行
+                    self.__add_ts(f'{child.childNodes[0].data}')
+
+        self.__finish(element.getAttribute("begin"), element.getAttribute("end"))
+
+    @classmethod
+    def from_etree(cls, element: ElementTree.Element, context: TTMLContext, is_bg: bool = False,
+                   index: int = 0) -> 'TTMLLine':
+        """由 ElementTree 元素创建行，供流式解析使用，不保留对元素的引用"""
+        context.log.debug("创建新的TTMLLine对象（流式），处理元素: {}", element.tag)
+        line: TTMLLine = cls.__new__(cls)
+        line.__setup(context, element.get(TTM_NS + 'agent', ''), is_bg, index)
+
+        # ElementTree 中文本节点分布在 text（首个子元素之前）和各子元素的 tail（该子元素之后）
+        if element.text:
+            line.__add_text(element.text)
+
+        for child in element:
+            role: str = child.get(TTM_NS + 'role', '')
+            line.__log.trace("处理span元素，role属性: {}", role)
+
+            if role == "":
+                if child.text:
+                    line.__add_syl(child.text, child.get('begin', ''), child.get('end', ''))
+            elif role == "x-bg":
+                line.__log.info("检测到和声行，开始处理")
+                line.__add_bg(cls.from_etree(child, context, True, index))
+            elif role == "x-translation":
+                line.__add_ts(f'{child.text}')
+
+            if child.tail:
+                line.__add_text(child.tail)
+
+        line.__finish(element.get('begin', ''), element.get('end', ''))
+        return line
+
+    def __setup(self, context: TTMLContext, agent: str, is_bg: bool, index: int):
+        self.__context: TTMLContext = context
+        # 所属 <p> 在文档中的序号（从 0 开始），背景行与主行相同
+        self.index: int = index
+        self.__log = context.log
+        # 音节按列存储：文本、开始时间与时长（毫秒），开始时间为 -1 表示不带时间的纯文本
+        self.__texts: list[str] = []
+        self.__begins: array = array('i')
+        self.__durations: array = array('i')
+        self.__ts_line: str|None = None
+        self.__bg_line: TTMLLine|None = None
+        self.__is_bg: bool = is_bg
+
+        context.have_bg |= is_bg
+        self.__log.trace("是否为和声行: {}, 当前和声状态: {}", is_bg, context.have_bg)
+
+        # agent 属性决定是否为对唱
+        self.__is_duet:bool = bool(agent and agent != 'v1')
+        self.__log.trace("对唱属性: agent={}, is_duet={}", agent, self.__is_duet)
+
+    def __add_text(self, text: str):
+        # 格式化（缩进）的 TTML 中 <span> 之间的换行和缩进不是歌词内容
+        if '\n' in text and not text.strip():
+            self.__log.trace("跳过缩进文本节点")
+            return
+        if len(self.__texts) > 0 and len(text) < 2:
+            self.__texts[-1] += text
+            self.__log.debug("将文本节点追加到上一个元素: {}", self.__texts[-1])
+        else:
+            self.__texts.append(text)
+            self.__begins.append(-1)
+            self.__durations.append(0)
+            self.__log.debug("添加新的文本节点: {}", text)
+
+    def __add_syl(self, text: str, begin: str, end: str):
+        begin_ms: int = parse_ttml_time(begin) if begin else 0
+        end_ms: int = parse_ttml_time(end) if end else 0
+        self.__texts.append(text)
+        self.__begins.append(begin_ms)
+        self.__durations.append(abs(end_ms - begin_ms))
+        self.__log.debug("添加音节元素: {}, 开始时间: {}, 结束时间: {}", text, begin_ms, end_ms)
+
+    def __add_bg(self, bg_line: 'TTMLLine'):
+        self.__bg_line = bg_line
+        self.__bg_line.__is_duet = self.__is_duet
+        self.__log.debug("和声行处理完成，继承对唱属性: {}", self.__is_duet)
+
+    def __add_ts(self, text: str):
+        self.__log.info("检测到翻译行，开始处理")
+        self.__context.have_ts = True
+        self.__ts_line = text
+        self.__log.debug("翻译行内容: {}", self.__ts_line)
+
+    def __finish(self, begin: str, end: str):
+        # 行时间取第一个音节；只有纯文本（没有音节）时使用 <p> 自身的时间
+        first: int = next((i for i, syl_begin in enumerate(self.__begins) if syl_begin >= 0), -1)
+        if first >= 0:
+            self.__begin: TTMLTime = TTMLTime.from_millis(self.__begins[first])
+            self.__end: TTMLTime = TTMLTime.from_millis(self.__begins[first] + self.__durations[first])
+        else:
+            self.__begin: TTMLTime = TTMLTime(begin)
+            self.__end: TTMLTime = TTMLTime(end)
+
+        if self.__is_bg and self.__texts:
+            self.__log.debug("处理和声行的括号")
+            if TTMLLine.__before.search(self.__texts[0]):
+                self.__log.debug("检测到开头的多重括号，进行处理")
+                self.__texts[0] = TTMLLine.__before.sub('(', self.__texts[0])
+                self.__context.have_pair += 1
+                self.__log.debug("处理后的开头文本: {}", self.__texts[0])
+            if TTMLLine.__after.search(self.__texts[-1]):
+                self.__log.debug("检测到结尾的多重括号，进行处理")
+                self.__texts[-1] = TTMLLine.__after.sub(')', self.__texts[-1])
+                self.__context.have_pair += 1
+                self.__log.debug("处理后的结尾文本: {}", self.__texts[-1])
+            self.__log.debug("和声行括号处理完成，当前配对括号数: {}", self.__context.have_pair)
+
+    def __role(self) -> int:
+        return ((int(self.__context.have_bg) + int(self.__is_bg)) * 3
+                + int(self.__context.have_duet) + int(self.__is_duet))
+
+    def __raw(self) -> tuple[str, str|None]:
+        self.__log.debug("生成原始文本格式")
+        self.__log.debug("处理行类型: {}", '和声行' if self.__is_bg else '主要行')
+        
+        # 生成主要文本
+        role_text = f'[{self.__role()}]'
+        self.__log.debug("角色标记: {}", role_text)
+        
+        # 根据行内容类型生成不同格式
+        if len(self.__texts) == 1 and self.__begins[0] < 0:
+            content_text = f'{self.__texts[0]}({int(self.__begin)},{self.__end - self.__begin})'
+            self.__log.debug("单行内容: {}", content_text)
+        else:
+            content_text = ''.join([text if begin < 0 else f'{text}({begin},{duration})'
+                                    for text, begin, duration in zip(self.__texts, self.__begins, self.__durations)])
+            self.__log.debug("多音节/复杂行内容: {}", content_text)
+        
+        main_text = role_text + content_text
+        self.__log.info("完整主要文本: {}", main_text)
+        
+        # 处理翻译文本
+        if self.__ts_line:
+            trans_text = f'[{self.__begin}]{self.__ts_line}'
+            self.__log.info("生成翻译文本: {}", trans_text)
+        else:
+            trans_text = None
+            self.__log.info("无翻译文本")
+        
+        return (main_text, trans_text)
+
+    def to_str(self) -> tuple[tuple[str, str|None],tuple[str, str|None]|None]:
+        return self.__raw(), (self.__bg_line.__raw() if self.__bg_line else None)
+
+def iter_ttml_lines(source, context: TTMLContext) -> Iterator[TTMLLine]:
+    """流式解析TTML，每个<p>闭合后立即产出对应的TTMLLine并释放其子树
+
+    source 可以是文件路径或文件对象，文档级状态记录在 context 中。与 minidom 引擎一致，只处理第一个<body>中第一个<div>内的<p>，
+    并以第一个<head>中第一个<metadata>内的 ttm:agent 判断对唱
+    """
+    body: ElementTree.Element|None = None
+    head: ElementTree.Element|None = None
+    div: ElementTree.Element|None = None
+    metadata: ElementTree.Element|None = None
+    in_div: bool = False
+    in_metadata: bool = False
+    # 当前打开的元素，用于在<p>闭合后将其从父元素中移除
+    stack: list[ElementTree.Element] = []
+    # 下一个<p>在文档中的序号
+    index: int = 0
+
+    for event, elem in ElementTree.iterparse(source, events=('start', 'end')):
+        name: str = elem.tag.rpartition('}')[2]
+        if event == 'start':
+            if body is None and name == 'body':
+                body = elem
+            elif head is None and name == 'head':
+                head = elem
+            elif div is None and name == 'div' and body in stack:
+                logger.debug("找到<div>元素")
+                div = elem
+                in_div = True
+            elif metadata is None and name == 'metadata' and head in stack:
+                logger.debug("找到<metadata>元素")
+                metadata = elem
+                in_metadata = True
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        if elem is div:
+            in_div = False
+        elif elem is metadata:
+            in_metadata = False
+        elif in_div and name == 'p':
+            yield TTMLLine.from_etree(elem, context, index=index)
+            index += 1
+            # 释放已处理的子树，峰值内存只与单行大小相关
+            elem.clear()
+            stack[-1].remove(elem)
+        elif in_metadata and elem.tag == TTM_NS + 'agent':
+            agent_id = elem.get(XML_NS + 'id', '')
+            context.log.debug("检查agent元素: id={}", agent_id)
+            if agent_id != 'v1':
+                context.have_duet = True
+                logger.info(f"发现对唱声部: {agent_id}")
+
+    if div is None or metadata is None:
+        raise ValueError("找不到<div>或<metadata>元素")
+
+def read_ttml_lines(source: str | IO, context: TTMLContext, streaming: bool = False) -> list[TTMLLine]:
+    """读取TTML中的所有歌词行
+
+    source 为文件路径或文件对象；streaming 为 True 时使用基于 iterparse 的流式引擎，输出与默认的 minidom 引擎一致。
+    解析失败时抛出异常
+    """
+    # 逐行日志只在有对应级别的日志输出时才会格式化，性能模式下直接丢弃
+    log = context.log
+    lines: list[TTMLLine] = []
+
+    if streaming:
+        logger.info("使用流式解析引擎处理歌词行")
+        # 流式引擎中解析与建行交织进行，耗时统一计入 parse 阶段
+        with context.phase('parse'):
+            for line in iter_ttml_lines(source, context):
+                lines.append(line)
+                log.opt(lazy=True).info("第{}行转换结果: {}", lambda: line.index + 1, lambda: line.to_str()[0][0])
+                context.line_done(len(lines))
+        return lines
+
+    with context.phase('parse'):
+        # 解析XML内容
+        logger.debug("开始解析XML内容")
+        dom: Document = xml.dom.minidom.parse(source)
+        tt: Document = dom.documentElement  # 获取根元素
+        logger.debug(f"XML根元素标签名: {tt.tagName}")
+
+        # 获取tt中的body/head元素
+        logger.debug("尝试获取body和head元素")
+        body: Element = tt.getElementsByTagName('body')[0]
+        head: Element = tt.getElementsByTagName('head')[0]
+        logger.debug("成功获取body和head元素")
+
+        if not (body and head):
+            raise ValueError("找不到<body>元素")
+
+        # 获取body/head中的<div>/<metadata>子元素
+        logger.debug(f"尝试获取<div>/<metadata>子元素")
+        div: Element = body.getElementsByTagName('div')[0]
+        metadata: Element = head.getElementsByTagName('metadata')[0]
+
+        # 获取div中的所有<p>子元素
+        logger.debug(f"尝试获取div中的所有<p>子元素")
+        p_elements: NodeList[Element] = div.getElementsByTagName('p')
+        agent_elements: NodeList[Element] = metadata.getElementsByTagName('ttm:agent')
+
+        # 检查是否有对唱
+        logger.debug(f"开始检查对唱信息，共发现{len(agent_elements)}个agent元素")
+        for meta in agent_elements:
+            agent_id = meta.getAttribute('xml:id')
+            logger.debug(f"检查agent元素: id={agent_id}")
+            if agent_id != 'v1':
+                context.have_duet = True
+                logger.info(f"发现对唱声部: {agent_id}")
+
+    with context.phase('build'):
+        # 遍历每个<p>元素
+        total_p_elements = len(p_elements)
+        context.total_lines = total_p_elements
+        logger.info(f"开始处理歌词行，共{total_p_elements}行")
+
+        # 行号随 TTMLLine 一起保存，日志中不需要在 NodeList 中线性查找
+        for index, p in enumerate(p_elements):
+            log.info("处理第{}/{}行", index + 1, total_p_elements)
+            line = TTMLLine(p, context, index=index)
+            lines.append(line)
+            log.opt(lazy=True).info("第{}行转换结果: {}", lambda: line.index + 1, lambda: line.to_str()[0][0])
+            log.opt(lazy=True).trace("原始XML内容: {}", p.toxml)
+            context.line_done(index + 1)
+
+        # 行中不再引用DOM节点，提取完成后立即释放整个文档
+        dom.unlink()
+
+    return lines
+
+def render_lines(lines: list[TTMLLine], context: TTMLContext, pad_translation: bool = True) -> tuple[list[str], list[str]]:
+    """生成歌词行与翻译行文本
+
+    pad_translation 为 True 时，存在翻译的文档中没有翻译的行会以仅含时间戳的空行占位，保持与歌词行一一对应
+    """
+    lyric_text: list[str] = []
+    trans_text: list[str] = []
+    pad: bool = pad_translation and context.have_ts
+
+    with context.phase('render'):
+        for line in lines:
+            main_line, bg_line = line.to_str()
+            lyric_text.append(main_line[0])
+            if main_line[1]:
+                trans_text.append(main_line[1])
+            elif pad:
+                # 如果有翻译但当前行没有，添加空行保持行数一致
+                trans_text.append(f"[{line._TTMLLine__begin}]")
+
+            if bg_line:
+                lyric_text.append(bg_line[0])
+                if bg_line[1]:
+                    trans_text.append(bg_line[1])
+                elif pad:
+                    # 如果有翻译但当前行没有，添加空行保持行数一致
+                    trans_text.append(f"[{line._TTMLLine__bg_line._TTMLLine__begin}]")
+
+    return lyric_text, trans_text
+
+# 字节顺序标记与对应的编码，UTF-32 的 BOM 以 UTF-16 的 BOM 开头，需要先判断
+BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+XML_DECL_PATTERN: Pattern = compile(rb'<\?xml[^>]*?encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+# 没有 BOM 和编码声明时，只检查开头这么多字节是否为合法的 UTF-8
+SNIFF_SIZE = 64 * 1024
+# 超过此大小的文件使用内存映射读取
+MMAP_THRESHOLD = 1024 * 1024
+# expat 可以直接解析的编码，其余编码（如 GBK）需要先解码为文本
+EXPAT_ENCODINGS = {'utf-8', 'utf-8-sig', 'utf-16', 'ascii', 'latin-1', 'iso8859-1'}
+
+def detect_encoding(data: bytes | mmap.mmap) -> str:
+    """依次根据 BOM、XML 编码声明和开头部分的 UTF-8 检查判断编码，都不符合时视为 GBK"""
+    for bom, encoding in BOMS:
+        if data[:len(bom)] == bom:
+            return encoding
+
+    match = XML_DECL_PATTERN.match(data[:1024])
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode('ascii')).name
+        except LookupError:
+            logger.warning(f"未知的编码声明: {match.group(1)}")
+
+    sniff = data[:SNIFF_SIZE]
+    try:
+        # 截断处可能位于多字节字符中间，只有读到文件末尾时才要求完整
+        codecs.getincrementaldecoder('utf-8')().decode(sniff, final=len(sniff) == len(data))
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'gbk'
+
+def decode_ttml(data: bytes | mmap.mmap, encoding: str | None = None) -> str:
+    """按 detect_encoding 识别的编码解码；开头部分判断为 UTF-8 但后面出现非法字节时按 GBK 解码"""
+    if encoding is None:
+        encoding = detect_encoding(data)
+    try:
+        return str(data, encoding)
+    except UnicodeDecodeError:
+        if encoding != 'utf-8':
+            raise
+        logger.debug("UTF-8解码失败，尝试使用GBK解码")
+        return str(data, 'gbk')
+
+@contextmanager
+def open_ttml_bytes(path: str) -> Iterator[bytes | mmap.mmap]:
+    """只读取一次文件字节，大文件使用内存映射而不复制到内存，退出时关闭映射"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            yield f.read()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+def read_ttml_file(path: str) -> str:
+    """读取 TTML 文件为文本，只读取和解码一次"""
+    with open_ttml_bytes(path) as data:
+        return decode_ttml(data)
+
+def ttml_parse_source(data: bytes | mmap.mmap) -> IO:
+    """返回可直接交给解析器的文件对象：expat 支持的编码直接解析字节，其余编码解码为文本"""
+    encoding = detect_encoding(data)
+    if encoding not in EXPAT_ENCODINGS:
+        return StringIO(decode_ttml(data, encoding))
+    if isinstance(data, mmap.mmap):
+        data.seek(0)
+        return data
+    return BytesIO(data)
+
+def write_text_atomic(path: str, text: str):
+    """将文本一次性写入文件
+
+    先写入同目录下的临时文件再重命名覆盖目标文件，转换中途出错时不会留下写了一半的输出
+    """
+    fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp',
+                                     dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf8') as f:
+            f.write(text)
+        # mkstemp 创建的文件仅所有者可读写，恢复为普通输出文件的权限
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+class ConversionCache:
+    """以输入内容哈希（含转换器版本）为键的转换结果缓存
+
+    内存中保留最近使用的 max_entries 条结果；指定 cache_dir 时同时保存到磁盘，重启后仍可命中，
+    超过 max_age 秒未使用的磁盘缓存由 evict 清除。
+    可在多个线程中共用，多个进程可以共用同一个 cache_dir
+    """
+    def __init__(self, max_entries: int = 64, cache_dir: str | None = None, max_age: float = 30 * 24 * 3600):
+        self.max_entries: int = max_entries
+        self.cache_dir: str | None = cache_dir
+        self.max_age: float = max_age
+        self.hits: int = 0
+        self.misses: int = 0
+        self.__entries: OrderedDict[str, dict] = OrderedDict()
+        self.__lock = Lock()
+
+    @staticmethod
+    def key(content: str | bytes | mmap.mmap, variant: str) -> str:
+        """计算缓存键，variant 区分不同的输出形式（文本接口与 .lys 文件的翻译格式不同）"""
+        digest = hashlib.sha256(f"{CONVERTER_VERSION}\0{variant}\0".encode())
+        digest.update(content.encode('utf8') if isinstance(content, str) else content)
+        return digest.hexdigest()
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def __remember(self, key: str, entry: dict):
+        with self.__lock:
+            self.__entries[key] = entry
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+    def get(self, key: str) -> dict | None:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        if self.cache_dir:
+            try:
+                with open(self.__path(key), encoding='utf8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None:
+                # 更新修改时间，evict 按最后使用的时间清除
+                try:
+                    os.utime(self.__path(key))
+                except OSError:
+                    pass
+                self.__remember(key, entry)
+                with self.__lock:
+                    self.hits += 1
+                return entry
+
+        with self.__lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, entry: dict):
+        self.__remember(key, entry)
+        if self.cache_dir:
+            try:
+                path = self.__path(key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                write_text_atomic(path, json.dumps(entry, ensure_ascii=False))
+            except OSError as e:
+                logger.warning(f"写入转换缓存失败: {str(e)}")
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def evict(self, max_age: float | None = None) -> int:
+        """清除超过 max_age 秒（默认为 self.max_age）未使用的磁盘缓存，返回清除的条目数
+
+        只处理 cache_dir 下按键前两位分组的缓存文件，同一目录中的其他内容（如 amll 子目录）不受影响
+        """
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return 0
+        deadline = time() - (self.max_age if max_age is None else max_age)
+        removed = 0
+        for prefix in os.listdir(self.cache_dir):
+            group = os.path.join(self.cache_dir, prefix)
+            if len(prefix) != 2 or not os.path.isdir(group):
+                continue
+            for name in os.listdir(group):
+                if not (name.startswith(prefix) and name.endswith('.json')):
+                    continue
+                path = os.path.join(group, name)
+                try:
+                    if os.path.getmtime(path) < deadline:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+        if removed:
+            logger.info(f"已清除 {removed} 条过期的转换缓存")
+        return removed
+
+def output_unchanged(path: str, text: str) -> bool:
+    """输出文件是否已存在且内容与 text 相同"""
+    try:
+        with open(path, encoding='utf8') as f:
+            return f.read() == text
+    except (OSError, UnicodeDecodeError):
+        return False
+
+def ttml_to_lyricify_syllable_text(ttml_content, streaming=False, context=None, cache=None):
+    """将TTML文本内容（str，或未解码的 bytes）转换为Lyricify Syllable文本
+
+    streaming 为 True 时使用基于 iterparse 的流式引擎，输出与默认的 minidom 引擎一致
+    context 为本次转换的 TTMLContext，传入后可在转换结束后读取翻译/括号等统计信息
+    cache 为 ConversionCache，相同内容再次转换时直接返回缓存的结果
+    返回 (是否成功, 歌词文本, 翻译文本)，文档中没有翻译时翻译文本为 None；
+    通过 context.cancel_event 取消时抛出 ConversionCancelled
+    """
+    logger.info("开始TTML到Lyricify Syllable的转换")
+    logger.debug(f"输入TTML内容长度: {len(ttml_content)}字符")
+
+    # 每次转换使用独立的状态
+    if context is None:
+        context = TTMLContext()
+    logger.debug("创建转换状态")
+
+    key: str | None = None
+    if cache is not None:
+        key = cache.key(ttml_content, 'text')
+        entry = cache.get(key)
+        if entry is not None:
+            logger.info("命中转换缓存")
+            context.cache_hit = True
+            context.have_ts = entry['have_ts']
+            context.have_pair = entry['have_pair']
+            return True, entry['lyric'], entry['trans']
+
+    try:
+        # 预处理XML内容，移除可能导致解析错误的内容；没有时不复制
+        logger.debug("开始预处理XML内容")
+        empty_xmlns = 'xmlns=""' if isinstance(ttml_content, str) else b'xmlns=""'
+        if empty_xmlns in ttml_content:
+            ttml_content = ttml_content.replace(empty_xmlns, empty_xmlns[:0])
+            logger.debug("移除了空的xmlns属性")
+
+        if streaming:
+            # 流式引擎无法预先得知行数，按闭合标签估算，用于进度显示
+            context.total_lines = ttml_content.count('</p>' if isinstance(ttml_content, str) else b'</p>')
+        source = StringIO(ttml_content) if isinstance(ttml_content, str) else ttml_parse_source(ttml_content)
+        lines = read_ttml_lines(source, context, streaming)
+        lyric_text, trans_text = render_lines(lines, context)
+    except ConversionCancelled:
+        logger.info("转换已取消")
+        raise
+    except Exception as e:
+        log_failure(f"无法解析TTML内容: {str(e)}")
+        return False, None, None
+
+    lyric_result = "\n".join(lyric_text)
+    trans_result = "\n".join(trans_text) if context.have_ts else None
+    if key is not None:
+        cache.put(key, {'lyric': lyric_result, 'trans': trans_result,
+                        'have_ts': context.have_ts, 'have_pair': context.have_pair})
+    return True, lyric_result, trans_result
+
+def render_lys(input_path, streaming=False, context=None, cache=None) -> tuple[str, str | None]:
+    """转换TTML文件，返回 (.lys 文件内容, _trans.lrc 文件内容)，没有翻译时翻译内容为 None
+
+    参数含义同 ttml_to_lys，不写入任何文件；解析失败时抛出异常
+    """
+    if context is None:
+        context = TTMLContext()
+
+    key: str | None = None
+    with ExitStack() as stack:
+        # 文件只读取一次（大文件使用内存映射），缓存键与解析共用同一份字节
+        data = stack.enter_context(open_ttml_bytes(input_path)) if isinstance(input_path, str) else input_path
+        is_bytes = isinstance(data, (bytes, bytearray, mmap.mmap))
+        if cache is not None and is_bytes:
+            key = cache.key(data, 'lys')
+            entry = cache.get(key)
+            if entry is not None:
+                logger.info("命中转换缓存")
+                context.cache_hit = True
+                context.have_ts = entry['have_ts']
+                context.have_pair = entry['have_pair']
+                return entry['lyric'], entry['trans']
+
+        logger.debug(f"尝试解析XML文件")
+        lines = read_ttml_lines(ttml_parse_source(data) if is_bytes else data, context, streaming)
+    # 在内存中拼接完整的歌词/翻译文本，随后每个文件只写入一次
+    lyric_text, trans_text = render_lines(lines, context, pad_translation=False)
+    lyric_body = ''.join(text + '\n' for text in lyric_text)
+    trans_body = ''.join(text + '\n' for text in trans_text) if context.have_ts else None
+    if key is not None:
+        cache.put(key, {'lyric': lyric_body, 'trans': trans_body,
+                        'have_ts': context.have_ts, 'have_pair': context.have_pair})
+    return lyric_body, trans_body
+
+def ttml_to_lys(input_path, streaming=False, output_dir=None, context=None, cache=None, base_name=None):
+    """转换TTML文件并输出 .lys 歌词文件（有翻译时另输出 _trans.lrc 翻译文件）
+
+    input_path 为文件路径、未解码的 bytes 或二进制文件对象，base_name 为输出文件名（不含扩展名），默认取输入文件名；
+    输入不是文件路径时必须指定 base_name，输入为文件对象时不使用 cache
+    streaming 为 True 时使用基于 iterparse 的流式引擎，输出与默认的 minidom 引擎一致
+    output_dir 为输出目录，默认为本模块所在目录下的 output
+    context 为本次转换的 TTMLContext，传入后可在转换结束后读取翻译/括号等统计信息
+    cache 为 ConversionCache，文件内容未变化时直接使用缓存的结果，输出文件内容相同时不再重写
+    返回 (是否成功, 歌词文件路径, 翻译文件路径)，没有翻译时翻译文件路径为空字符串；
+    通过 context.cancel_event 取消时抛出 ConversionCancelled，不会写入任何文件
+    """
+    if context is None:
+        context = TTMLContext()
+
+    lyric_path: str = ''
+    trans_path: str = ''
+    try:
+        lyric_body, trans_body = render_lys(input_path, streaming, context, cache)
+
+        with context.phase('write'):
+            if output_dir is None:
+                # 获取当前.py文件的目录路径
+                logger.debug(f"获取脚本所在的目录路径")
+                script_dir = os.path.dirname(os.path.abspath(__file__))
+                output_dir = os.path.join(script_dir, 'output')
+
+            # 创建output目录（如果不存在的话）
+            logger.debug(f"创建output目录（如果不存在的话）")
+            os.makedirs(output_dir, exist_ok=True)  # 确保目录存在
+
+            if base_name is None:
+                base_name = os.path.splitext(os.path.basename(input_path))[0]
+
+            lyric_path = os.path.join(output_dir, f"{base_name}.lys")
+            # 命中缓存且输出文件未变化时跳过写入
+            if not (context.cache_hit and output_unchanged(lyric_path, lyric_body)):
+                logger.debug(f"写入lys文件")
+                write_text_atomic(lyric_path, lyric_body)
+
+            if trans_body is not None:
+                logger.debug(f"翻译行存在")
+                trans_path = os.path.join(output_dir, f"{base_name}_trans.lrc")
+                if not (context.cache_hit and output_unchanged(trans_path, trans_body)):
+                    logger.debug(f"写入lrc翻译文件")
+                    write_text_atomic(trans_path, trans_body)
+    except ConversionCancelled:
+        logger.info(f"转换已取消: {input_path if isinstance(input_path, str) else base_name}")
+        raise
+    except Exception as e:
+        log_failure(f"无法解析TTML文件: {input_path if isinstance(input_path, str) else base_name}: {str(e)}")
+        return False, None, None
+
+    return True, lyric_path, trans_path
+
+def is_ttml_path(path: str) -> bool:
+    return path.lower().endswith('.ttml')
+
+def walk_ttml_files(root: str) -> Iterator[str]:
+    """递归列出目录下的所有 .ttml 文件，同一目录中按文件名排序"""
+    for dir_path, _, names in os.walk(root):
+        for name in sorted(names):
+            if is_ttml_path(name):
+                yield os.path.join(dir_path, name)
+
+GLOB_MAGIC = compile(r'[*?[]')
+
+def glob_root(pattern: str) -> str:
+    """通配符中第一个含有通配字符的部分之前的目录，如 lyrics/**/*.ttml 为 lyrics"""
+    match = GLOB_MAGIC.search(pattern)
+    return os.path.dirname(pattern[:match.start()] if match else pattern) or os.curdir
+
+def collect_ttml_files(patterns: list[str], use_glob: bool = True) -> list[tuple[str, str]]:
+    """展开目录（递归查找 .ttml）、文件路径以及通配符，去重并保持顺序
+
+    返回 [(文件路径, 相对目录)]：相对目录为文件相对于所在目录参数（或通配符中不含通配字符的开头部分）的目录，
+    直接给出的文件为空字符串，用于在输出目录中保持输入的目录结构（见 plan_outputs）。
+    use_glob 为 False 时不展开通配符（如拖放得到的路径，其中的 [ ] 等字符只是文件名的一部分）
+    """
+    files: dict[str, str] = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for path in walk_ttml_files(pattern):
+                files.setdefault(path, os.path.relpath(os.path.dirname(path), pattern))
+        elif os.path.isfile(pattern):
+            files.setdefault(pattern, '')
+        elif use_glob:
+            root = glob_root(pattern)
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(path):
+                    files.setdefault(path, os.path.relpath(os.path.dirname(path), root))
+    # relpath 对同一目录返回 "."
+    return [(path, '' if subdir == os.curdir else subdir) for path, subdir in files.items()]
+
+def output_dir_for(path: str, output_dir: str | None, subdir: str = '') -> str:
+    """文件的输出目录：output_dir 为 None 时为源文件所在目录，否则为 output_dir 下的相对目录 subdir"""
+    return os.path.normpath(os.path.join(output_dir, subdir)) if output_dir else os.path.dirname(os.path.abspath(path))
+
+def plan_outputs(files: list[tuple[str, str]], output_dir: str | None
+                 ) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+    """确定每个文件的输出目录，files 为 collect_ttml_files 的结果
+
+    output_dir 为 None 时输出到源文件所在目录，否则输出到 output_dir 下的相对目录，不同子目录中的同名文件不会互相覆盖。
+    返回 ([(文件路径, 输出目录)], [(文件路径, 输出路径与之相同的文件)])，输出路径与前面的文件相同的文件不应转换
+    """
+    planned: list[tuple[str, str]] = []
+    conflicts: list[tuple[str, str]] = []
+    owners: dict[str, str] = {}
+    for path, subdir in files:
+        target_dir = output_dir_for(path, output_dir, subdir)
+        lyric_path = os.path.join(target_dir, f"{os.path.splitext(os.path.basename(path))[0]}.lys")
+        owner = owners.setdefault(os.path.normcase(os.path.abspath(lyric_path)), path)
+        if owner != path:
+            conflicts.append((path, owner))
+        else:
+            planned.append((path, target_dir))
+    return planned, conflicts
+
+# 工作进程中的转换缓存，由 worker_init 创建
+worker_cache: ConversionCache | None = None
+
+def worker_init(use_cache: bool = False, cache_dir: str | None = None, quiet: bool = True):
+    """转换进程池的初始化函数
+
+    quiet 为 True 时移除所有日志输出（子进程中的逐行日志没有意义，而且会拖慢转换）；
+    use_cache 为 True 时创建进程内的转换缓存，指定 cache_dir 时同时使用磁盘缓存
+    """
+    global worker_cache
+    if quiet:
+        logger.remove()
+    worker_cache = ConversionCache(cache_dir=cache_dir) if use_cache else None
+
+def convert_file_in_worker(input_path: str, output_dir: str | None, streaming: bool = False
+                           ) -> tuple[str, bool, str, int, bool, float]:
+    """在工作进程中转换单个文件并输出 .lys / _trans.lrc，output_dir 一般为 plan_outputs 确定的输出目录，
+    为 None 时输出到源文件所在目录
+
+    返回 (文件路径, 是否成功, 歌词文件路径, 移除的括号数, 是否命中缓存, 耗时)，失败时歌词文件路径为空字符串
+    """
+    start = perf_counter()
+    context = TTMLContext(performance=True)
+    success, lyric_path, _ = ttml_to_lys(input_path, streaming,
+                                         output_dir or os.path.dirname(os.path.abspath(input_path)),
+                                         context, worker_cache)
+    return (input_path, success, lyric_path or '', context.have_pair if success else 0, context.cache_hit,
+            perf_counter() - start)
+
+def convert_text_in_worker(data: bytes, streaming: bool = False) -> tuple[bool, str | None, str | None, int]:
+    """在工作进程中转换 TTML 内容，返回 (是否成功, 歌词文本, 翻译文本, 移除的括号数)"""
+    context = TTMLContext(performance=True)
+    success, lyric, trans = ttml_to_lyricify_syllable_text(data, streaming, context, worker_cache)
+    return success, lyric, trans, context.have_pair
+
+class IncrementalConverter:
+    """增量转换：缓存每个 <p> 的解析结果，再次转换时只重新解析源码发生变化的行
+
+    文档按 <p> 切分为骨架（<p> 以外的部分）和各行源码。骨架不变时，未改动的行直接复用缓存，
+    改动的行单独解析；骨架变化时重新检查文档结构（对唱声部、<p> 是否都位于<div>内），
+    无法按行切分的文档每次都完整转换。输出与 ttml_to_lyricify_syllable_text 一致。
+    同一实例不能在多个线程中同时使用
+    """
+    __p_pattern: Pattern[str] = compile(r'<p\b[^>]*?/>|<p\b.*?</p>', DOTALL)
+    __start_pattern: Pattern[str] = compile(r'<(tt|body|div)\b[^>]*>')
+
+    def __init__(self):
+        self.__skeleton: str | None = None
+        # 骨架可以按行切分时的文档信息：对唱标记及包裹单行源码所需的 <tt>/<body>/<div> 开始标签
+        self.__have_duet: bool = False
+        self.__wrapper: tuple[str, str] | None = None
+        # <p> 源码 -> (TTMLLine, 该行独立的 TTMLContext, (have_ts, have_bg, have_pair))
+        self.__cache: dict[str, tuple[TTMLLine, TTMLContext, tuple[bool, bool, int]]] = {}
+        self.context: TTMLContext | None = None
+        self.reused: int = 0
+        self.parsed: int = 0
+
+    def __scan(self, skeleton: str, count: int) -> bool:
+        """检查新的骨架：记录对唱标记，并确认切分出的 <p> 都位于第一个<div>内"""
+        context = TTMLContext(performance=True)
+        lines = sum(1 for _ in iter_ttml_lines(StringIO(skeleton), context))
+        starts: dict[str, str] = {}
+        for match in self.__start_pattern.finditer(skeleton):
+            starts.setdefault(match.group(1), match.group(0))
+        if lines != count or len(starts) != 3:
+            return False
+        self.__have_duet = context.have_duet
+        self.__wrapper = (starts['tt'] + starts['body'] + starts['div'], '</div></body></tt>')
+        return True
+
+    def __build(self, source: str, index: int, performance: bool) -> tuple[TTMLLine, TTMLContext, tuple[bool, bool, int]]:
+        """单独解析一行 <p> 源码"""
+        head, tail = self.__wrapper
+        root = ElementTree.fromstring(head + source + tail)
+        p = next(elem for elem in root.iter() if elem.tag.rpartition('}')[2] == 'p')
+        context = TTMLContext(performance)
+        line = TTMLLine.from_etree(p, context, index=index)
+        return line, context, (context.have_ts, context.have_bg, context.have_pair)
+
+    def convert(self, ttml_content: str, performance: bool = True):
+        """转换 TTML 文本，返回值与 ttml_to_lyricify_syllable_text 相同；本次的文档状态保存在 context 中"""
+        ttml_content = ttml_content.replace('xmlns=""', '')
+        sources: list[str] = self.__p_pattern.findall(ttml_content)
+        skeleton = self.__p_pattern.sub('<p/>', ttml_content)
+
+        try:
+            if skeleton != self.__skeleton:
+                self.__cache.clear()
+                self.__wrapper = None
+                self.__skeleton = skeleton
+                if not self.__scan(skeleton, len(sources)):
+                    logger.debug("文档无法按行切分，使用完整转换")
+            if self.__wrapper is None:
+                self.reused, self.parsed = 0, len(sources)
+                self.context = TTMLContext(performance)
+                return ttml_to_lyricify_syllable_text(ttml_content, context=self.context)
+
+            cache: dict[str, tuple[TTMLLine, TTMLContext, tuple[bool, bool, int]]] = {}
+            lines: list[TTMLLine] = []
+            self.reused = self.parsed = 0
+            for index, source in enumerate(sources):
+                entry = cache.get(source) or self.__cache.get(source)
+                if entry is None:
+                    entry = self.__build(source, index, performance)
+                    self.parsed += 1
+                else:
+                    self.reused += 1
+                cache[source] = entry
+                lines.append(entry[0])
+            self.__cache = cache
+
+            # 汇总各行的状态，角色标记依赖文档级的对唱/和声标记，渲染前同步到每行的状态中
+            context = TTMLContext(performance)
+            context.have_duet = self.__have_duet
+            for _, _, (have_ts, have_bg, have_pair) in cache.values():
+                context.have_ts |= have_ts
+                context.have_bg |= have_bg
+            context.have_pair = sum(cache[source][2][2] for source in sources)
+            for _, line_context, _ in cache.values():
+                line_context.have_duet = context.have_duet
+                line_context.have_bg = context.have_bg
+            self.context = context
+
+            lyric_text, trans_text = render_lines(lines, context)
+        except Exception as e:
+            log_failure(f"无法解析TTML内容: {str(e)}")
+            # 下次转换时重新检查文档结构
+            self.__skeleton = None
+            return False, None, None
+
+        return True, "\n".join(lyric_text), "\n".join(trans_text) if context.have_ts else None
@@ -0,0 +1,99 @@
+"""转换性能分析
+
+run_profiled 在 cProfile 和 tracemalloc 下执行一次转换，并将报告写入指定目录（GUI 与命令行均为 log 目录）。
+报告包含：
+- 各阶段（parse/build/render/write）的耗时及内存分配峰值，来自 TTMLContext.timings / memory
+- 日志（loguru）占用的时间
+- 分配内存最多的代码行
+- 按累计耗时和自身耗时排序的函数列表
+"""
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+from datetime import datetime
+from time import perf_counter
+from typing import Any, Callable
+
+from ttml_converter import TTMLContext
+
+# 报告中列出的函数数量
+TOP_FUNCTIONS = 25
+# 报告中列出的内存分配位置数量
+TOP_ALLOCATIONS = 10
+# 报告中各阶段的顺序，其他阶段排在后面
+PHASES = ('parse', 'build', 'render', 'write')
+
+def format_size(size: int) -> str:
+    return f"{size / 1024 / 1024:.2f} MB" if size >= 1024 * 1024 else f"{size / 1024:.1f} KB"
+
+def logging_time(stats: pstats.Stats) -> float:
+    """统计 loguru 内部函数的自身耗时之和"""
+    return sum(tottime for (filename, _, _), (_, _, tottime, _, _) in stats.stats.items()
+               if f"{os.sep}loguru{os.sep}" in filename)
+
+def format_report(label: str, elapsed: float, peak: int, context: TTMLContext,
+                  profiler: cProfile.Profile, snapshot: tracemalloc.Snapshot) -> str:
+    lines = [
+        f"性能分析报告: {label}",
+        f"时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"总耗时: {elapsed * 1000:.1f} ms，内存分配峰值: {format_size(peak)}",
+        "",
+        "== 各阶段 ==",
+        f"{'阶段':<10}{'耗时 (ms)':>12}{'占比':>8}{'峰值':>14}",
+    ]
+    names = [name for name in PHASES if name in context.timings]
+    names += [name for name in context.timings if name not in PHASES]
+    for name in names:
+        seconds = context.timings[name]
+        share = seconds / elapsed * 100 if elapsed > 0 else 0.0
+        lines.append(f"{name:<10}{seconds * 1000:>12.1f}{share:>7.1f}%{format_size(context.memory.get(name, 0)):>14}")
+    # 缓存命中时没有任何阶段
+    if not names:
+        lines.append("（无，可能使用了缓存的结果）")
+
+    lines += ["", f"日志（loguru）自身耗时: {logging_time(pstats.Stats(profiler)) * 1000:.1f} ms"]
+
+    lines += ["", "== 内存分配最多的代码行 =="]
+    for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+        frame = stat.traceback[0]
+        lines.append(f"{format_size(stat.size):>12}  {stat.count:>8} 次  {frame.filename}:{frame.lineno}")
+
+    for sort_key, title in (('cumulative', "累计耗时"), ('tottime', "自身耗时")):
+        buffer = io.StringIO()
+        pstats.Stats(profiler, stream=buffer).sort_stats(sort_key).print_stats(TOP_FUNCTIONS)
+        lines += ["", f"== 函数（按{title}排序）==", buffer.getvalue().strip()]
+    return '\n'.join(lines) + '\n'
+
+def run_profiled(report_dir: str, label: str, context: TTMLContext, func: Callable[..., Any],
+                 *args, **kwargs) -> tuple[Any, str]:
+    """在 cProfile 和 tracemalloc 下调用 func(*args, **kwargs)，返回 (func 的返回值, 报告路径)
+
+    context 需为传给转换函数的同一个 TTMLContext，各阶段的耗时和内存峰值从中读取。
+    cProfile 只分析调用线程，func 需在当前线程中完成转换；func 抛出异常时不写入报告
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    start = perf_counter()
+    try:
+        result = profiler.runcall(func, *args, **kwargs)
+        elapsed = perf_counter() - start
+        # 各阶段开始时会重置峰值，取阶段内记录的峰值与最后一段的峰值中的较大者
+        peak = max(tracemalloc.get_traced_memory()[1], context.peak_memory)
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ))
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    os.makedirs(report_dir, exist_ok=True)
+    report_path = os.path.join(report_dir, f"profile {datetime.now().strftime('%Y-%m-%d %H.%M.%S.%f')}.txt")
+    with open(report_path, 'w', encoding='utf8') as f:
+        f.write(format_report(label, elapsed, peak, context, profiler, snapshot))
+    return result, report_path
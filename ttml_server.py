@@ -0,0 +1,192 @@
+"""本地 HTTP 转换服务，仅使用标准库
+
+供 GitHub Issue 机器人等需要频繁转换的场景使用，避免每次转换都重新启动 Python：
+
+- POST /convert：请求体为 TTML（或 {"ttml": "..."} 形式的 JSON），返回 JSON
+  {"lyric": ..., "trans": ..., "have_pair": ...}；?format=multipart 或 Accept 为 multipart/mixed 时
+  以 multipart/mixed 返回 lyric.lys 和 trans.lrc 两部分。?streaming=1 使用流式解析引擎
+- GET /health：返回服务状态及统计信息
+
+转换在固定大小的进程池中进行，请求体超过上限时返回 413，排队的请求过多时立即返回 503（带 Retry-After）
+"""
+import json
+import os
+import signal
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import BoundedSemaphore, Lock, Thread
+from urllib.parse import parse_qs, urlsplit
+
+from loguru import logger
+
+from ttml_converter import convert_text_in_worker, worker_init
+
+# 默认的请求体大小上限（字节）
+DEFAULT_MAX_BODY = 8 * 1024 * 1024
+# 请求体不超过上限的这么多倍时读取并丢弃后返回 413，否则直接关闭连接
+DRAIN_FACTOR = 4
+# 单次转换的最长等待时间（秒）
+CONVERT_TIMEOUT = 30
+
+class ConversionServer(ThreadingHTTPServer):
+    """HTTP 服务器：请求在线程中接收，转换提交到 executor；同时排队的转换最多 max_pending 个"""
+    daemon_threads = True
+    # 突发的并发连接由排队上限处理，不在 listen 队列处被拒绝
+    request_queue_size = 128
+
+    def __init__(self, address: tuple[str, int], executor: Executor, max_pending: int,
+                 max_body: int = DEFAULT_MAX_BODY):
+        super().__init__(address, ConversionHandler)
+        self.executor: Executor = executor
+        self.max_body: int = max_body
+        self.slots = BoundedSemaphore(max_pending)
+        self.stats: dict[str, int] = {'served': 0, 'failed': 0, 'rejected': 0, 'too_large': 0}
+        self.__lock = Lock()
+
+    def count(self, name: str):
+        with self.__lock:
+            self.stats[name] += 1
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    # 保持连接，机器人可以复用同一个连接连续提交
+    protocol_version = 'HTTP/1.1'
+    server: ConversionServer
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers: dict[str, str] | None = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, payload: dict, headers: dict[str, str] | None = None):
+        self.send_body(status, json.dumps(payload, ensure_ascii=False).encode('utf8'),
+                       'application/json; charset=utf-8', headers)
+
+    def send_error_json(self, status: int, message: str, headers: dict[str, str] | None = None):
+        self.send_json(status, {'error': message}, headers)
+
+    def do_GET(self):
+        if urlsplit(self.path).path != '/health':
+            self.send_error_json(404, "未找到")
+            return
+        self.send_json(200, {'ok': True, **self.server.stats})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/convert':
+            self.send_error_json(404, "未找到")
+            return
+        query = parse_qs(url.query)
+
+        length = self.headers.get('Content-Length')
+        if length is None or not length.isdigit():
+            self.close_connection = True
+            self.send_error_json(411, "需要 Content-Length", {'Connection': 'close'})
+            return
+        if int(length) > self.server.max_body:
+            self.server.count('too_large')
+            message = f"请求体超过 {self.server.max_body} 字节"
+            if int(length) > self.server.max_body * DRAIN_FACTOR:
+                # 过大的请求体不再读取，未读取的内容会破坏后续请求，直接关闭连接
+                self.close_connection = True
+                self.send_error_json(413, message, {'Connection': 'close'})
+                return
+            # 读取并丢弃请求体，客户端可以完整发送请求后收到 413，连接也可以继续使用
+            remaining = int(length)
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, 64 * 1024))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+            self.send_error_json(413, message)
+            return
+        data = self.rfile.read(int(length))
+
+        if self.headers.get_content_type() == 'application/json':
+            try:
+                data = json.loads(data)['ttml'].encode('utf8')
+            except (ValueError, KeyError, TypeError, AttributeError):
+                self.send_error_json(400, "JSON 请求体需要包含 ttml 字段")
+                return
+
+        # 排队的转换已满时立即拒绝，由客户端稍后重试
+        if not self.server.slots.acquire(blocking=False):
+            self.server.count('rejected')
+            self.send_error_json(503, "服务繁忙，请稍后重试", {'Retry-After': '1'})
+            return
+        try:
+            future = self.server.executor.submit(convert_text_in_worker, data, query.get('streaming') == ['1'])
+        except Exception as e:
+            # 进程池已损坏或已关闭
+            self.server.slots.release()
+            logger.exception(f"转换服务出错: {str(e)}")
+            self.server.count('failed')
+            self.send_error_json(500, "转换服务出错")
+            return
+        # 转换真正结束后才释放名额：超时返回 504 后转换仍在运行，仍然占用排队名额
+        future.add_done_callback(lambda _: self.server.slots.release())
+        try:
+            success, lyric, trans, have_pair = future.result(timeout=CONVERT_TIMEOUT)
+        except TimeoutError:
+            self.server.count('failed')
+            self.send_error_json(504, "转换超时")
+            return
+        except Exception as e:
+            # 工作进程异常退出等
+            logger.exception(f"转换服务出错: {str(e)}")
+            self.server.count('failed')
+            self.send_error_json(500, "转换服务出错")
+            return
+
+        if not success:
+            self.server.count('failed')
+            self.send_error_json(422, "无法解析TTML内容，请检查格式是否正确")
+            return
+        self.server.count('served')
+
+        if query.get('format') == ['multipart'] or 'multipart/' in self.headers.get('Accept', ''):
+            boundary = uuid.uuid4().hex
+            parts = [('lyric', 'lyric.lys', lyric)] + ([('trans', 'trans.lrc', trans)] if trans is not None else [])
+            body = b''.join(
+                f"--{boundary}\r\nContent-Type: text/plain; charset=utf-8\r\n"
+                f"Content-Disposition: attachment; name=\"{name}\"; filename=\"{filename}\"\r\n\r\n{text}\r\n".encode('utf8')
+                for name, filename, text in parts) + f"--{boundary}--\r\n".encode('ascii')
+            self.send_body(200, body, f'multipart/mixed; boundary={boundary}', {'X-Removed-Brackets': str(have_pair)})
+        else:
+            self.send_json(200, {'lyric': lyric, 'trans': trans, 'have_pair': have_pair})
+
+def make_server(host: str = '127.0.0.1', port: int = 8000, jobs: int | None = None, max_body: int = DEFAULT_MAX_BODY,
+                queue_size: int = 4, use_threads: bool = False) -> ConversionServer:
+    """创建转换服务器（尚未开始处理请求）
+
+    jobs 为工作进程数（默认为 CPU 核心数），每个工作进程最多排队 queue_size 个转换；
+    use_threads 为 True 时使用线程池代替进程池（便于调试）
+    """
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    # 每个工作进程使用进程内的转换缓存（机器人经常重复提交相同的歌词）
+    if use_threads:
+        # 线程池与服务器共用同一个进程，保留日志输出，缓存可在线程间共用
+        worker_init(use_cache=True, quiet=False)
+        executor = ThreadPoolExecutor(max_workers=jobs)
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=worker_init, initargs=(True,))
+    return ConversionServer((host, port), executor, jobs * queue_size, max_body)
+
+def serve(server: ConversionServer):
+    """处理请求直到 KeyboardInterrupt 或 SIGTERM，退出时关闭工作进程"""
+    # shutdown 会等待 serve_forever 退出，不能在运行 serve_forever 的线程（即信号处理函数）中直接调用
+    signal.signal(signal.SIGTERM, lambda signum, frame: Thread(target=server.shutdown, daemon=True).start())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.executor.shutdown(cancel_futures=True)
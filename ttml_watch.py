@@ -0,0 +1,250 @@
+"""监视文件夹，自动转换新增或修改的 TTML 文件
+
+- TTMLWatcher: 监视目录树，文件写入完成（一段时间内不再变化）后转换为 .lys / _trans.lrc，
+  并记录每个文件内容的哈希，内容未变化的保存不会重复转换
+- Linux 上使用 inotify（通过 ctypes 调用，无需额外依赖），其他系统或 inotify 不可用时定时轮询目录
+"""
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import select
+import struct
+import sys
+import time
+from threading import Event
+from typing import Callable
+
+from loguru import logger
+
+from ttml_converter import TTMLContext, is_ttml_path, open_ttml_bytes, output_dir_for, ttml_to_lys, walk_ttml_files
+
+# inotify 事件掩码（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')
+
+class PollingBackend:
+    """定时比较目录树中文件的修改时间和大小"""
+    def __init__(self, root: str, interval: float = 2.0):
+        self.root: str = root
+        self.interval: float = interval
+        self.__snapshot: dict[str, tuple[int, int]] = self.__scan()
+
+    def __scan(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        for path in walk_ttml_files(self.root):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def poll(self, timeout: float, stop_event: Event) -> list[str]:
+        """等待至多 min(timeout, interval) 秒，返回发生变化的文件路径"""
+        stop_event.wait(min(timeout, self.interval))
+        snapshot = self.__scan()
+        changed = [path for path, state in snapshot.items() if self.__snapshot.get(path) != state]
+        self.__snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+class InotifyBackend:
+    """使用 Linux inotify 接收文件变化事件，新建的子目录会自动加入监视；不可用时抛出 OSError"""
+    def __init__(self, root: str):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify 仅在 Linux 上可用")
+        self.__libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.__fd: int = self.__libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.__fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self.__dirs: dict[int, str] = {}
+        self.root: str = root
+        self.__add_tree(root)
+
+    def __add_tree(self, root: str) -> list[str]:
+        """监视 root 及其所有子目录，返回其中已有的 .ttml 文件（目录可能在加入监视前就已写入文件）"""
+        files = []
+        for dir_path, _, names in os.walk(root):
+            wd = self.__libc.inotify_add_watch(self.__fd, os.fsencode(dir_path), WATCH_MASK)
+            if wd < 0:
+                logger.warning(f"无法监视目录: {dir_path}（errno {ctypes.get_errno()}）")
+                continue
+            self.__dirs[wd] = dir_path
+            files.extend(os.path.join(dir_path, name) for name in names if is_ttml_path(name))
+        return files
+
+    def poll(self, timeout: float, stop_event: Event) -> list[str]:
+        """等待至多 timeout 秒，返回发生变化的文件路径；事件队列溢出时返回目录树中的所有 .ttml 文件"""
+        readable, _, _ = select.select([self.__fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            buffer = os.read(self.__fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changed = []
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            name = os.fsdecode(buffer[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0'))
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                logger.warning("inotify 事件队列溢出，重新扫描目录")
+                changed.extend(walk_ttml_files(self.root))
+                continue
+            if mask & IN_IGNORED:
+                self.__dirs.pop(wd, None)
+                continue
+            dir_path = self.__dirs.get(wd)
+            if dir_path is None or not name:
+                continue
+            path = os.path.join(dir_path, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed.extend(self.__add_tree(path))
+            elif is_ttml_path(name):
+                changed.append(path)
+        return changed
+
+    def close(self):
+        os.close(self.__fd)
+
+class TTMLWatcher:
+    """监视 root 目录树并自动转换 .ttml 文件
+
+    文件在 debounce 秒内没有新的事件且大小、修改时间不再变化时才转换，避免读取写了一半的文件；
+    output_dir 为 None 时输出到源文件所在目录，否则输出到 output_dir 下与源文件相同的相对目录。on_converted(文件路径, 是否成功) 在每次转换后调用
+    """
+    def __init__(self, root: str, output_dir: str | None = None, streaming: bool = False, debounce: float = 1.0,
+                 use_polling: bool = False, poll_interval: float = 2.0,
+                 on_converted: Callable[[str, bool], None] | None = None):
+        self.root: str = os.path.abspath(root)
+        self.output_dir: str | None = output_dir
+        self.streaming: bool = streaming
+        self.debounce: float = debounce
+        self.on_converted = on_converted
+        self.stop_event = Event()
+        self.converted: int = 0
+        self.skipped: int = 0
+        self.failed: int = 0
+        # 文件路径 -> 上次转换时（或启动时输出已是最新）的内容哈希
+        self.__hashes: dict[str, str] = {}
+        # 文件路径 -> (最近一次事件的时间, 当时的 (修改时间, 大小))
+        self.__pending: dict[str, tuple[float, tuple[int, int] | None]] = {}
+
+        self.backend = None
+        if not use_polling:
+            try:
+                self.backend = InotifyBackend(self.root)
+                logger.info(f"使用 inotify 监视: {self.root}")
+            except (OSError, AttributeError) as e:
+                logger.info(f"inotify 不可用（{str(e)}），改为定时轮询")
+        if self.backend is None:
+            self.backend = PollingBackend(self.root, poll_interval)
+            logger.info(f"每 {poll_interval} 秒轮询: {self.root}")
+
+    @staticmethod
+    def __stat(path: str) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def __output_dir(self, path: str) -> str:
+        # 输出目录中保持监视目录的结构，子目录中的同名文件不会互相覆盖
+        return output_dir_for(path, self.output_dir, os.path.relpath(os.path.dirname(path), self.root))
+
+    def __output_path(self, path: str) -> str:
+        base_name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.__output_dir(path), f"{base_name}.lys")
+
+    def scan_existing(self):
+        """启动时将输出不存在或比源文件旧的文件加入待转换队列
+
+        输出已是最新的文件记录内容哈希，之后内容未变化的保存（如编辑器只更新修改时间）不会重新转换
+        """
+        for path in walk_ttml_files(self.root):
+            output_path = self.__output_path(path)
+            try:
+                if os.path.getmtime(output_path) >= os.path.getmtime(path):
+                    with open_ttml_bytes(path) as data:
+                        self.__hashes[path] = hashlib.sha256(data).hexdigest()
+                    continue
+            except OSError:
+                pass
+            self.__pending[path] = (0.0, self.__stat(path))
+
+    def convert(self, path: str):
+        """转换单个文件，内容与上次转换时相同则跳过"""
+        try:
+            with open_ttml_bytes(path) as data:
+                digest = hashlib.sha256(data).hexdigest()
+                if self.__hashes.get(path) == digest:
+                    self.skipped += 1
+                    logger.debug(f"内容未变化，跳过: {path}")
+                    return
+                context = TTMLContext(performance=True)
+                success, lyric_path, _ = ttml_to_lys(data, self.streaming, self.__output_dir(path),
+                                                     context, base_name=os.path.splitext(os.path.basename(path))[0])
+        except OSError as e:
+            # 文件在转换前被删除或移走
+            logger.warning(f"无法读取文件: {path}（{str(e)}）")
+            return
+
+        if success:
+            self.__hashes[path] = digest
+            self.converted += 1
+            logger.info(f"已转换: {path} -> {lyric_path}")
+        else:
+            self.failed += 1
+            logger.error(f"转换失败: {path}")
+        if self.on_converted is not None:
+            self.on_converted(path, success)
+
+    def __flush_ready(self):
+        now = time.monotonic()
+        for path, (last_event, state) in list(self.__pending.items()):
+            if now - last_event < self.debounce:
+                continue
+            current = self.__stat(path)
+            if current is None:
+                # 文件已被删除
+                del self.__pending[path]
+                self.__hashes.pop(path, None)
+                continue
+            if current != state:
+                # 仍在写入，重新计时
+                self.__pending[path] = (now, current)
+                continue
+            del self.__pending[path]
+            self.convert(path)
+
+    def run(self):
+        """监视直到调用 stop()"""
+        self.scan_existing()
+        try:
+            while not self.stop_event.is_set():
+                timeout = self.debounce if self.__pending else 1.0
+                for path in self.backend.poll(timeout, self.stop_event):
+                    self.__pending[path] = (time.monotonic(), self.__stat(path))
+                self.__flush_ready()
+        finally:
+            self.backend.close()
+
+    def stop(self):
+        self.stop_event.set()